@@ -0,0 +1,426 @@
+# ==================== ARCHIVO COMPACTO DE ADMINISTRACIONES (.scl) ====================
+# Cada respuesta va de 0 a 4 y cabe en 3 bits: las 90 respuestas ocupan 34 bytes en lugar
+# de los ~180 de una línea de CSV. Cada registro tiene ancho fijo (55 bytes), así que el
+# archivo se abre con numpy.memmap y se recorre por bloques sin cargarlo entero: decenas
+# de millones de administraciones caben en unos cientos de MB y solo se leen los bloques
+# que pasan el filtro.
+#
+#   cabecera (64 bytes) | registros (n × 55 bytes) | índice (un resumen por cada 65536 filas)
+#
+#   registro: id seudónimo (16 bytes) | fecha AAAAMMDD (uint32, 0 = desconocida)
+#             | sexo (0 = desconocido, 1 = H, 2 = M) | respuestas empaquetadas (34 bytes)
+#   índice:   fecha mínima y máxima, número de hombres y de mujeres de cada bloque
+#
+# El índice permite saltarse bloques enteros al filtrar por sexo o por fechas.
+#
+#   python main.py archivo importar historico.csv historico.scl
+#   python main.py archivo ver historico.scl
+#   python main.py archivo exportar historico.scl mujeres_2024.csv --sexo M --desde 01/01/2024
+#   python main.py archivo puntuar historico.scl puntuaciones.csv --hasta 31/12/2023
+#
+# `puntuar` y `normas construir` también aceptan un .scl directamente.
+#
+# Si el CSV no trae columna "id", el seudónimo es un hash con clave del nombre. Sin clave
+# cualquiera podría recalcularlo a partir de una lista de nombres, así que no se importa:
+# hay que dar --clave (o SCL90_CLAVE_ID) o --archivo-clave, que la guarda fuera del .scl
+# (si el archivo no existe se crea con una clave aleatoria; hay que conservarlo para que
+# los mismos pacientes reciban los mismos seudónimos en importaciones posteriores).
+import argparse
+import csv
+import hashlib
+import os
+import secrets
+import sys
+import time
+
+import numpy as np
+
+from puntuacion import N_ITEMS, PLAN
+
+MAGICO = b"SCL90ARC"
+VERSION_FORMATO = 1
+BITS = 3
+BYTES_RESPUESTAS = (N_ITEMS * BITS + 7) // 8
+FILAS_INDICE = 65536
+
+CABECERA = np.dtype([("magico", "S8"), ("version", "<u2"), ("n_items", "<u2"), ("bits", "u1"),
+                     ("test", "S16"), ("n_filas", "<u8"), ("filas_indice", "<u4"),
+                     ("n_bloques", "<u4"), ("offset_indice", "<u8"), ("reservado", "S7")])
+REGISTRO = np.dtype([("id", "S16"), ("fecha", "<u4"), ("sexo", "u1"),
+                     ("respuestas", "u1", (BYTES_RESPUESTAS,))])
+INDICE = np.dtype([("fecha_min", "<u4"), ("fecha_max", "<u4"), ("hombres", "<u4"), ("mujeres", "<u4")])
+
+CODIGOS_SEXO = {"H": 1, "M": 2}
+NOMBRES_SEXO = ("", "Hombre", "Mujer")
+
+# Los 3 bits de cada respuesta, el más significativo primero
+_DESPLAZAMIENTOS = np.array([2, 1, 0], dtype=np.uint8)
+
+
+# === EMPAQUETADO ===
+def empaquetar(matriz):
+    # N×90 (0-4) → N×34 bytes
+    matriz = np.asarray(matriz, dtype=np.uint8)
+    bits = (matriz[:, :, np.newaxis] >> _DESPLAZAMIENTOS) & 1
+    return np.packbits(bits.reshape(len(matriz), -1), axis=1)
+
+
+def desempaquetar(empaquetadas):
+    # N×34 bytes → N×90 (uint8)
+    bits = np.unpackbits(empaquetadas, axis=1, count=N_ITEMS * BITS).reshape(len(empaquetadas), N_ITEMS, BITS)
+    return (bits[:, :, 0] << 2) | (bits[:, :, 1] << 1) | bits[:, :, 2]
+
+
+# === FECHAS Y SEXO ===
+def fecha_numero(texto):
+    # 'dd/mm/aaaa', 'dd-mm-aaaa' o 'aaaa-mm-dd' → AAAAMMDD; 0 si no se reconoce
+    partes = texto.strip().replace("/", "-").replace(".", "-").split("-")
+    if len(partes) != 3 or not all(p.isdigit() for p in partes):
+        return 0
+    if len(partes[0]) == 4:
+        a, m, d = (int(p) for p in partes)
+    else:
+        d, m, a = (int(p) for p in partes)
+    if not (1 <= m <= 12 and 1 <= d <= 31 and 1900 <= a <= 9999):
+        return 0
+    return a * 10000 + m * 100 + d
+
+
+def fecha_texto(numero):
+    numero = int(numero)
+    return f"{numero % 100:02d}/{numero // 100 % 100:02d}/{numero // 10000}" if numero else ""
+
+
+def codigo_sexo(valor):
+    from instrumentos import clave_sexo
+    from lote import SEXOS
+    nombre = SEXOS.get(str(valor).strip().lower())
+    return CODIGOS_SEXO[clave_sexo(nombre)] if nombre else 0
+
+
+SIN_CLAVE = ("El archivo no tiene columna id: para seudonimizar los nombres hace falta una clave "
+             "(--clave, SCL90_CLAVE_ID o --archivo-clave)")
+
+
+def seudonimo(nombre, clave):
+    if not clave:
+        raise ValueError(SIN_CLAVE)
+    h = hashlib.blake2b(" ".join(nombre.lower().split()).encode("utf-8"), digest_size=8, key=clave)
+    return h.hexdigest()
+
+
+def leer_clave(ruta):
+    # Clave de los seudónimos guardada en un archivo aparte; si no existe se crea una aleatoria
+    try:
+        descriptor = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(ruta, encoding="utf-8") as f:
+            clave = f.read().strip()
+        if not clave:
+            raise ValueError(f"El archivo de clave {ruta} está vacío")
+        return clave.encode("utf-8")
+    clave = secrets.token_hex(32)
+    with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+        f.write(clave + "\n")
+    return clave.encode("utf-8")
+
+
+# === ESCRITURA ===
+class EscritorArchivo:
+    # Añade administraciones por bloques; al cerrar escribe el índice y la cabecera.
+    # Se escribe en un temporal que se renombra al final: nunca queda un .scl a medias
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.temporal = ruta + ".tmp"
+        self.archivo = open(self.temporal, "wb")
+        self.archivo.write(bytes(CABECERA.itemsize))
+        self.n_filas = 0
+        self.indice = []
+
+    def añadir(self, ids, fechas, sexos, matriz):
+        registros = np.zeros(len(matriz), dtype=REGISTRO)
+        registros["id"] = ids
+        registros["fecha"] = fechas
+        registros["sexo"] = sexos
+        registros["respuestas"] = empaquetar(matriz)
+        self._indexar(registros)
+        self.archivo.write(registros.tobytes())
+        self.n_filas += len(registros)
+
+    def _indexar(self, registros):
+        inicio = 0
+        while inicio < len(registros):
+            posicion = (self.n_filas + inicio) % FILAS_INDICE
+            if posicion == 0:
+                self.indice.append([np.iinfo(np.uint32).max, 0, 0, 0])
+            trozo = registros[inicio:inicio + FILAS_INDICE - posicion]
+            entrada = self.indice[-1]
+            fechas = trozo["fecha"][trozo["fecha"] > 0]
+            if len(fechas):
+                entrada[0] = min(entrada[0], int(fechas.min()))
+                entrada[1] = max(entrada[1], int(fechas.max()))
+            entrada[2] += int((trozo["sexo"] == 1).sum())
+            entrada[3] += int((trozo["sexo"] == 2).sum())
+            inicio += len(trozo)
+
+    def cerrar(self):
+        indice = np.array([tuple(e) for e in self.indice], dtype=INDICE)
+        offset = self.archivo.tell()
+        self.archivo.write(indice.tobytes())
+        cabecera = np.zeros(1, dtype=CABECERA)
+        cabecera[0] = (MAGICO, VERSION_FORMATO, N_ITEMS, BITS, PLAN.nombre.encode(), self.n_filas,
+                       FILAS_INDICE, len(indice), offset, b"")
+        self.archivo.seek(0)
+        self.archivo.write(cabecera.tobytes())
+        self.archivo.close()
+        os.replace(self.temporal, self.ruta)
+
+    def descartar(self):
+        self.archivo.close()
+        if os.path.exists(self.temporal):
+            os.remove(self.temporal)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *exc):
+        if tipo is None:
+            self.cerrar()
+        else:
+            self.descartar()
+
+
+def _columna(bloque, nombre):
+    # Valores de una columna de metadatos de un bloque de flujo.leer_bloques ('' si no está).
+    # El nombre se compara sin espacios ni mayúsculas, tanto en cabeceras CSV como en claves JSONL
+    columna = next((i for i, c in enumerate(bloque.meta_columnas) if c.strip().lower() == nombre), None)
+    clave = bloque.meta_columnas[columna] if columna is not None else nombre
+    valores = []
+    for meta in bloque.metas:
+        if isinstance(meta, dict):
+            valor = meta.get(clave)
+            if valor is None:  # registro con otras claves que el primero
+                valor = next((v for k, v in meta.items() if k.strip().lower() == nombre), "")
+            valores.append(str(valor))
+        else:
+            valores.append(meta[columna] if columna is not None else "")
+    return valores
+
+
+def _codificar(valores, funcion):
+    # Fechas y sexos se repiten mucho dentro de un bloque: se convierte cada valor distinto una vez
+    codigos = {v: funcion(v) for v in set(valores)}
+    return [codigos[v] for v in valores]
+
+
+def importar(ruta_entrada, ruta_salida, clave=b"", tam_bloque=None, salida_errores=sys.stderr):
+    # CSV/JSONL → .scl; devuelve (filas guardadas, filas rechazadas)
+    from flujo import TAM_BLOQUE, leer_bloques
+    guardadas = rechazadas = 0
+    with EscritorArchivo(ruta_salida) as escritor:
+        for bloque in leer_bloques(ruta_entrada, tam_bloque or TAM_BLOQUE):
+            for n_linea, motivo in bloque.rechazos:
+                print(f"Línea {n_linea}: {motivo}", file=salida_errores)
+            rechazadas += len(bloque.rechazos)
+            if not len(bloque.matriz):
+                continue
+            ids = _columna(bloque, "id")
+            if not any(ids):
+                if not clave:
+                    raise ValueError(SIN_CLAVE)
+                ids = [seudonimo(n, clave) if n.strip() else "" for n in _columna(bloque, "nombre")]
+            ids = [i.strip().encode("utf-8") for i in ids]
+            largo = next((i for i in ids if len(i) > REGISTRO["id"].itemsize), None)
+            if largo is not None:
+                raise ValueError(f"El id '{largo.decode()}' ocupa más de {REGISTRO['id'].itemsize} bytes")
+            escritor.añadir(ids, _codificar(_columna(bloque, "fecha"), fecha_numero),
+                            _codificar(_columna(bloque, "sexo"), codigo_sexo), bloque.matriz)
+            guardadas += len(bloque.matriz)
+    return guardadas, rechazadas
+
+
+# === LECTURA ===
+class ArchivoCompacto:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        cabecera = np.fromfile(ruta, dtype=CABECERA, count=1)
+        if len(cabecera) == 0 or cabecera["magico"][0] != MAGICO:
+            raise ValueError(f"{ruta} no es un archivo .scl de respuestas")
+        self.cabecera = cabecera[0]
+        if self.cabecera["version"] != VERSION_FORMATO:
+            raise ValueError(f"Versión de formato {self.cabecera['version']} no soportada")
+        if self.cabecera["n_items"] != N_ITEMS or self.cabecera["test"].decode() != PLAN.nombre:
+            raise ValueError(f"El archivo es de {self.cabecera['test'].decode()} "
+                             f"({self.cabecera['n_items']} ítems), no de {PLAN.nombre}")
+        self.n_filas = int(self.cabecera["n_filas"])
+        self.filas_indice = int(self.cabecera["filas_indice"])
+        self.registros = (np.memmap(ruta, dtype=REGISTRO, mode="r", offset=CABECERA.itemsize,
+                                    shape=(self.n_filas,)) if self.n_filas else np.zeros(0, dtype=REGISTRO))
+        self.indice = np.fromfile(ruta, dtype=INDICE, count=int(self.cabecera["n_bloques"]),
+                                  offset=int(self.cabecera["offset_indice"]))
+
+    def __len__(self):
+        return self.n_filas
+
+    def recorrer(self, sexo=None, desde=0, hasta=0, tam_bloque=None, filas=None):
+        # Genera (registros, matriz N×90) de las filas que pasan el filtro. `sexo`: 'H'/'M';
+        # `desde`/`hasta`: AAAAMMDD (0 = sin límite; las fechas desconocidas no pasan un filtro de fechas);
+        # `filas`: (primera, última + 1) para leer solo un trozo del archivo
+        codigo = CODIGOS_SEXO[sexo] if sexo else 0
+        campo_sexo = {1: "hombres", 2: "mujeres"}.get(codigo)
+        paso = tam_bloque or self.filas_indice
+        primera, ultima = filas or (0, self.n_filas)
+        for b, entrada in enumerate(self.indice):
+            if (b + 1) * self.filas_indice <= primera or b * self.filas_indice >= ultima:
+                continue
+            if campo_sexo and entrada[campo_sexo] == 0:
+                continue
+            if (desde or hasta) and (entrada["fecha_max"] == 0 or (desde and entrada["fecha_max"] < desde)
+                                     or (hasta and entrada["fecha_min"] > hasta)):
+                continue
+            fin_bloque = min((b + 1) * self.filas_indice, self.n_filas, ultima)
+            for inicio in range(max(b * self.filas_indice, primera), fin_bloque, paso):
+                registros = self.registros[inicio:min(inicio + paso, fin_bloque)]
+                filtro = np.ones(len(registros), dtype=bool)
+                if codigo:
+                    filtro &= registros["sexo"] == codigo
+                if desde:
+                    filtro &= registros["fecha"] >= desde
+                if hasta:
+                    filtro &= (registros["fecha"] <= hasta) & (registros["fecha"] > 0)
+                if not filtro.all():
+                    registros = registros[filtro]
+                if len(registros):
+                    yield np.asarray(registros), desempaquetar(registros["respuestas"])
+
+    def bloques(self, **filtros):
+        # Bloques con la forma de flujo.leer_bloques (columnas id, sexo, fecha)
+        from flujo import Bloque
+        for registros, matriz in self.recorrer(**filtros):
+            metas = [[i.decode("utf-8", "replace"), NOMBRES_SEXO[s], fecha_texto(f)]
+                     for i, s, f in zip(registros["id"].tolist(), registros["sexo"].tolist(),
+                                        registros["fecha"].tolist())]
+            yield Bloque(["id", "sexo", "fecha"], metas, matriz, [])
+
+    def cerrar(self):
+        if isinstance(self.registros, np.memmap):
+            self.registros._mmap.close()
+        self.registros = None
+
+
+def leer_bloques(ruta, tam_bloque=None):
+    yield from ArchivoCompacto(ruta).bloques(tam_bloque=tam_bloque)
+
+
+def exportar(ruta_archivo, ruta_csv, **filtros):
+    filas = 0
+    with open(ruta_csv, "w", newline='', encoding='utf-8') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(["id", "sexo", "fecha"] + [f"r{i+1}" for i in range(N_ITEMS)])
+        for bloque in ArchivoCompacto(ruta_archivo).bloques(**filtros):
+            escritor.writerows(meta + respuestas for meta, respuestas in zip(bloque.metas, bloque.matriz.tolist()))
+            filas += len(bloque.metas)
+    return filas
+
+
+def describir(archivo, salida=sys.stdout):
+    hombres = int(archivo.indice["hombres"].sum())
+    mujeres = int(archivo.indice["mujeres"].sum())
+    fechas = archivo.indice[archivo.indice["fecha_max"] > 0]
+    tam = os.path.getsize(archivo.ruta)
+    print(f"{archivo.ruta}: {len(archivo)} administraciones del {PLAN.nombre} "
+          f"({hombres} hombres, {mujeres} mujeres, {len(archivo) - hombres - mujeres} sin sexo)", file=salida)
+    if len(fechas):
+        print(f"Fechas: {fecha_texto(fechas['fecha_min'].min())} - {fecha_texto(fechas['fecha_max'].max())}",
+              file=salida)
+    print(f"{tam / 1024 / 1024:.1f} MB, {len(archivo.indice)} bloques de índice de {archivo.filas_indice} filas",
+          file=salida)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="SCL-90-R archivo",
+                                     description="Archivo binario compacto (.scl) de administraciones.")
+    ordenes = parser.add_subparsers(dest="orden", required=True)
+
+    p_importar = ordenes.add_parser("importar", help="CSV/JSONL → .scl")
+    p_importar.add_argument("entrada", help="CSV (90 últimas columnas = respuestas) o JSONL")
+    p_importar.add_argument("salida", help="archivo .scl")
+    p_importar.add_argument("--clave", default=os.environ.get("SCL90_CLAVE_ID", ""),
+                            help="clave del hash que sustituye al nombre si no hay columna id")
+    p_importar.add_argument("--archivo-clave", default=None,
+                            help="archivo (fuera del .scl) con la clave; si no existe se crea con una aleatoria")
+    p_importar.add_argument("--bloque", type=int, default=None, help="filas por bloque")
+
+    filtros = argparse.ArgumentParser(add_help=False)
+    filtros.add_argument("--sexo", choices=("H", "M"), default=None, help="solo hombres o solo mujeres")
+    filtros.add_argument("--desde", default=None, help="fecha mínima (dd/mm/aaaa)")
+    filtros.add_argument("--hasta", default=None, help="fecha máxima (dd/mm/aaaa)")
+
+    p_exportar = ordenes.add_parser("exportar", parents=[filtros], help=".scl → CSV")
+    p_exportar.add_argument("entrada", help="archivo .scl")
+    p_exportar.add_argument("salida", help="CSV de respuestas")
+
+    p_puntuar = ordenes.add_parser("puntuar", parents=[filtros], help="corrige las administraciones filtradas")
+    p_puntuar.add_argument("entrada", help="archivo .scl")
+    p_puntuar.add_argument("salida", help="archivo de puntuaciones (.csv o .jsonl)")
+    p_puntuar.add_argument("--normas", default=None, help="baremos locales: añade T y percentil por columna")
+
+    p_ver = ordenes.add_parser("ver", help="resumen del archivo")
+    p_ver.add_argument("ruta", help="archivo .scl")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    try:
+        if args.orden == "ver":
+            archivo = ArchivoCompacto(args.ruta)
+            describir(archivo)
+            archivo.cerrar()
+            return 0
+
+        if args.orden == "importar":
+            if args.bloque is not None and args.bloque < 1:
+                parser.error("--bloque debe ser al menos 1")
+            clave = args.clave.encode("utf-8")
+            if args.archivo_clave:
+                ruta_clave = os.path.abspath(args.archivo_clave)
+                if ruta_clave in (os.path.abspath(args.entrada), os.path.abspath(args.salida)):
+                    parser.error("--archivo-clave debe ser un archivo distinto de la entrada y la salida")
+                clave = leer_clave(args.archivo_clave)
+            guardadas, rechazadas = importar(args.entrada, args.salida, clave, args.bloque)
+            print(f"{guardadas} administraciones guardadas en {time.perf_counter() - inicio:.1f} s, "
+                  f"{rechazadas} filas con error")
+            return 1 if rechazadas else 0
+
+        criterios = {"sexo": args.sexo}
+        for nombre in ("desde", "hasta"):
+            valor = getattr(args, nombre)
+            criterios[nombre] = fecha_numero(valor) if valor else 0
+            if valor and not criterios[nombre]:
+                parser.error(f"--{nombre}: fecha no reconocida '{valor}'")
+
+        if args.orden == "exportar":
+            filas = exportar(args.entrada, args.salida, **criterios)
+        else:
+            from flujo import EscritorResultados, columnas_normas, con_normas, puntuar_bloques
+            from puntuacion import COLUMNAS
+            bloques = puntuar_bloques(ArchivoCompacto(args.entrada).bloques(**criterios))
+            columnas = COLUMNAS
+            if args.normas:
+                from normas_locales import NormasLocales
+                bloques = con_normas(bloques, NormasLocales.cargar(args.normas))
+                columnas = COLUMNAS + columnas_normas()
+            filas = 0
+            with EscritorResultados(args.salida, columnas) as escritor:
+                for bloque, puntuaciones in bloques:
+                    escritor.escribir(bloque, puntuaciones)
+                    filas += len(bloque.matriz)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    print(f"{filas} administraciones en {time.perf_counter() - inicio:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
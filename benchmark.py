@@ -0,0 +1,255 @@
+# ==================== BENCHMARKS DE LAS ETAPAS DE CORRECCIÓN ====================
+# Mide, sin ventana (matplotlib con Agg, sin Tk), cada etapa de `corregir`:
+# recoger respuestas, puntuar, gráfica, PDF, el informe completo y el arranque en frío.
+# Guarda percentiles de latencia, informes/s y memoria máxima en JSON para comparar versiones.
+#
+#   python main.py benchmark -o resultados.json
+#   python main.py benchmark --n 200 --lote 100000 --comparar base.json
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import numpy as np
+
+# Distribución aproximada de respuestas en población general (más ceros que cuatros)
+PROBABILIDADES = [0.40, 0.25, 0.17, 0.11, 0.07]
+
+ETAPAS = ("recoger", "puntuar", "grafica_matplotlib", "grafica_vectorial", "pdf", "pdf_canvas", "informe",
+          "informe_repetido", "arranque")
+
+
+def respuestas_sinteticas(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    return rng.choice(5, size=(n, 90), p=PROBABILIDADES).astype(np.int8)
+
+
+def percentiles(tiempos):
+    ms = np.asarray(tiempos) * 1000
+    return {
+        "n": int(ms.size),
+        "media_ms": float(ms.mean()),
+        "min_ms": float(ms.min()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def medir(funcion, casos, calentamiento=2):
+    # Latencia por caso y memoria máxima (tracemalloc en una pasada aparte para no falsear tiempos)
+    for caso in casos[:calentamiento]:
+        funcion(caso)
+    tiempos = []
+    for caso in casos:
+        inicio = time.perf_counter()
+        funcion(caso)
+        tiempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    funcion(casos[0])
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    resultado = percentiles(tiempos)
+    resultado["por_segundo"] = len(casos) / sum(tiempos) if sum(tiempos) > 0 else 0.0
+    resultado["memoria_pico_kb"] = pico / 1024
+    return resultado
+
+
+def _textos(fila):
+    # Lo que devuelven los 90 Entry: cadenas
+    return [str(v) for v in fila]
+
+
+def bench_etapas(n, motor_pdf_grafica="matplotlib", motor_pdf="platypus"):
+    import informe
+    from puntuacion import SCL90R_ESCALAS, puntuar_lote, resultados_paciente
+
+    matriz = respuestas_sinteticas(n)
+    filas = matriz.tolist()
+    textos = [_textos(f) for f in filas]
+    puntuados = [resultados_paciente(puntuar_lote(f)) for f in filas]
+    resultados = {}
+
+    def recoger(caso):
+        respuestas = []
+        for val in caso:
+            val = val.strip()
+            respuestas.append(int(val) if val.isdigit() else 0)
+        return respuestas
+    resultados["recoger"] = medir(recoger, textos)
+
+    resultados["puntuar"] = medir(lambda f: resultados_paciente(puntuar_lote(f)), filas)
+
+    casos = list(zip(filas, puntuados))
+    resultados["grafica_matplotlib"] = medir(
+        lambda c: informe.generar_grafica(c[1][1], "Mujer", "matplotlib"), casos)
+    resultados["grafica_vectorial"] = medir(
+        lambda c: informe.generar_grafica(c[1][1], "Mujer", "vectorial"), casos)
+
+    # PDF sin la gráfica rasterizada de cada caso: se reutiliza una para aislar doc.build
+    grafica = informe.generar_grafica(puntuados[0][1], "Mujer", motor_pdf_grafica)
+
+    def pdf(generar):
+        def caso_pdf(caso):
+            if isinstance(grafica, io.BytesIO):
+                grafica.seek(0)
+            generar(io.BytesIO(), "Paciente", "Mujer", "01/01/2026", "Evaluador",
+                    caso[1][0], SCL90R_ESCALAS, caso[0], grafica)
+        return caso_pdf
+    resultados["pdf"] = medir(pdf(informe.funcion_pdf("platypus")), casos)
+    resultados["pdf_canvas"] = medir(pdf(informe.funcion_pdf("canvas")), casos)
+
+    generar_pdf = informe.funcion_pdf(motor_pdf)
+
+    def completo(fila):
+        res, sub = resultados_paciente(puntuar_lote(fila))
+        img = informe.generar_grafica(sub, "Mujer", motor_pdf_grafica)
+        generar_pdf(io.BytesIO(), "Paciente", "Mujer", "01/01/2026", "Evaluador",
+                    res, SCL90R_ESCALAS, fila, img)
+    resultados["informe"] = medir(completo, filas)
+
+    # Mismo paciente con otra cabecera (p. ej. corregir el nombre del terapeuta): la
+    # corrección y la gráfica salen de la caché y solo se rehace el PDF
+    import cache
+    contador = iter(range(10 ** 9))
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "informe.pdf")
+
+        def repetido(fila):
+            informe.generar_informe(ruta, "Paciente", "Mujer", "01/01/2026", f"Evaluador {next(contador)}",
+                                    fila, motor_grafica=motor_pdf_grafica, motor_pdf=motor_pdf)
+        cache.GRAFICAS.vaciar()
+        cache.RESULTADOS.vaciar()
+        resultados["informe_repetido"] = medir(repetido, [filas[0]] * n)
+    return resultados
+
+
+def bench_lote(n_lote, repeticiones=5):
+    # Rendimiento del motor vectorizado: administraciones corregidas por segundo
+    from puntuacion import puntuar_lote
+    matriz = respuestas_sinteticas(n_lote, semilla=1)
+    puntuar_lote(matriz[:1000])
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        puntuar_lote(matriz)
+        tiempos.append(time.perf_counter() - inicio)
+    tracemalloc.start()
+    puntuar_lote(matriz)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    resultado = percentiles(tiempos)
+    resultado["filas"] = n_lote
+    resultado["por_segundo"] = n_lote / min(tiempos)
+    resultado["memoria_pico_kb"] = pico / 1024
+    return resultado
+
+
+def bench_arranque(repeticiones=5):
+    # Arranque en frío: un intérprete nuevo que importa main (todo lo anterior a la ventana)
+    carpeta = os.path.dirname(os.path.abspath(__file__))
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import main"], cwd=carpeta, check=True)
+        tiempos.append(time.perf_counter() - inicio)
+    return percentiles(tiempos)
+
+
+def entorno():
+    versiones = {"python": platform.python_version(), "numpy": np.__version__}
+    for paquete in ("matplotlib", "reportlab"):
+        try:
+            versiones[paquete] = __import__(paquete).__version__
+        except ImportError:
+            versiones[paquete] = None
+    try:
+        carpeta = os.path.dirname(os.path.abspath(__file__))
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=carpeta,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "plataforma": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "versiones": versiones,
+    }
+
+
+def comparar(actual, base):
+    # Cociente de p50 (actual / base) por etapa: > 1 es más lento
+    filas = []
+    for etapa, datos in actual["etapas"].items():
+        anterior = base.get("etapas", {}).get(etapa)
+        if anterior and anterior.get("p50_ms"):
+            filas.append((etapa, anterior["p50_ms"], datos["p50_ms"], datos["p50_ms"] / anterior["p50_ms"]))
+    return filas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="SCL-90-R benchmark",
+                                     description="Mide el coste de cada etapa de la corrección (sin ventana).")
+    parser.add_argument("--n", type=int, default=50, help="casos sintéticos por etapa (por defecto: 50)")
+    parser.add_argument("--lote", type=int, default=100000,
+                        help="filas para medir el motor vectorizado (por defecto: 100000)")
+    parser.add_argument("--arranques", type=int, default=5, help="arranques en frío a medir (por defecto: 5)")
+    parser.add_argument("--grafica", choices=("matplotlib", "vectorial"), default="matplotlib",
+                        help="motor de gráfica para las etapas pdf e informe")
+    parser.add_argument("--pdf", choices=("platypus", "canvas"), default="platypus",
+                        help="motor del PDF para la etapa informe")
+    parser.add_argument("--etapas", default=",".join(ETAPAS + ("lote",)),
+                        help="etapas a medir separadas por comas")
+    parser.add_argument("-o", "--salida", default=None, help="archivo JSON de resultados")
+    parser.add_argument("--comparar", default=None, help="JSON de una ejecución anterior con la que comparar")
+    args = parser.parse_args(argv)
+
+    if args.n < 3:
+        parser.error("--n debe ser al menos 3")
+    pedidas = set(args.etapas.split(","))
+
+    resultado = {"entorno": entorno(),
+                 "parametros": {"n": args.n, "lote": args.lote, "grafica": args.grafica, "pdf": args.pdf},
+                 "etapas": {}}
+    if pedidas & set(ETAPAS[:-1]):
+        etapas = bench_etapas(args.n, args.grafica, args.pdf)
+        resultado["etapas"].update({k: v for k, v in etapas.items() if k in pedidas})
+    if "lote" in pedidas:
+        resultado["etapas"]["puntuar_lote"] = bench_lote(args.lote)
+    if "arranque" in pedidas:
+        resultado["etapas"]["arranque"] = bench_arranque(args.arranques)
+
+    print(f"{'etapa':<20}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'por s':>14}{'mem KB':>10}")
+    for etapa, datos in resultado["etapas"].items():
+        print(f"{etapa:<20}{datos['p50_ms']:>10.2f}{datos['p90_ms']:>10.2f}{datos['p99_ms']:>10.2f}"
+              f"{datos.get('por_segundo', 0):>14,.1f}{datos.get('memoria_pico_kb', 0):>10.0f}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        print("\nComparación de p50 con", args.comparar)
+        for etapa, antes, ahora, cociente in comparar(resultado, base):
+            print(f"{etapa:<20}{antes:>10.2f} → {ahora:>8.2f} ms  (×{cociente:.2f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
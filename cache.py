@@ -0,0 +1,207 @@
+# ==================== CACHÉ DE RESULTADOS Y GRÁFICAS ====================
+# Volver a generar un informe (para corregir el nombre del terapeuta o sacar otra copia)
+# no debería repetir la corrección ni, sobre todo, la gráfica de matplotlib. La clave es
+# un hash de lo único que las determina: respuestas, sexo y versión de los baremos
+# (más la del test). El nombre, la fecha o el terapeuta no entran en la clave, así que
+# cambiar solo la cabecera reutiliza la gráfica tal cual.
+#
+# Dos niveles:
+#   - en memoria: LRU acotado en bytes, uno para resultados y otro para gráficas
+#   - en disco (opcional): SCL90_CACHE=carpeta, compartido entre ejecuciones y entre los
+#     procesos del modo lote, acotado con SCL90_CACHE_DISCO_MB (se borran los más antiguos)
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+MB = 1024 * 1024
+MEMORIA_RESULTADOS = 4 * MB
+MEMORIA_GRAFICAS = int(float(os.environ.get("SCL90_CACHE_MB", 64)) * MB)
+DISCO_MAX = int(float(os.environ.get("SCL90_CACHE_DISCO_MB", 256)) * MB)
+
+# Tamaño aproximado en memoria de un resultado (dict de 10 entradas + 9 sumas) y de una
+# gráfica vectorial (Drawing de ~160 formas), que no se pueden medir en bytes
+TAM_RESULTADO = 2048
+TAM_DRAWING = 64 * 1024
+
+
+def clave(respuestas, sexo):
+    # Hash de (respuestas, sexo, versión de los baremos y del test)
+    from instrumentos import clave_sexo
+    from puntuacion import PLAN
+    h = hashlib.blake2b(digest_size=16)
+    h.update(bytes(int(v) for v in respuestas))
+    h.update(f"|{clave_sexo(sexo)}|{PLAN.nombre}|{PLAN.version}|{PLAN.version_normas}".encode())
+    return h.hexdigest()
+
+
+class CacheLRU:
+    # Diccionario ordenado por último uso, acotado por la suma de tamaños. Se usa desde el
+    # hilo de la ventana y desde el trabajador de informes, de ahí el cerrojo
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._datos = OrderedDict()
+        self._cerrojo = threading.Lock()
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsados = 0
+
+    def obtener(self, k):
+        with self._cerrojo:
+            entrada = self._datos.get(k)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(k)
+            self.aciertos += 1
+            return entrada[0]
+
+    def guardar(self, k, valor, tamaño):
+        if tamaño > self.max_bytes:
+            return
+        with self._cerrojo:
+            anterior = self._datos.pop(k, None)
+            if anterior is not None:
+                self.bytes -= anterior[1]
+            self._datos[k] = (valor, tamaño)
+            self.bytes += tamaño
+            while self.bytes > self.max_bytes:
+                _, (_, tam) = self._datos.popitem(last=False)
+                self.bytes -= tam
+                self.expulsados += 1
+
+    def vaciar(self):
+        with self._cerrojo:
+            self._datos.clear()
+            self.bytes = 0
+
+    def estadisticas(self):
+        with self._cerrojo:
+            return {"entradas": len(self._datos), "bytes": self.bytes, "aciertos": self.aciertos,
+                    "fallos": self.fallos, "expulsados": self.expulsados}
+
+
+class CacheDisco:
+    # Un archivo por clave. Se escribe en un temporal y se renombra: varios procesos del
+    # modo lote pueden escribir a la vez sin dejar archivos a medias
+    def __init__(self, carpeta, max_bytes=DISCO_MAX):
+        self.carpeta = carpeta
+        self.max_bytes = max_bytes
+        os.makedirs(carpeta, exist_ok=True)
+        self.bytes = sum(e.stat().st_size for e in os.scandir(carpeta) if e.is_file())
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _ruta(self, k, extension):
+        return os.path.join(self.carpeta, k + extension)
+
+    def leer(self, k, extension):
+        ruta = self._ruta(k, extension)
+        try:
+            with open(ruta, "rb") as f:
+                datos = f.read()
+            os.utime(ruta)  # la fecha de modificación hace de "último uso"
+        except OSError:
+            self.fallos += 1
+            return None
+        self.aciertos += 1
+        return datos
+
+    def escribir(self, k, extension, datos):
+        ruta = self._ruta(k, extension)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporal, "wb") as f:
+                f.write(datos)
+            os.replace(temporal, ruta)
+        except OSError:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            return
+        self.bytes += len(datos)
+        if self.bytes > self.max_bytes:
+            self._recortar()
+
+    def _recortar(self):
+        # Borra los menos usados hasta quedar en el 90 % del límite
+        entradas = []
+        for e in os.scandir(self.carpeta):
+            if e.is_file() and not e.name.endswith(".tmp"):
+                st = e.stat()
+                entradas.append((st.st_mtime, st.st_size, e.path))
+        entradas.sort()
+        self.bytes = sum(tam for _, tam, _ in entradas)
+        for _, tam, ruta in entradas:
+            if self.bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(ruta)
+                self.bytes -= tam
+            except OSError:
+                pass
+
+    def estadisticas(self):
+        return {"bytes": self.bytes, "aciertos": self.aciertos, "fallos": self.fallos}
+
+
+RESULTADOS = CacheLRU(MEMORIA_RESULTADOS)
+GRAFICAS = CacheLRU(MEMORIA_GRAFICAS)
+DISCO = CacheDisco(os.environ["SCL90_CACHE"]) if os.environ.get("SCL90_CACHE") else None
+
+
+def activar_disco(carpeta, max_bytes=DISCO_MAX):
+    global DISCO
+    DISCO = CacheDisco(carpeta, max_bytes) if carpeta else None
+    # Los procesos hijos del modo lote heredan la carpeta por el entorno
+    if carpeta:
+        os.environ["SCL90_CACHE"] = carpeta
+
+
+def resultados(respuestas, sexo, k=None):
+    # (resultados, sub_sumas) de un paciente, corrigiendo solo si no están ya en caché
+    k = k or clave(respuestas, sexo)
+    valor = RESULTADOS.obtener(k)
+    if valor is None and DISCO is not None:
+        datos = DISCO.leer(k, ".json")
+        if datos is not None:
+            valor = tuple(json.loads(datos))
+            RESULTADOS.guardar(k, valor, TAM_RESULTADO)
+    if valor is None:
+        from puntuacion import puntuar_lote, resultados_paciente
+        valor = resultados_paciente(puntuar_lote(respuestas))
+        RESULTADOS.guardar(k, valor, TAM_RESULTADO)
+        if DISCO is not None:
+            DISCO.escribir(k, ".json", json.dumps(valor, ensure_ascii=False).encode("utf-8"))
+    return valor
+
+
+def grafica(respuestas, sexo, motor, generar, k=None):
+    # Gráfica del motor pedido; `generar()` solo se llama si no está en caché.
+    # Los PNG se guardan como bytes (y en disco); el Drawing vectorial solo en memoria
+    k = f"{k or clave(respuestas, sexo)}.{motor}"
+    valor = GRAFICAS.obtener(k)
+    if valor is None and DISCO is not None and motor == "matplotlib":
+        valor = DISCO.leer(k, ".png")
+        if valor is not None:
+            GRAFICAS.guardar(k, valor, len(valor))
+    if valor is None:
+        valor = generar()
+        if isinstance(valor, io.BytesIO):
+            valor = valor.getvalue()
+            GRAFICAS.guardar(k, valor, len(valor))
+            if DISCO is not None:
+                DISCO.escribir(k, ".png", valor)
+        else:
+            GRAFICAS.guardar(k, valor, TAM_DRAWING)
+    # Cada informe recibe su propio BytesIO: ReportLab lo lee y lo deja al final
+    return io.BytesIO(valor) if isinstance(valor, bytes) else valor
+
+
+def estadisticas():
+    datos = {"resultados": RESULTADOS.estadisticas(), "graficas": GRAFICAS.estadisticas()}
+    if DISCO is not None:
+        datos["disco"] = DISCO.estadisticas()
+    return datos
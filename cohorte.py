@@ -0,0 +1,333 @@
+# ==================== INFORME DE GRUPO (un solo PDF para muchos pacientes) ====================
+# Cribados de un colegio, una empresa o una planta: todos los pacientes de un CSV en un
+# único PDF, un apartado (con marcador) por paciente y al final una página de resumen
+# del grupo con la distribución de cada dimensión frente a los cortes de normas_es y
+# el porcentaje de casos clínicos por GSI ≥ 1.50.
+#
+#   python main.py cohorte pacientes.csv grupo.pdf
+#
+# Se dibuja con el canvas de informe_rapido: fuentes, plantillas de página y estilos se
+# preparan una vez por documento. Los pacientes se leen y se corrigen por bloques y no se
+# guardan: del grupo solo se acumulan histogramas de tamaño fijo.
+#
+# El canvas de ReportLab guarda todas las páginas hasta save() (unos 35 KB por paciente).
+# Para grupos muy grandes, --volumen N reparte los informes en PDF de N pacientes y la
+# memoria depende de N, no del grupo: grupo_001.pdf, grupo_002.pdf... con los informes y
+# grupo.pdf con el resumen. Sin --volumen (o si caben en uno) sale un único grupo.pdf.
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from reportlab.graphics import renderPDF
+from reportlab.graphics.shapes import Drawing, Line, Rect, String, Polygon
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from informe import COLOR_CLINICO, COLOR_CORTE, COLOR_NORMAL, asunto_pdf, generar_grafica
+from informe_rapido import (AZUL, CENTRO_X, FONDO_DIM, GRIS, MARGEN_X, NEGRITA, NEGRO, NORMAL,
+                            ROJO, TITULO, TITULO2, dibujar_informe, texto_mixto, y_pagina)
+from instrumentos import SEXOS, clave_sexo
+from lote import leer_pacientes
+from normas_locales import activas
+from puntuacion import DIMENSIONES, PLAN, SCL90R_ESCALAS, puntuar_lote, resultados_paciente
+from traza import tramo
+
+TAM_BLOQUE = 256
+
+# Las medias y el GSI vienen redondeados a 2 decimales y van de 0 a 4: un histograma de
+# 401 casillas (una por céntimo) da percentiles exactos con memoria fija
+CASILLAS = 401
+
+
+class EstadisticaCohorte:
+    # Recuentos por sexo (fila 0 = H, fila 1 = M), como las tablas del plan
+    def __init__(self):
+        k = len(DIMENSIONES)
+        self.n = np.zeros(len(SEXOS), dtype=np.int64)
+        self.medias = np.zeros((len(SEXOS), k, CASILLAS), dtype=np.int64)
+        self.gsi = np.zeros((len(SEXOS), CASILLAS), dtype=np.int64)
+        self.clinicos = np.zeros((len(SEXOS), k), dtype=np.int64)
+
+    def añadir(self, puntuaciones, sexos):
+        fila_sexo = np.array([SEXOS.index(clave_sexo(s)) for s in sexos])
+        casillas = np.rint(puntuaciones["medias"] * 100).astype(np.intp)
+        np.add.at(self.medias, (fila_sexo[:, np.newaxis], np.arange(len(DIMENSIONES)), casillas), 1)
+        np.add.at(self.gsi, (fila_sexo, np.rint(puntuaciones["GSI"] * 100).astype(np.intp)), 1)
+        np.add.at(self.n, fila_sexo, 1)
+        np.add.at(self.clinicos, fila_sexo, PLAN.clinico(puntuaciones["brutos"], sexos))
+
+    @property
+    def total(self):
+        return int(self.n.sum())
+
+    def casos_gsi(self, umbral=1.5):
+        return int(self.gsi.sum(axis=0)[int(round(umbral * 100)):].sum())
+
+    @staticmethod
+    def _percentiles(histograma, qs):
+        # Valor más pequeño que deja por debajo al menos una fracción q de los casos
+        acumulado = np.cumsum(histograma)
+        if acumulado[-1] == 0:
+            return [0.0] * len(qs)
+        return [np.searchsorted(acumulado, max(1, np.ceil(q * acumulado[-1]))) / 100 for q in qs]
+
+    def resumen_dimensiones(self, qs=(0.10, 0.25, 0.50, 0.75, 0.90)):
+        # Por dimensión: media, percentiles, mediana de cada sexo (None si no hay nadie de
+        # ese sexo) y % por encima del corte de su sexo
+        valores = np.arange(CASILLAS) / 100
+        ambos = self.medias.sum(axis=0)
+        total = max(self.total, 1)
+        filas = []
+        for d, dim in enumerate(DIMENSIONES):
+            filas.append({
+                "dimension": dim,
+                "media": float((ambos[d] * valores).sum() / total),
+                "percentiles": self._percentiles(ambos[d], qs),
+                "medianas_sexo": [self._percentiles(self.medias[s, d], (0.5,))[0] if self.n[s] else None
+                                  for s in range(len(SEXOS))],
+                "clinicos": int(self.clinicos[:, d].sum()),
+                "porcentaje_clinico": 100 * self.clinicos[:, d].sum() / total,
+            })
+        return filas
+
+    def resumen_gsi(self, qs=(0.25, 0.50, 0.75)):
+        return self._percentiles(self.gsi.sum(axis=0), qs)
+
+
+# === PÁGINA DE RESUMEN ===
+RES_COLUMNAS = (135, 45, 50, 70, 45, 45, 50)
+RES_X = MARGEN_X
+RES_Y = 184
+RES_ALTO_FILA = 18
+
+
+def _grafica_distribucion(filas):
+    # Caja P25-P75 con la mediana y bigotes P10-P90 por dimensión; triángulos con los
+    # cortes de hombres (blanco, encima) y mujeres (rojo, debajo). La caja es clínica si
+    # la mediana de hombres o de mujeres llega al corte de su propio sexo
+    ancho, alto = 440, 260
+    x0, x1 = 150, ancho - 10
+    d = Drawing(ancho, alto)
+
+    def x(valor):
+        return x0 + (x1 - x0) * min(max(valor, 0), 4) / 4
+
+    paso = (alto - 40) / len(filas)
+    for v in range(5):
+        d.add(Line(x(v), 25, x(v), alto - 10, strokeColor=colors.HexColor("#dddddd"), strokeWidth=0.5))
+        d.add(String(x(v), 14, f"{v}", fontName='Helvetica', fontSize=7, textAnchor='middle'))
+    cortes = PLAN.tabla_cortes
+    for i, fila in enumerate(filas):
+        yc = alto - 10 - paso * (i + 0.5)
+        p10, p25, p50, p75, p90 = fila["percentiles"]
+        clinica = any(mediana is not None and mediana >= cortes[fila_sexo, i]
+                      for fila_sexo, mediana in enumerate(fila["medianas_sexo"]))
+        color = colors.HexColor(COLOR_CLINICO if clinica else COLOR_NORMAL)
+        d.add(String(x0 - 6, yc - 2.5, fila["dimension"], fontName='Helvetica', fontSize=7, textAnchor='end'))
+        d.add(Line(x(p10), yc, x(p90), yc, strokeColor=colors.black, strokeWidth=0.6))
+        d.add(Rect(x(p25), yc - paso * 0.25, max(x(p75) - x(p25), 0.5), paso * 0.5, fillColor=color,
+                   strokeColor=colors.black, strokeWidth=0.5))
+        d.add(Line(x(p50), yc - paso * 0.25, x(p50), yc + paso * 0.25, strokeColor=colors.black, strokeWidth=1.2))
+        rojo = colors.HexColor(COLOR_CORTE)
+        for fila_sexo, signo in ((0, 1), (1, -1)):
+            xc, yt = x(cortes[fila_sexo, i]), yc + signo * paso * 0.25
+            d.add(Polygon([xc - 3, yt + signo * 4, xc + 3, yt + signo * 4, xc, yt],
+                          fillColor=rojo if fila_sexo else colors.white, strokeColor=rojo, strokeWidth=0.6))
+    d.add(String(x0, 2, "Caja: P25-P75 y mediana (roja si la de un sexo llega a su corte); bigotes: P10-P90; "
+                        "cortes: H blanco, M rojo", fontName='Helvetica', fontSize=6.5))
+    return d
+
+
+def dibujar_resumen(c, estadistica, volumenes=None):
+    # volumenes: nombres de los PDF con los informes cuando no caben en este
+    total = estadistica.total
+    c.setFont(*TITULO)
+    c.setFillColor(NEGRO)
+    c.drawCentredString(CENTRO_X, y_pagina(96), "Resumen del grupo SCL-90-R")
+
+    n_h, n_m = estadistica.n.tolist()
+    casos = estadistica.casos_gsi()
+    p25, p50, p75 = estadistica.resumen_gsi()
+    c.setFont(*NORMAL)
+    c.drawString(MARGEN_X, y_pagina(130), f"• Administraciones: {total} ({n_h} hombres, {n_m} mujeres)")
+    c.drawString(MARGEN_X, y_pagina(144), f"• Índice de severidad global (GSI): mediana {p50:.2f} "
+                                    f"(P25 {p25:.2f} - P75 {p75:.2f})")
+    x = texto_mixto(c, MARGEN_X, y_pagina(158), [("• Casos clínicos por GSI ≥1.50: ", NORMAL, NEGRO)])
+    texto_mixto(c, x, y_pagina(158), [(f"{casos} ({100 * casos / max(total, 1):.1f} %)", NEGRITA, ROJO if casos else NEGRO)])
+    if volumenes:
+        c.setFont(*NORMAL)
+        c.setFillColor(NEGRO)
+        c.drawString(MARGEN_X, y_pagina(172), f"• Informes individuales en {len(volumenes)} volúmenes: "
+                                             f"{volumenes[0]} - {volumenes[-1]}")
+
+    # Tabla por dimensión
+    filas = estadistica.resumen_dimensiones()
+    bordes = [RES_X + sum(RES_COLUMNAS[:k]) for k in range(len(RES_COLUMNAS) + 1)]
+    ancho, alto = bordes[-1] - RES_X, RES_ALTO_FILA * (len(filas) + 1)
+    c.setFillColor(AZUL)
+    c.rect(RES_X, y_pagina(RES_Y + RES_ALTO_FILA), ancho, RES_ALTO_FILA, stroke=0, fill=1)
+    c.setFillColor(FONDO_DIM)
+    c.rect(RES_X, y_pagina(RES_Y + alto), ancho, alto - RES_ALTO_FILA, stroke=0, fill=1)
+    c.setStrokeColor(GRIS)
+    c.setLineWidth(0.5)
+    c.lines([(RES_X, y_pagina(RES_Y + f * RES_ALTO_FILA), bordes[-1], y_pagina(RES_Y + f * RES_ALTO_FILA))
+             for f in range(len(filas) + 2)] + [(x, y_pagina(RES_Y), x, y_pagina(RES_Y + alto)) for x in bordes])
+
+    c.setFont(*NORMAL)
+    c.setFillColor(colors.white)
+    for x, texto in zip(bordes, ("Dimensión", "Media", "Mediana", "P25 - P75", "Corte H", "Corte M", "% clínico")):
+        c.drawString(x + 4, y_pagina(RES_Y + 13), texto)
+    cortes = PLAN.tabla_cortes
+    for i, fila in enumerate(filas):
+        y = y_pagina(RES_Y + (i + 1) * RES_ALTO_FILA + 13)
+        _, p25, p50, p75, _ = fila["percentiles"]
+        celdas = (f"{fila['media']:.2f}", f"{p50:.2f}", f"{p25:.2f} - {p75:.2f}",
+                  f"{cortes[0, i]:.2f}", f"{cortes[1, i]:.2f}", f"{fila['porcentaje_clinico']:.1f} %")
+        c.setFont(*NORMAL)
+        c.setFillColor(NEGRO)
+        c.drawString(bordes[0] + 4, y, fila["dimension"])
+        for k, texto in enumerate(celdas, start=1):
+            c.drawCentredString((bordes[k] + bordes[k + 1]) / 2, y, texto)
+
+    c.setFont(*TITULO2)
+    c.setFillColor(NEGRO)
+    c.drawString(MARGEN_X, y_pagina(RES_Y + alto + 40), "Distribución de las medias por dimensión")
+    renderPDF.draw(_grafica_distribucion(filas), c, MARGEN_X, y_pagina(RES_Y + alto + 50 + 260))
+    c.showPage()
+
+
+# === DOCUMENTO ===
+def _bloques(pacientes, tam_bloque, errores):
+    bloque = []
+    for n_fila, paciente in pacientes:
+        if isinstance(paciente, Exception):
+            errores.append((n_fila, str(paciente)))
+            continue
+        bloque.append(paciente)
+        if len(bloque) >= tam_bloque:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def _abrir(ruta, normas):
+    c = canvas.Canvas(ruta, pagesize=A4, pageCompression=1)
+    c.setTitle("Informe de grupo SCL-90-R")
+    c.showOutline()
+    c.setSubject(asunto_pdf(normas))
+    return c
+
+
+def ruta_volumen(ruta_pdf, numero):
+    raiz, extension = os.path.splitext(ruta_pdf)
+    return f"{raiz}_{numero:03d}{extension or '.pdf'}"
+
+
+def generar_pdf_cohorte(ruta_entrada, ruta_pdf, motor_grafica="vectorial", tam_bloque=TAM_BLOQUE,
+                        salida_errores=sys.stderr, progreso=None, volumen=None):
+    # volumen: pacientes por PDF (None = todos en uno).
+    # Devuelve (pacientes incluidos, lista de (fila, error), segundos, PDF escritos)
+    inicio = time.perf_counter()
+    errores = []
+    estadistica = EstadisticaCohorte()
+    normas = activas()
+    # Cada volumen se escribe en un temporal; solo se renombran todos al final
+    temporales = [(ruta_volumen(ruta_pdf, 1) if volumen else ruta_pdf) + ".tmp"]
+    c = _abrir(temporales[-1], normas)
+    en_volumen = 0
+    try:
+        for bloque in _bloques(leer_pacientes(ruta_entrada), tam_bloque, errores):
+            with tramo("cohorte.bloque", filas=len(bloque)):
+                sexos = [p["sexo"] for p in bloque]
+                puntuaciones = puntuar_lote([p["respuestas"] for p in bloque])
+                estadistica.añadir(puntuaciones, sexos)
+                for fila, paciente in enumerate(bloque):
+                    if volumen and en_volumen == volumen:
+                        with tramo("cohorte.guardar", volumen=len(temporales)):
+                            c.save()
+                        temporales.append(ruta_volumen(ruta_pdf, len(temporales) + 1) + ".tmp")
+                        c = _abrir(temporales[-1], normas)
+                        en_volumen = 0
+                    resultados, sub_sumas = resultados_paciente(puntuaciones, fila)
+                    marcador = f"p{estadistica.total - len(bloque) + fila}"
+                    c.bookmarkPage(marcador)
+                    c.addOutlineEntry(f"{paciente['nombre']} ({paciente['fecha']})", marcador)
+                    dibujar_informe(c, paciente["nombre"], paciente["sexo"], paciente["fecha"],
+                                    paciente["terapeuta"], resultados, SCL90R_ESCALAS, paciente["respuestas"],
+                                    generar_grafica(sub_sumas, paciente["sexo"], motor_grafica), normas)
+                    en_volumen += 1
+            if progreso is not None:
+                progreso(estadistica.total)
+
+        for n_fila, error in errores:
+            print(f"Fila {n_fila}: {error}", file=salida_errores)
+        if not estadistica.total:
+            raise ValueError("No hay ningún paciente válido en el archivo")
+
+        # Un solo volumen: el resumen va al final del mismo PDF. Varios: en un PDF aparte
+        finales = [ruta_pdf]
+        volumenes = None
+        if len(temporales) > 1:
+            with tramo("cohorte.guardar", volumen=len(temporales)):
+                c.save()
+            finales = [ruta_volumen(ruta_pdf, k) for k in range(1, len(temporales) + 1)] + [ruta_pdf]
+            volumenes = [os.path.basename(r) for r in finales[:-1]]
+            temporales.append(ruta_pdf + ".tmp")
+            c = _abrir(temporales[-1], normas)
+        c.bookmarkPage("resumen")
+        c.addOutlineEntry("Resumen del grupo", "resumen")
+        with tramo("cohorte.resumen"):
+            dibujar_resumen(c, estadistica, volumenes)
+        with tramo("cohorte.guardar"):
+            c.save()
+        for temporal, final in zip(temporales, finales):
+            os.replace(temporal, final)
+    finally:
+        for temporal in temporales:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+    return estadistica.total, errores, time.perf_counter() - inicio, finales
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="SCL-90-R cohorte",
+        description="Genera un único PDF con el informe de cada paciente de un CSV y un resumen del grupo.")
+    parser.add_argument("entrada", help="CSV con columnas nombre, sexo, fecha, evaluador y las 90 respuestas")
+    parser.add_argument("salida", help="PDF de salida")
+    parser.add_argument("--grafica", choices=("matplotlib", "vectorial"), default="vectorial",
+                        help="motor de la gráfica de cada paciente (por defecto: vectorial)")
+    parser.add_argument("--bloque", type=int, default=TAM_BLOQUE,
+                        help=f"pacientes corregidos a la vez (por defecto: {TAM_BLOQUE})")
+    parser.add_argument("--volumen", type=int,
+                        help="reparte los informes en PDF de este número de pacientes y deja el resumen "
+                             "en la salida; limita la memoria en grupos muy grandes (por defecto: un único PDF)")
+    args = parser.parse_args(argv)
+
+    if args.bloque < 1:
+        parser.error("--bloque debe ser al menos 1")
+    if args.volumen is not None and args.volumen < 1:
+        parser.error("--volumen debe ser al menos 1")
+
+    try:
+        incluidos, errores, segundos, finales = generar_pdf_cohorte(args.entrada, args.salida, args.grafica,
+                                                                    args.bloque, volumen=args.volumen)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    ritmo = incluidos / segundos if segundos > 0 else 0.0
+    destino = args.salida
+    if len(finales) > 1:
+        destino = f"{len(finales) - 1} volúmenes ({finales[0]} - {finales[-2]}) y el resumen en {args.salida}"
+    print(f"{incluidos} pacientes en {destino} en {segundos:.1f} s ({ritmo:.1f} pacientes/s), "
+          f"{len(errores)} filas con error")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
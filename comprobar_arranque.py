@@ -0,0 +1,72 @@
+# ==================== COMPROBACIÓN DEL TIEMPO DE ARRANQUE ====================
+# Mide con `python -X importtime` lo que cuesta importar main.py (todo lo que ocurre
+# antes de construir la ventana) y falla si se supera el presupuesto o si se cuela
+# alguno de los módulos pesados que deben cargarse bajo demanda.
+#
+#   python comprobar_arranque.py            # presupuesto por defecto
+#   python comprobar_arranque.py --ms 150
+import argparse
+import os
+import subprocess
+import sys
+
+# Presupuesto de importación de main.py (ms), medido en frío con -X importtime
+PRESUPUESTO_MS = 100
+
+# Paquetes que NO pueden importarse al arrancar la ventana
+PROHIBIDOS = ("numpy", "matplotlib", "reportlab", "PIL")
+
+
+def medir_importacion(modulo="main"):
+    # Devuelve (microsegundos acumulados del módulo, conjunto de módulos importados)
+    carpeta = os.path.dirname(os.path.abspath(__file__))
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=carpeta, capture_output=True, text=True, check=True)
+
+    acumulado = None
+    importados = set()
+    for linea in proceso.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        partes = linea[len("import time:"):].split("|")
+        if len(partes) != 3 or not partes[1].strip().isdigit():
+            continue
+        nombre = partes[2].strip()
+        importados.add(nombre)
+        if nombre == modulo:
+            acumulado = int(partes[1])
+    if acumulado is None:
+        raise RuntimeError(f"No se encontró '{modulo}' en la salida de -X importtime")
+    return acumulado, importados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Comprueba el coste de arranque de main.py")
+    parser.add_argument("--ms", type=float, default=PRESUPUESTO_MS,
+                        help=f"presupuesto en milisegundos (por defecto: {PRESUPUESTO_MS})")
+    parser.add_argument("--repeticiones", type=int, default=3,
+                        help="mediciones a realizar; se usa la mejor (por defecto: 3)")
+    args = parser.parse_args(argv)
+
+    mediciones = [medir_importacion() for _ in range(max(1, args.repeticiones))]
+    mejor_us = min(us for us, _ in mediciones)
+    importados = mediciones[0][1]
+
+    pesados = sorted(m for m in importados if m.split(".")[0] in PROHIBIDOS)
+    ms = mejor_us / 1000
+    print(f"Importar main.py: {ms:.1f} ms (presupuesto {args.ms:.0f} ms)")
+
+    fallo = False
+    if pesados:
+        print("Módulos pesados importados al arrancar: " + ", ".join(pesados[:10]))
+        fallo = True
+    if ms > args.ms:
+        print("Se ha superado el presupuesto de arranque")
+        fallo = True
+    return 1 if fallo else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
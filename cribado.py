@@ -0,0 +1,260 @@
+# ==================== CRIBADO DE VALIDEZ Y CALIDAD DE DATOS (por lotes) ====================
+# Las reglas de validez del informe (PST alto → riesgo de simulación, PSDI > 2.8 → posible
+# dramatización) y los problemas de los datos se revisan aquí para todo un archivo de una
+# vez, sin abrir PDF. Cada bloque se resuelve con operaciones sobre arrays:
+#
+#   faltan          ítems sin respuesta (celda vacía)
+#   fuera_rango     respuestas que no son 0-4 ("5", "-1", "x"...)
+#   plana           todas las respuestas dadas son iguales (con al menos la mitad respondidas)
+#   simulacion      PST por encima del límite del sexo (no se evalúa sin sexo reconocido)
+#   dramatizacion   PSDI por encima del límite
+#   sin_sexo        sexo vacío o no reconocido
+#
+# Las puntuaciones del cribado tratan faltantes y fuera de rango como 0, igual que la
+# ventana al corregir. A diferencia de `puntuar`, aquí no se rechaza ninguna fila por sus
+# respuestas: solo las que no se pueden leer (columnas de más o de menos, JSON roto).
+#
+#   python main.py cribar ingresos_mayo.csv -o banderas.csv --resumen resumen.json
+#
+# La tabla de salida solo lleva las filas con alguna bandera (todas con --todas).
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from puntuacion import N_ITEMS, PLAN
+
+TAM_BLOQUE = 50000
+BANDERAS = ["faltan", "fuera_rango", "plana", "simulacion", "dramatizacion", "sin_sexo"]
+MIN_RESPONDIDAS_PLANA = N_ITEMS // 2
+
+# ids: identificador de cada fila (columna id, nombre o la primera de metadatos); sexos: 'H'/'M'/'';
+# codigos: N×90 bytes, un carácter por ítem ('0'-'9' tal cual, ' ' = vacío, '?' = otro valor)
+BloqueCrudo = namedtuple("BloqueCrudo", "ids sexos codigos rechazos lineas")
+
+_VACIO = ord(" ")
+_CERO = ord("0")
+
+
+def _codigo(campo):
+    campo = campo.strip()
+    if not campo:
+        return " "
+    return campo if len(campo) == 1 else "?"
+
+
+def _texto_codigos(campos):
+    # Camino rápido: 90 campos de un carácter (lo normal); si no, campo a campo. Con algún
+    # campo vacío la longitud total no basta: uno de dos caracteres la compensaría
+    texto = "".join(campos)
+    if len(texto) == N_ITEMS and "" not in campos:
+        return texto.replace("\t", " ")
+    return "".join(_codigo(c) for c in campos)
+
+
+def _cerrar(meta_columnas, metas, textos, rechazos, lineas):
+    from flujo import Bloque
+    from normas_locales import sexos_bloque
+    codigos = (np.frombuffer("".join(textos).encode("ascii", "replace"), dtype=np.uint8).reshape(-1, N_ITEMS)
+               if textos else np.zeros((0, N_ITEMS), dtype=np.uint8))
+    metadatos = Bloque(meta_columnas, metas, None, rechazos)
+    return BloqueCrudo(_identificadores(metadatos), sexos_bloque(metadatos), codigos, rechazos, lineas)
+
+
+def _identificadores(bloque):
+    from archivo_compacto import _columna
+    nombres = [c.strip().lower() for c in bloque.meta_columnas]
+    for candidato in ("id", "nombre"):
+        if candidato in nombres:
+            return _columna(bloque, candidato)
+    return _columna(bloque, nombres[0]) if nombres else [""] * len(bloque.metas)
+
+
+# === LECTURA (sin descartar filas por sus respuestas) ===
+def leer_csv(ruta, tam_bloque=TAM_BLOQUE):
+    from flujo import lector_csv
+    with open(ruta, newline='', encoding='utf-8-sig') as f:
+        lector, cabecera, meta_columnas = lector_csv(f)
+        n_meta = len(meta_columnas)
+        metas, textos, rechazos, lineas = [], [], [], []
+        for n_linea, fila in enumerate(lector, start=2):
+            if len(fila) != len(cabecera):
+                if any(c.strip() for c in fila):
+                    rechazos.append((n_linea, f"{len(fila)} columnas (se esperaban {len(cabecera)})"))
+                continue
+            metas.append(fila[:n_meta])
+            textos.append(_texto_codigos(fila[n_meta:]))
+            lineas.append(n_linea)
+            if len(textos) >= tam_bloque:
+                yield _cerrar(meta_columnas, metas, textos, rechazos, lineas)
+                metas, textos, rechazos, lineas = [], [], [], []
+        if textos or rechazos:
+            yield _cerrar(meta_columnas, metas, textos, rechazos, lineas)
+
+
+def leer_jsonl(ruta, tam_bloque=TAM_BLOQUE):
+    meta_columnas = None
+    metas, textos, rechazos, lineas = [], [], [], []
+    with open(ruta, encoding='utf-8-sig') as f:
+        for n_linea, linea in enumerate(f, start=1):
+            if not linea.strip():
+                continue
+            try:
+                registro = json.loads(linea)
+                respuestas = registro.pop("respuestas")
+            except (ValueError, KeyError, TypeError, AttributeError):
+                rechazos.append((n_linea, "JSON inválido o sin \"respuestas\""))
+                continue
+            if not isinstance(respuestas, list) or len(respuestas) != N_ITEMS:
+                rechazos.append((n_linea, f"se esperaban {N_ITEMS} respuestas"))
+                continue
+            if meta_columnas is None:
+                meta_columnas = list(registro)
+            metas.append(registro)
+            textos.append("".join(_codigo("" if r is None else str(r)) for r in respuestas))
+            lineas.append(n_linea)
+            if len(textos) >= tam_bloque:
+                yield _cerrar(meta_columnas, metas, textos, rechazos, lineas)
+                metas, textos, rechazos, lineas = [], [], [], []
+    if textos or rechazos:
+        yield _cerrar(meta_columnas or [], metas, textos, rechazos, lineas)
+
+
+def leer_scl(ruta, tam_bloque=TAM_BLOQUE):
+    # Un .scl solo guarda respuestas válidas: el cribado se reduce a validez y respuestas planas
+    from archivo_compacto import ArchivoCompacto
+    claves = np.array(["", "H", "M"])
+    fila = 1
+    for registros, matriz in ArchivoCompacto(ruta).recorrer(tam_bloque=tam_bloque):
+        lineas = np.arange(fila, fila + len(matriz))
+        fila += len(matriz)
+        yield BloqueCrudo(np.char.decode(registros["id"], "utf-8", "replace"), claves[registros["sexo"]],
+                          matriz + np.uint8(_CERO), [], lineas)
+
+
+def leer(ruta, tam_bloque=TAM_BLOQUE):
+    from flujo import _formato
+    if ruta.lower().endswith(".scl"):
+        return leer_scl(ruta, tam_bloque)
+    if _formato(ruta) == "jsonl":
+        return leer_jsonl(ruta, tam_bloque)
+    return leer_csv(ruta, tam_bloque)
+
+
+# === REGLAS ===
+def cribar_codigos(codigos, sexos):
+    # codigos N×90 (bytes), sexos 'H'/'M'/'' → (banderas N×6 en el orden de BANDERAS, PST, PSDI)
+    vacio = codigos == _VACIO
+    valores = codigos - np.uint8(_CERO)
+    fuera = ~vacio & (valores > PLAN.maximo)
+    respondida = ~(vacio | fuera)
+    valores = np.where(respondida, valores, 0)
+
+    n_respondidas = respondida.sum(axis=1)
+    minimo = np.where(respondida, valores, 255).min(axis=1)
+    maximo = valores.max(axis=1)
+    plana = (n_respondidas >= MIN_RESPONDIDAS_PLANA) & (minimo == maximo)
+
+    puntuaciones = PLAN.puntuar(valores)
+    validez = PLAN.validez(puntuaciones, sexos)
+    banderas = np.column_stack([vacio.sum(axis=1), fuera.sum(axis=1), plana, validez["simulacion"],
+                                validez["dramatizacion"], sexos == ""]).astype(np.int32)
+    return banderas, puntuaciones["PST"], puntuaciones["PSDI"]
+
+
+class Resumen:
+    def __init__(self):
+        self.filas = 0
+        self.con_banderas = 0
+        self.ilegibles = 0
+        self.banderas = dict.fromkeys(BANDERAS, 0)
+        self.items_faltantes = 0
+
+    def sumar(self, banderas, ilegibles):
+        self.filas += len(banderas)
+        self.ilegibles += ilegibles
+        self.con_banderas += int(banderas.any(axis=1).sum())
+        for b, nombre in enumerate(BANDERAS):
+            self.banderas[nombre] += int((banderas[:, b] > 0).sum())
+        self.items_faltantes += int(banderas[:, 0].sum())
+
+    def a_dict(self):
+        return {"test": PLAN.nombre, "version": PLAN.version, "filas": self.filas,
+                "filas_con_banderas": self.con_banderas, "filas_ilegibles": self.ilegibles,
+                "banderas": self.banderas, "items_faltantes": self.items_faltantes}
+
+    def mostrar(self, segundos, salida=sys.stdout):
+        ritmo = self.filas / segundos if segundos > 0 else 0.0
+        print(f"{self.filas} filas cribadas en {segundos:.1f} s ({ritmo:,.0f} filas/s); "
+              f"{self.con_banderas} con alguna bandera, {self.ilegibles} ilegibles", file=salida)
+        for nombre, n in self.banderas.items():
+            porcentaje = 100 * n / self.filas if self.filas else 0.0
+            print(f"  {nombre:<15}{n:>10}  ({porcentaje:.1f} %)", file=salida)
+
+
+def cribar_archivo(ruta_entrada, ruta_salida, todas=False, tam_bloque=TAM_BLOQUE, ruta_ilegibles=None):
+    # Escribe la tabla de banderas y devuelve el Resumen
+    resumen = Resumen()
+    archivo_ilegibles = open(ruta_ilegibles, "w", encoding="utf-8") if ruta_ilegibles else None
+    try:
+        with open(ruta_salida, "w", newline='', encoding="utf-8") as f:
+            escritor = csv.writer(f)
+            escritor.writerow(["linea", "id", "sexo"] + BANDERAS + ["PST", "PSDI"])
+            for bloque in leer(ruta_entrada, tam_bloque):
+                if archivo_ilegibles:
+                    for n_linea, motivo in bloque.rechazos:
+                        archivo_ilegibles.write(f"{n_linea}\t{motivo}\n")
+                if not len(bloque.codigos):
+                    resumen.ilegibles += len(bloque.rechazos)
+                    continue
+                banderas, pst, psdi = cribar_codigos(bloque.codigos, bloque.sexos)
+                resumen.sumar(banderas, len(bloque.rechazos))
+                filas = np.arange(len(banderas)) if todas else np.flatnonzero(banderas.any(axis=1))
+                if not len(filas):
+                    continue
+                escritor.writerows(
+                    [linea, bloque.ids[i], sexo] + fila + [p, d] for linea, i, sexo, fila, p, d in zip(
+                        np.asarray(bloque.lineas)[filas].tolist(), filas.tolist(), bloque.sexos[filas].tolist(),
+                        banderas[filas].tolist(), pst[filas].tolist(), psdi[filas].tolist()))
+    finally:
+        if archivo_ilegibles:
+            archivo_ilegibles.close()
+    return resumen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="SCL-90-R cribar",
+        description="Criba validez (simulación, dramatización) y calidad de datos (faltantes, fuera de "
+                    "rango, respuestas planas) de un archivo de administraciones.")
+    parser.add_argument("entrada", help="CSV (90 últimas columnas = respuestas), JSONL o .scl")
+    parser.add_argument("-o", "--salida", required=True, help="CSV con la tabla de banderas")
+    parser.add_argument("--todas", action="store_true", help="incluye también las filas sin banderas")
+    parser.add_argument("--resumen", default=None, help="guarda el recuento de banderas en este JSON")
+    parser.add_argument("--ilegibles", default=None, help="archivo donde anotar las filas que no se pueden leer")
+    parser.add_argument("--bloque", type=int, default=TAM_BLOQUE, help=f"filas por bloque (por defecto: {TAM_BLOQUE})")
+    args = parser.parse_args(argv)
+
+    if args.bloque < 1:
+        parser.error("--bloque debe ser al menos 1")
+
+    inicio = time.perf_counter()
+    try:
+        resumen = cribar_archivo(args.entrada, args.salida, args.todas, args.bloque, args.ilegibles)
+        if args.resumen:
+            with open(args.resumen, "w", encoding="utf-8") as f:
+                json.dump(resumen.a_dict(), f, ensure_ascii=False, indent=1)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    resumen.mostrar(time.perf_counter() - inicio)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# ==================== DEFINICIONES DE LOS TESTS (sin NumPy) ====================
+# Solo datos y Python puro: la ventana las usa para la puntuación en vivo sin cargar
+# NumPy al arrancar. instrumentos.py las valida y las compila en planes de puntuación.
+
+# ==================== SCL-90-R ====================
+SCL90R = {
+    "nombre": "SCL-90-R",
+    "version": "1",                 # versión de la definición de escalas (cambiar al corregirla)
+    "n_items": 90,
+    "rango": (0, 4),                # Likert 0-4
+    "indices_globales": True,       # GSI, PST y PSDI
+
+    # Índices de los ítems para cada dimensión (el manual cuenta desde 1)
+    "escalas": {
+        "Somatización":          [1, 4, 12, 27, 40, 42, 48, 49, 52, 53, 56, 58],      # 12 ítems
+        "Obsesividad-Compulsividad": [3, 9, 10, 18, 28, 38, 45, 46, 51, 55],          # 10 ítems
+        "Sensibilidad Interpersonal": [6, 21, 34, 36, 37, 41, 61, 69, 73],           # 9 ítems
+        "Depresión":             [5, 14, 15, 20, 22, 26, 29, 30, 31, 32, 54, 71, 79], # 13 ítems
+        "Ansiedad":              [2, 17, 23, 33, 39, 57, 72, 78, 80, 86],             # 10 ítems
+        "Hostilidad":            [11, 24, 63, 67, 74, 81],                            # 6 ítems
+        "Ansiedad Fóbica":       [13, 25, 47, 50, 70, 75, 82],                        # 7 ítems
+        "Ideación Paranoide":    [8, 18, 43, 68, 76, 83],                             # 6 ítems
+        "Psicotismo":            [7, 16, 35, 62, 77, 84, 85, 87, 88, 90]              # 10 ítems
+    },
+
+    # Ítems ADICIONALES (no entran en las dimensiones, pero sí en los índices globales)
+    "items_adicionales": [19, 44, 59, 60, 64, 66, 89],
+
+    # Excepciones declaradas a propósito para conservar la corrección actual:
+    # el ítem 18 puntúa en dos dimensiones y el 65 en ninguna (la clave original
+    # de Derogatis pone el 65 en Obsesividad-Compulsividad en lugar del 18).
+    "items_compartidos": [18],
+    "items_sin_escala": [65],
+
+    # ====================== NORMAS ESPAÑOLAS (mujeres y hombres) ======================
+    # Medias por ítem para convertir a T (aproximado T=63 ≈ media + 1.5 DT en población joven española)
+    "normas": {
+        "version": "gonzalez-sanguino-2007",
+        "cortes": {
+            "Somatización":          {"H": 1.18, "M": 1.63},
+            "Obsesividad-Compulsividad": {"H": 1.61, "M": 1.99},
+            "Sensibilidad Interpersonal": {"H": 1.37, "M": 1.81},
+            "Depresión":             {"H": 1.43, "M": 1.87},
+            "Ansiedad":              {"H": 1.16, "M": 1.58},
+            "Hostilidad":            {"H": 1.26, "M": 1.60},
+            "Ansiedad Fóbica":       {"H": 0.73, "M": 1.00},
+            "Ideación Paranoide":    {"H": 1.46, "M": 1.56},
+            "Psicotismo":            {"H": 0.97, "M": 1.03},
+        },
+    },
+
+    # ====================== VALIDEZ ======================
+    # PST por encima del límite → riesgo de simulación; PSDI por encima → posible dramatización
+    "validez": {
+        "pst": {"H": 60, "M": 70},
+        "psdi": 2.8,
+    },
+
+    # ====================== CAMBIO FIABLE (Jacobson y Truax, 1991) ======================
+    # Consistencia interna de cada dimensión (Derogatis, 1994) y del GSI para el error típico
+    # de la diferencia entre dos administraciones. Por debajo de "corte_gsi" el GSI deja de
+    # ser caso clínico (el mismo umbral de 1.50 del informe)
+    "cambio": {
+        "fiabilidad": {
+            "Somatización":          0.86,
+            "Obsesividad-Compulsividad": 0.86,
+            "Sensibilidad Interpersonal": 0.86,
+            "Depresión":             0.90,
+            "Ansiedad":              0.85,
+            "Hostilidad":            0.84,
+            "Ansiedad Fóbica":       0.82,
+            "Ideación Paranoide":    0.80,
+            "Psicotismo":            0.77,
+            "GSI":                   0.97,
+        },
+        "corte_gsi": 1.5,
+    },
+}
+
+SEXOS = ("H", "M")
+
+
+def clave_sexo(sexo):
+    # 'Hombre'/'H' → 'H'; cualquier otro valor se corrige con el baremo de mujeres (como siempre)
+    return 'H' if sexo in ('Hombre', 'H') else 'M'
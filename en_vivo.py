@@ -0,0 +1,78 @@
+# ==================== PUNTUACIÓN EN VIVO (mientras se teclea) ====================
+# La ventana muestra medias, GSI, PST y PSDI a medida que se rellenan los ítems. En lugar
+# de recorregir los 90 valores en cada tecla se mantienen sumas por dimensión: un mapa
+# inverso ítem → dimensiones dice qué sumas tocar, así que cada cambio cuesta O(1).
+#
+# Python puro (sin NumPy): se usa desde la ventana antes de que terminen de cargarse los
+# módulos pesados. Los redondeos son los mismos que las tablas de instrumentos.py, de modo
+# que `resultados()` coincide exactamente con puntuacion.resultados_paciente y el informe
+# los reutiliza sin volver a corregir.
+from definiciones import SCL90R, clave_sexo
+
+
+class PuntuacionEnVivo:
+    def __init__(self, definicion=SCL90R):
+        self.dimensiones = list(definicion["escalas"])
+        self.n_items = definicion["n_items"]
+        self.n_items_dim = [len(items) for items in definicion["escalas"].values()]
+        self.cortes = {sexo: [definicion["normas"]["cortes"][dim][sexo] for dim in self.dimensiones]
+                       for sexo in ("H", "M")}
+        self.validez = definicion.get("validez")
+        # Mapa inverso: índice del ítem (base 0) → dimensiones en las que puntúa (el 18 en dos)
+        self.dims_item = [[] for _ in range(self.n_items)]
+        for d, items in enumerate(definicion["escalas"].values()):
+            for item in items:
+                self.dims_item[item - 1].append(d)
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.valores = [None] * self.n_items   # None = sin responder (cuenta como 0, como al corregir)
+        self.sumas = [0] * len(self.dimensiones)
+        self.total = 0
+        self.positivos = 0
+        self.respondidos = 0
+
+    def cambiar(self, item, valor):
+        # item en base 0; valor 0-4 o None. Devuelve True si algo ha cambiado
+        anterior = self.valores[item]
+        if valor == anterior:
+            return False
+        delta = (valor or 0) - (anterior or 0)
+        for d in self.dims_item[item]:
+            self.sumas[d] += delta
+        self.total += delta
+        self.positivos += bool(valor) - bool(anterior)
+        self.respondidos += (valor is not None) - (anterior is not None)
+        self.valores[item] = valor
+        return True
+
+    def medias(self):
+        return [round(s / n, 2) for s, n in zip(self.sumas, self.n_items_dim)]
+
+    def globales(self):
+        gsi = round(self.total / self.n_items, 2)
+        psdi = round(self.total / self.positivos, 2) if self.positivos else 0.0
+        return gsi, self.positivos, psdi
+
+    def clinicas(self, sexo):
+        # Dimensión por dimensión: ¿media ≥ corte del sexo?
+        return [m >= c for m, c in zip(self.medias(), self.cortes[clave_sexo(sexo)])]
+
+    def avisos(self, sexo):
+        # (riesgo de simulación, posible dramatización) con las reglas del informe
+        if self.validez is None:
+            return False, False
+        _, pst, psdi = self.globales()
+        return pst > self.validez["pst"][clave_sexo(sexo)], psdi > self.validez["psdi"]
+
+    def respuestas(self):
+        return [v or 0 for v in self.valores]
+
+    def resultados(self):
+        # (resultados, sub_sumas) con la misma forma que puntuacion.resultados_paciente
+        resultados = {}
+        for dim, suma, media, n in zip(self.dimensiones, self.sumas, self.medias(), self.n_items_dim):
+            resultados[dim] = {"bruto": float(suma), "media": media, "n_items": n}
+        gsi, pst, psdi = self.globales()
+        resultados["Índices Globales"] = {"GSI": gsi, "PST": pst, "PSDI": psdi}
+        return resultados, [float(s) for s in self.sumas]
@@ -0,0 +1,301 @@
+# ==================== EVOLUCIÓN ENTRE ADMINISTRACIONES (cambio fiable) ====================
+# Durante el tratamiento el mismo paciente rellena el SCL-90-R varias veces. Aquí se leen
+# todas sus administraciones (de un archivo o de una carpeta con varios) y, para cada
+# paciente, se compara la primera con la última en cada dimensión y en el GSI:
+#
+#   RCI = (última - primera) / Sdif,   Sdif = √2 · DT · √(1 - fiabilidad)   (Jacobson y Truax, 1991)
+#
+#   empeorado    RCI ≥ 1.96
+#   mejorado     RCI ≤ -1.96
+#   recuperado   mejorado y además pasa de ≥ corte de normas_es a < corte (cambio
+#                clínicamente significativo); en el GSI el corte es 1.50
+#   sin_cambio   el resto
+#
+# La fiabilidad de cada escala está en la definición del test (definiciones.py). La DT es
+# la de las primeras administraciones de todos los pacientes del archivo o, con --normas,
+# la de unos baremos locales.
+#
+# Todo se hace a la vez para todos los pacientes: las administraciones se ordenan por
+# (paciente, fecha) con un solo lexsort y cada paciente es un tramo contiguo; la primera
+# y la última son índices de principio y fin de tramo, sin bucles por paciente.
+#
+#   python main.py evolucion seguimiento/ -o cambios.csv --resumen resumen.json
+#   python main.py evolucion seguimiento.csv -o cambios.csv --informe P0123 P0123.pdf
+#
+# El paciente se identifica por la columna id o, si no la hay, por el nombre. A igual
+# fecha (o sin fechas) se respeta el orden de los archivos.
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from archivo_compacto import _codificar, _columna, fecha_numero, fecha_texto
+from flujo import TAM_BLOQUE, leer_bloques
+from normas_locales import sexos_bloque
+from puntuacion import COLUMNAS, DIMENSIONES, PLAN, matriz_puntuaciones, puntuar_lote
+
+Z_FIABLE = 1.96
+CATEGORIAS = ("empeorado", "sin_cambio", "mejorado", "recuperado")
+EMPEORADO, SIN_CAMBIO, MEJORADO, RECUPERADO = range(len(CATEGORIAS))
+SIN_DATOS = -1   # una sola administración o sin desviación típica
+
+# Columnas comparadas: las 9 dimensiones y el GSI (las primeras de COLUMNAS)
+COLUMNAS_CAMBIO = DIMENSIONES + ["GSI"]
+_INDICES_CAMBIO = [COLUMNAS.index(c) for c in COLUMNAS_CAMBIO]
+
+EXTENSIONES = (".csv", ".jsonl", ".ndjson", ".scl")
+
+# ids: paciente de cada fila; fechas: AAAAMMDD (0 = desconocida); sexos: 'H'/'M'/'';
+# puntuaciones: N×12 en el orden de COLUMNAS
+Administraciones = namedtuple("Administraciones", "ids fechas sexos puntuaciones")
+
+# Lo que necesita la página de evolución del informe de un paciente: fechas en texto y
+# puntuaciones K×12 de sus K administraciones, y el RCI y la categoría (texto, '' sin datos)
+# de cada columna de COLUMNAS_CAMBIO
+Historia = namedtuple("Historia", "fechas puntuaciones rci cambios")
+
+
+def archivos(entradas):
+    # Rutas de archivos; las carpetas se sustituyen por sus CSV/JSONL/.scl en orden alfabético
+    rutas = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            rutas += sorted(os.path.join(entrada, nombre) for nombre in os.listdir(entrada)
+                            if nombre.lower().endswith(EXTENSIONES))
+        else:
+            rutas.append(entrada)
+    if not rutas:
+        raise ValueError("No hay ningún archivo de administraciones en " + ", ".join(entradas))
+    return rutas
+
+
+def _identificadores(bloque):
+    # Columna id; si no hay, el nombre normalizado (mayúsculas y espacios no cuentan)
+    nombres = [c.strip().lower() for c in bloque.meta_columnas]
+    if "id" in nombres:
+        return np.array([i.strip() for i in _columna(bloque, "id")])
+    if "nombre" in nombres:
+        return np.array([" ".join(n.lower().split()) for n in _columna(bloque, "nombre")])
+    raise ValueError("El archivo no tiene columna id ni nombre para agrupar las administraciones por paciente")
+
+
+def _columna_meta(bloque, campo):
+    # Dato de la persona evaluada con los mismos alias de cabecera que el modo lote
+    # (p. ej. "evaluador" o "terapeuta" para el terapeuta)
+    from lote import COLUMNAS_META
+    nombres = [c.strip().lower() for c in bloque.meta_columnas]
+    return _columna(bloque, next((n for n in nombres if COLUMNAS_META.get(n) == campo), campo))
+
+
+def leer(rutas, tam_bloque=TAM_BLOQUE, paciente=None, salida_errores=sys.stderr):
+    # Devuelve (Administraciones en el orden de los archivos, filas rechazadas, filas sin id, crudas).
+    # crudas: {posición: (nombre, sexo, fecha, terapeuta, respuestas)} de las filas de `paciente`,
+    # para poder generar su informe sin volver a leer
+    ids, fechas, sexos, puntuaciones = [], [], [], []
+    crudas = {}
+    rechazadas = sin_id = total = 0
+    for ruta in rutas:
+        for bloque in leer_bloques(ruta, tam_bloque):
+            for n_linea, motivo in bloque.rechazos:
+                print(f"{ruta}, línea {n_linea}: {motivo}", file=salida_errores)
+            rechazadas += len(bloque.rechazos)
+            if not len(bloque.matriz):
+                continue
+            identificadores = _identificadores(bloque)
+            con_id = np.flatnonzero(identificadores != "")
+            sin_id += len(identificadores) - len(con_id)
+            ids.append(identificadores[con_id])
+            fechas.append(np.array(_codificar(_columna(bloque, "fecha"), fecha_numero), dtype=np.uint32)[con_id])
+            sexos.append(sexos_bloque(bloque)[con_id])
+            puntuaciones.append(matriz_puntuaciones(puntuar_lote(bloque.matriz[con_id])))
+
+            if paciente is not None:
+                suyas = np.flatnonzero(ids[-1] == paciente).tolist()
+                if suyas:
+                    columnas = [_columna_meta(bloque, c) for c in ("nombre", "sexo", "fecha", "terapeuta")]
+                    for j in suyas:
+                        fila = int(con_id[j])
+                        crudas[total + j] = tuple(c[fila] for c in columnas) + (bloque.matriz[fila].tolist(),)
+            total += len(con_id)
+
+    if not total:
+        raise ValueError("No hay ninguna administración con paciente identificado")
+    return (Administraciones(np.concatenate(ids), np.concatenate(fechas), np.concatenate(sexos),
+                             np.concatenate(puntuaciones)), rechazadas, sin_id, crudas)
+
+
+def desviacion_basal(primeras):
+    # DT de cada columna en las primeras administraciones, la misma para los dos sexos (2×10)
+    if len(primeras) < 2:
+        return np.full((2, len(COLUMNAS_CAMBIO)), np.nan)
+    return np.tile(primeras.std(axis=0, ddof=1), (2, 1))
+
+
+def desviacion_normas(normas):
+    # DT por sexo (fila 0 = H, fila 1 = M) de unos baremos locales (2×10)
+    return normas.desviacion()[:, _INDICES_CAMBIO]
+
+
+class Evolucion:
+    # Administraciones ordenadas por paciente y fecha y el cambio de la primera a la
+    # última de cada paciente. Arrays por paciente (P filas) en el orden de `pacientes`
+    def __init__(self, administraciones, desviaciones=None, z=Z_FIABLE):
+        # desviaciones: 2×10 (por sexo y columna de COLUMNAS_CAMBIO); None = desviacion_basal
+        self.pacientes, paciente = np.unique(administraciones.ids, return_inverse=True)
+        # lexsort es estable: a igual fecha se conserva el orden de los archivos
+        self.orden = np.lexsort((administraciones.fechas, paciente))
+        self.fechas = administraciones.fechas[self.orden]
+        self.puntuaciones = administraciones.puntuaciones[self.orden]
+        self.n = np.bincount(paciente, minlength=len(self.pacientes))
+        self.inicio = np.cumsum(self.n) - self.n
+        self.fin = self.inicio + self.n - 1
+
+        # Sexo del paciente: el conocido en cualquiera de sus administraciones
+        codigos = np.searchsorted(np.array(["", "H", "M"]), administraciones.sexos[self.orden])
+        self.sexos = np.array(["", "H", "M"])[np.maximum.reduceat(codigos, self.inicio)]
+        fila_sexo = np.where(self.sexos == "H", 0, 1)   # sin sexo → baremo de mujeres, como al corregir
+
+        columnas = self.puntuaciones[:, _INDICES_CAMBIO]
+        self.primera = columnas[self.inicio]
+        self.ultima = columnas[self.fin]
+
+        if desviaciones is None:
+            desviaciones = desviacion_basal(self.primera)
+        self.desviaciones = desviaciones
+        error_diferencia = np.sqrt(2) * desviaciones * np.sqrt(1 - PLAN.fiabilidad)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rci = (self.ultima - self.primera) / error_diferencia[fila_sexo]
+        calculable = (self.n >= 2)[:, np.newaxis] & (error_diferencia[fila_sexo] > 0)
+        self.rci = np.where(calculable, rci, np.nan)
+
+        cortes = PLAN.cortes_cambio[fila_sexo]
+        sale = (self.primera >= cortes) & (self.ultima < cortes)
+        self.categorias = np.select(
+            [~calculable, self.rci >= z, (self.rci <= -z) & sale, self.rci <= -z],
+            [SIN_DATOS, EMPEORADO, RECUPERADO, MEJORADO], SIN_CAMBIO).astype(np.int8)
+
+    def __len__(self):
+        return len(self.pacientes)
+
+    def con_seguimiento(self):
+        return int((self.n >= 2).sum())
+
+    def recuentos(self):
+        # 10×4: pacientes de cada categoría (en el orden de CATEGORIAS) por columna
+        return (self.categorias[:, :, np.newaxis] == np.arange(len(CATEGORIAS))).sum(axis=0)
+
+    def indice(self, paciente):
+        p = int(np.searchsorted(self.pacientes, paciente))
+        if p == len(self.pacientes) or self.pacientes[p] != paciente:
+            raise ValueError(f"No hay ninguna administración del paciente '{paciente}'")
+        return p
+
+    def historia(self, p):
+        tramo = slice(self.inicio[p], self.fin[p] + 1)
+        return Historia([fecha_texto(f) for f in self.fechas[tramo].tolist()], self.puntuaciones[tramo],
+                        self.rci[p].tolist(), [(CATEGORIAS + ("",))[c] for c in self.categorias[p].tolist()])
+
+    def ultima_posicion(self, p):
+        # Posición (en el orden de lectura) de la última administración del paciente
+        return int(self.orden[self.fin[p]])
+
+    def escribir(self, ruta):
+        # Una fila por paciente: primera y última puntuación, RCI y categoría de cada columna
+        cabecera = ["id", "sexo", "administraciones", "fecha_inicial", "fecha_final"]
+        for c in COLUMNAS_CAMBIO:
+            cabecera += [f"{c} inicial", f"{c} final", f"RCI {c}", f"cambio {c}"]
+        textos = np.array(CATEGORIAS + ("",))[self.categorias].tolist()
+        rci = np.round(self.rci, 2).tolist()
+        fechas_ini = _codificar(self.fechas[self.inicio].tolist(), fecha_texto)
+        fechas_fin = _codificar(self.fechas[self.fin].tolist(), fecha_texto)
+        with open(ruta, "w", newline='', encoding="utf-8") as f:
+            escritor = csv.writer(f)
+            escritor.writerow(cabecera)
+            for fila in zip(self.pacientes.tolist(), self.sexos.tolist(), self.n.tolist(), fechas_ini, fechas_fin,
+                            self.primera.tolist(), self.ultima.tolist(), rci, textos):
+                valores = []
+                for cuatro in zip(fila[5], fila[6], fila[7], fila[8]):
+                    valores += [cuatro[0], cuatro[1], "" if cuatro[2] != cuatro[2] else cuatro[2], cuatro[3]]
+                escritor.writerow(list(fila[:5]) + valores)
+
+    def a_dict(self, administraciones, origen_desviacion):
+        recuentos = self.recuentos().tolist()
+        return {"test": PLAN.nombre, "version": PLAN.version, "version_baremos": PLAN.version_normas,
+                "administraciones": administraciones, "pacientes": len(self),
+                "con_seguimiento": self.con_seguimiento(), "desviacion": origen_desviacion,
+                "z": Z_FIABLE,
+                "cambio": {c: dict(zip(CATEGORIAS, n)) for c, n in zip(COLUMNAS_CAMBIO, recuentos)}}
+
+    def mostrar(self, salida=sys.stdout):
+        seguimiento = max(self.con_seguimiento(), 1)
+        print(f"{'':<28}" + "".join(f"{c:>13}" for c in CATEGORIAS), file=salida)
+        for c, fila in zip(COLUMNAS_CAMBIO, self.recuentos().tolist()):
+            print(f"  {c:<26}" + "".join(f"{n:>6} ({100 * n / seguimiento:3.0f}%)" for n in fila), file=salida)
+
+
+def generar_informe_paciente(evolucion, crudas, paciente, ruta_pdf, motor_pdf=None):
+    # Informe de la última administración del paciente con la página de evolución
+    from informe import generar_informe
+    from lote import SEXOS
+    p = evolucion.indice(paciente)
+    nombre, sexo, fecha, terapeuta, respuestas = crudas[evolucion.ultima_posicion(p)]
+    generar_informe(ruta_pdf, nombre or paciente, SEXOS.get(sexo.strip().lower(), sexo), fecha, terapeuta,
+                    respuestas, motor_grafica="vectorial", motor_pdf=motor_pdf, evolucion=evolucion.historia(p))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="SCL-90-R evolucion",
+        description="Cambio fiable (RCI) y clínicamente significativo de cada paciente entre su primera y "
+                    "su última administración.")
+    parser.add_argument("entradas", nargs="+",
+                        help="CSV, JSONL o .scl con columnas id (o nombre) y fecha; o carpetas que los contengan")
+    parser.add_argument("-o", "--salida", required=True, help="CSV con una fila por paciente")
+    parser.add_argument("--resumen", default=None, help="guarda los recuentos por categoría en este JSON")
+    parser.add_argument("--normas", default=None,
+                        help="baremos locales (JSON de `normas construir`) de los que tomar la desviación típica; "
+                             "por defecto, la de las primeras administraciones")
+    parser.add_argument("--informe", nargs=2, metavar=("ID", "PDF"), default=None,
+                        help="genera el informe de la última administración del paciente (ID tal como sale en la "
+                             "columna id de la salida) con su evolución")
+    parser.add_argument("--pdf", choices=("platypus", "canvas"), default=None, help="motor del PDF de --informe")
+    parser.add_argument("--bloque", type=int, default=TAM_BLOQUE, help=f"filas por bloque (por defecto: {TAM_BLOQUE})")
+    args = parser.parse_args(argv)
+
+    if args.bloque < 1:
+        parser.error("--bloque debe ser al menos 1")
+
+    inicio = time.perf_counter()
+    paciente = args.informe[0].strip() if args.informe else None
+    try:
+        desviaciones, origen = None, "primeras administraciones"
+        if args.normas:
+            from normas_locales import NormasLocales
+            normas = NormasLocales.cargar(args.normas)
+            desviaciones, origen = desviacion_normas(normas), f"baremos locales {normas.huella()}"
+        administraciones, rechazadas, sin_id, crudas = leer(archivos(args.entradas), args.bloque, paciente)
+        evolucion = Evolucion(administraciones, desviaciones)
+        evolucion.escribir(args.salida)
+        if args.resumen:
+            with open(args.resumen, "w", encoding="utf-8") as f:
+                json.dump(evolucion.a_dict(len(administraciones.ids), origen), f, ensure_ascii=False, indent=1)
+        if paciente is not None:
+            generar_informe_paciente(evolucion, crudas, paciente, args.informe[1], args.pdf)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    segundos = time.perf_counter() - inicio
+    print(f"{len(administraciones.ids)} administraciones de {len(evolucion)} pacientes en {segundos:.1f} s; "
+          f"{evolucion.con_seguimiento()} con seguimiento, {rechazadas} filas con error, {sin_id} sin id")
+    evolucion.mostrar()
+    return 1 if rechazadas or sin_id else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
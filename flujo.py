@@ -0,0 +1,320 @@
+# ==================== CORRECCIÓN EN FLUJO (archivos muy grandes) ====================
+# Lee CSV o JSONL por bloques de tamaño fijo, valida el rango Likert 0-4 de forma
+# vectorizada, corrige cada bloque con el motor de puntuacion y va escribiendo los
+# resultados. La memoria máxima depende del tamaño de bloque, no del archivo.
+#
+#   python main.py puntuar historico.csv puntuaciones.csv --bloque 20000
+#
+# CSV: las 90 últimas columnas son las respuestas; las anteriores (nombre, id, sexo...)
+#      se copian tal cual a la salida.
+# JSONL: un objeto por línea con la lista "respuestas"; el resto de claves se copian.
+# .scl: archivo compacto de archivo_compacto.py (columnas id, sexo, fecha).
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from puntuacion import COLUMNAS, N_ITEMS, matriz_puntuaciones, puntuar_lote
+from traza import tramo
+
+TAM_BLOQUE = 10000
+
+# meta_columnas: nombres de las columnas copiadas; metas: una lista (CSV) o dict (JSONL) por fila
+# válida; matriz: respuestas N×90 (uint8); rechazos: [(línea, motivo)]; lineas: número de
+# línea de cada fila válida (None si la fuente no tiene líneas)
+Bloque = namedtuple("Bloque", "meta_columnas metas matriz rechazos lineas", defaults=(None,))
+
+_CERO = ord("0")
+_PST = COLUMNAS.index("PST")
+
+
+def _formato(ruta):
+    return "jsonl" if ruta.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def _matriz(textos):
+    # 90 dígitos por fila → matriz N×90 de una sola vez (sin int() por ítem)
+    if not textos:
+        return np.zeros((0, N_ITEMS), dtype=np.uint8)
+    return (np.frombuffer("".join(textos).encode("ascii", "replace"), dtype=np.uint8)
+            .reshape(-1, N_ITEMS) - _CERO)
+
+
+def _cerrar_bloque(meta_columnas, metas, textos, lineas, rechazos):
+    matriz = _matriz(textos)
+    # Validación Likert vectorizada (la misma regla que _validar_likert): solo 0-4.
+    # Los caracteres que no son dígito quedan fuera de 0-4 al restar '0' en uint8.
+    fuera = (matriz > 4).any(axis=1)
+    if fuera.any():
+        for i in np.flatnonzero(fuera).tolist():
+            item = int(np.argmax(matriz[i] > 4))
+            rechazos.append((lineas[i], f"respuesta {item+1} fuera del rango 0-4"))
+        validas = ~fuera
+        matriz = matriz[validas]
+        metas = [m for m, ok in zip(metas, validas.tolist()) if ok]
+        lineas = [n for n, ok in zip(lineas, validas.tolist()) if ok]
+    return Bloque(meta_columnas, metas, matriz, rechazos, lineas)
+
+
+def _texto_respuestas(campos):
+    # Camino rápido: 90 campos de un solo carácter. Si no, se limpian espacios uno a uno.
+    texto = "".join(campos)
+    if len(texto) == N_ITEMS and "" not in campos:
+        return texto
+    campos = [c.strip() for c in campos]
+    texto = "".join(campos)
+    if len(texto) == N_ITEMS and "" not in campos:
+        return texto
+    return None
+
+
+def leer_bloques_csv(ruta, tam_bloque=TAM_BLOQUE):
+    with open(ruta, newline='', encoding='utf-8-sig') as f:
+        yield from _bloques_csv(f, tam_bloque)
+
+
+def lector_csv(f):
+    # (lector, cabecera, columnas de metadatos): las N_ITEMS últimas columnas son las respuestas
+    muestra = f.read(4096)
+    f.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+    except csv.Error:
+        dialecto = csv.excel
+    lector = csv.reader(f, dialecto)
+
+    cabecera = next(lector, [])
+    n_meta = len(cabecera) - N_ITEMS
+    if n_meta < 0:
+        raise ValueError(f"La cabecera tiene {len(cabecera)} columnas; se necesitan al menos {N_ITEMS}")
+    return lector, cabecera, [c.strip() for c in cabecera[:n_meta]]
+
+
+def _bloques_csv(f, tam_bloque, primera_linea=2):
+    # `primera_linea`: número de línea del archivo original de la primera fila de datos
+    lector, cabecera, meta_columnas = lector_csv(f)
+    n_meta = len(meta_columnas)
+
+    metas, textos, lineas, rechazos = [], [], [], []
+    for n_linea, fila in enumerate(lector, start=primera_linea):
+        if len(fila) != len(cabecera):
+            if any(c.strip() for c in fila):
+                rechazos.append((n_linea, f"{len(fila)} columnas (se esperaban {len(cabecera)})"))
+            continue
+        texto = _texto_respuestas(fila[n_meta:])
+        if texto is None:
+            rechazos.append((n_linea, "respuestas vacías o de más de un dígito"))
+            continue
+        metas.append(fila[:n_meta])
+        textos.append(texto)
+        lineas.append(n_linea)
+        if len(textos) >= tam_bloque:
+            yield _cerrar_bloque(meta_columnas, metas, textos, lineas, rechazos)
+            metas, textos, lineas, rechazos = [], [], [], []
+    if textos or rechazos:
+        yield _cerrar_bloque(meta_columnas, metas, textos, lineas, rechazos)
+
+
+def leer_bloques_jsonl(ruta, tam_bloque=TAM_BLOQUE):
+    with open(ruta, encoding='utf-8-sig') as f:
+        yield from _bloques_jsonl(f, tam_bloque)
+
+
+def _bloques_jsonl(f, tam_bloque, primera_linea=1):
+    meta_columnas = None
+    metas, textos, lineas, rechazos = [], [], [], []
+    for n_linea, linea in enumerate(f, start=primera_linea):
+        if not linea.strip():
+            continue
+        try:
+            registro = json.loads(linea)
+            respuestas = registro.pop("respuestas")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            rechazos.append((n_linea, "JSON inválido o sin \"respuestas\""))
+            continue
+        if not isinstance(respuestas, list) or len(respuestas) != N_ITEMS:
+            rechazos.append((n_linea, f"se esperaban {N_ITEMS} respuestas"))
+            continue
+        texto = _texto_respuestas([str(r) for r in respuestas])
+        if texto is None:
+            rechazos.append((n_linea, "respuestas vacías o de más de un dígito"))
+            continue
+        if meta_columnas is None:
+            meta_columnas = list(registro)
+        metas.append(registro)
+        textos.append(texto)
+        lineas.append(n_linea)
+        if len(textos) >= tam_bloque:
+            yield _cerrar_bloque(meta_columnas, metas, textos, lineas, rechazos)
+            metas, textos, lineas, rechazos = [], [], [], []
+    if textos or rechazos:
+        yield _cerrar_bloque(meta_columnas or [], metas, textos, lineas, rechazos)
+
+
+def leer_bloques_rango(ruta, inicio, fin, primera_linea, tam_bloque=TAM_BLOQUE):
+    # Solo las líneas entre los bytes `inicio` y `fin` (alineados a principio de línea) de
+    # un CSV/JSONL; en CSV se antepone la cabecera. Sirve para repartir un archivo en trozos
+    with open(ruta, "rb") as f:
+        cabecera = f.readline().decode("utf-8-sig") if _formato(ruta) == "csv" else ""
+        f.seek(inicio)
+        datos = f.read(fin - inicio).decode("utf-8")
+    if _formato(ruta) == "jsonl":
+        return _bloques_jsonl(io.StringIO(datos), tam_bloque, primera_linea)
+    return _bloques_csv(io.StringIO(cabecera + datos), tam_bloque, primera_linea)
+
+
+def leer_bloques(ruta, tam_bloque=TAM_BLOQUE):
+    if ruta.lower().endswith(".scl"):
+        from archivo_compacto import leer_bloques as leer_bloques_scl
+        return leer_bloques_scl(ruta, tam_bloque)
+    if _formato(ruta) == "jsonl":
+        return leer_bloques_jsonl(ruta, tam_bloque)
+    return leer_bloques_csv(ruta, tam_bloque)
+
+
+def puntuar_bloques(bloques):
+    # Añade a cada bloque su matriz N×12 de puntuaciones (COLUMNAS)
+    for bloque in bloques:
+        with tramo("flujo.puntuar_bloque", filas=len(bloque.matriz)):
+            puntuaciones = matriz_puntuaciones(puntuar_lote(bloque.matriz))
+        yield bloque, puntuaciones
+
+
+class EscritorResultados:
+    # Escribe bloques puntuados en CSV o JSONL según la extensión de la ruta.
+    # `columnas`: nombres de las columnas de la matriz de puntuaciones (por defecto COLUMNAS)
+    def __init__(self, ruta, columnas=COLUMNAS):
+        self.columnas = list(columnas)
+        self.huecos = len(self.columnas) > len(COLUMNAS)  # T y percentiles pueden ser NaN
+        self.formato = _formato(ruta)
+        self.archivo = open(ruta, "w", newline='', encoding='utf-8')
+        self.escritor = csv.writer(self.archivo) if self.formato == "csv" else None
+        self.meta_columnas = None
+
+    def escribir(self, bloque, puntuaciones):
+        filas = puntuaciones.tolist()
+        if self.huecos:
+            vacio = None if self.formato == "jsonl" else ""
+            filas = [[vacio if v != v else v for v in fila] for fila in filas]
+        if self.formato == "jsonl":
+            for meta, valores in zip(bloque.metas, filas):
+                registro = dict(meta) if isinstance(meta, dict) else dict(zip(bloque.meta_columnas, meta))
+                registro.update(zip(self.columnas, valores))
+                registro["PST"] = int(registro["PST"])
+                self.archivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            return
+
+        if self.meta_columnas is None:
+            self.meta_columnas = list(bloque.meta_columnas)
+            self.escritor.writerow(self.meta_columnas + self.columnas)
+        for meta, valores in zip(bloque.metas, filas):
+            if isinstance(meta, dict):
+                meta = [meta.get(c, "") for c in self.meta_columnas]
+            valores[_PST] = int(valores[_PST])
+            self.escritor.writerow(list(meta) + valores)
+
+    def cerrar(self):
+        self.archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def columnas_normas():
+    return [f"T {c}" for c in COLUMNAS] + [f"Pc {c}" for c in COLUMNAS]
+
+
+def con_normas(bloques, normas):
+    # Añade a la matriz de cada bloque la puntuación T y el percentil de cada columna
+    # según unos baremos locales (NaN en las filas sin sexo reconocido)
+    from normas_locales import sexos_bloque
+    for bloque, puntuaciones in bloques:
+        sexos = sexos_bloque(bloque)
+        extra = np.full((len(puntuaciones), 2 * len(COLUMNAS)), np.nan)
+        validas = sexos != ""
+        if validas.any():
+            extra[validas, :len(COLUMNAS)] = np.round(normas.puntuaciones_t(puntuaciones[validas], sexos[validas]), 1)
+            extra[validas, len(COLUMNAS):] = np.round(normas.percentiles(puntuaciones[validas], sexos[validas]), 1)
+        yield bloque, np.hstack([puntuaciones, extra])
+
+
+def procesar_archivo(ruta_entrada, ruta_salida, tam_bloque=TAM_BLOQUE, ruta_rechazos=None,
+                     progreso=sys.stderr, normas=None):
+    # Devuelve (filas corregidas, filas rechazadas, segundos)
+    corregidas = rechazadas = 0
+    inicio = time.perf_counter()
+    archivo_rechazos = open(ruta_rechazos, "w", encoding='utf-8') if ruta_rechazos else None
+    try:
+        bloques = puntuar_bloques(leer_bloques(ruta_entrada, tam_bloque))
+        columnas = COLUMNAS
+        if normas is not None:
+            bloques = con_normas(bloques, normas)
+            columnas = COLUMNAS + columnas_normas()
+        with EscritorResultados(ruta_salida, columnas) as escritor:
+            for bloque, puntuaciones in bloques:
+                escritor.escribir(bloque, puntuaciones)
+                corregidas += len(bloque.matriz)
+                rechazadas += len(bloque.rechazos)
+                if archivo_rechazos:
+                    for n_linea, motivo in bloque.rechazos:
+                        archivo_rechazos.write(f"{n_linea}\t{motivo}\n")
+                if progreso:
+                    segundos = time.perf_counter() - inicio
+                    ritmo = corregidas / segundos if segundos > 0 else 0.0
+                    print(f"\r{corregidas} filas ({ritmo:,.0f} filas/s), {rechazadas} con error",
+                          end="", file=progreso, flush=True)
+    finally:
+        if archivo_rechazos:
+            archivo_rechazos.close()
+    if progreso:
+        print(file=progreso)
+    return corregidas, rechazadas, time.perf_counter() - inicio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="SCL-90-R puntuar",
+        description="Corrige por bloques un CSV/JSONL de administraciones sin cargarlo entero en memoria.")
+    parser.add_argument("entrada", help="CSV (90 últimas columnas = respuestas) o JSONL con \"respuestas\"")
+    parser.add_argument("salida", help="archivo de puntuaciones (.csv o .jsonl)")
+    parser.add_argument("--bloque", type=int, default=TAM_BLOQUE,
+                        help=f"filas por bloque (por defecto: {TAM_BLOQUE})")
+    parser.add_argument("--rechazos", default=None, help="archivo donde anotar las filas con error")
+    parser.add_argument("--normas", default=None,
+                        help="baremos locales (JSON de `normas construir`): añade T y percentil por columna; "
+                             "necesita una columna sexo")
+    args = parser.parse_args(argv)
+
+    if args.bloque < 1:
+        parser.error("--bloque debe ser al menos 1")
+    if os.path.abspath(args.entrada) == os.path.abspath(args.salida):
+        parser.error("la salida no puede ser el mismo archivo que la entrada")
+
+    try:
+        normas = None
+        if args.normas:
+            from normas_locales import NormasLocales
+            normas = NormasLocales.cargar(args.normas)
+        corregidas, rechazadas, segundos = procesar_archivo(
+            args.entrada, args.salida, args.bloque, args.rechazos, normas=normas)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    ritmo = corregidas / segundos if segundos > 0 else 0.0
+    print(f"{corregidas} filas corregidas en {segundos:.1f} s ({ritmo:,.0f} filas/s), "
+          f"{rechazadas} filas con error")
+    return 1 if rechazadas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
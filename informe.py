@@ -0,0 +1,501 @@
+# ==================== GENERACIÓN DEL INFORME (sin interfaz gráfica) ====================
+# Gráfica de perfil y PDF del SCL-90-R. No usa Tk ni messagebox: los errores se
+# lanzan como excepciones para que quien llame (ventana o modo lote) los muestre.
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib import colors
+from reportlab import rl_config
+import io
+import os
+
+from instrumentos import SEXOS, clave_sexo
+from puntuacion import DIMENSIONES, N_ITEMS_DIM, PLAN, cortes_clinicos
+from traza import tramo
+
+# Flujos del PDF en binario (zlib) en lugar de ASCII85: el PNG de la gráfica tarda
+# ~4 veces menos en incrustarse y el PDF pesa un 20 % menos. Todos los visores lo leen.
+rl_config.useA85 = 0
+
+# Motores de la gráfica de perfil:
+#   "matplotlib" → PNG a 200 dpi incrustado como imagen (el de siempre)
+#   "vectorial"  → dibujo nativo de ReportLab, sin importar matplotlib (más rápido y PDF más pequeño)
+MOTORES_GRAFICA = ("matplotlib", "vectorial")
+MOTOR_GRAFICA = os.environ.get("SCL90_GRAFICA", "matplotlib")
+
+# Motores del PDF:
+#   "platypus" → SimpleDocTemplate con párrafos y tablas (el de siempre)
+#   "canvas"   → mismo diseño dibujado con coordenadas fijas (informe_rapido.py), mucho más rápido
+MOTORES_PDF = ("platypus", "canvas")
+MOTOR_PDF = os.environ.get("SCL90_PDF", "platypus")
+
+# Tamaño de la gráfica dentro del PDF (puntos)
+ANCHO_GRAFICA, ALTO_GRAFICA = 500, 300
+
+COLOR_CLINICO = "#fc988d"
+COLOR_NORMAL = "#0078d4"
+COLOR_CORTE = "#fc1900"
+
+_estilos = None
+
+
+def estilos():
+    # getSampleStyleSheet() crea ~20 ParagraphStyle en cada llamada: una vez por proceso basta
+    global _estilos
+    if _estilos is None:
+        _estilos = getSampleStyleSheet()
+    return _estilos
+
+
+def asunto_pdf(normas=None):
+    # Versión de las escalas y de los baremos con que se corrigió, en los metadatos del PDF
+    asunto = f"{PLAN.nombre}; escalas v{PLAN.version}; baremos {PLAN.version_normas}"
+    return asunto + (f"; baremos locales {normas.huella()}" if normas is not None else "")
+
+
+def generar_grafica(sub_sumas, sexo, motor=None):
+    # Devuelve lo que generar_pdf sabe incrustar: un PNG (BytesIO) o un Drawing de ReportLab
+    motor = motor or MOTOR_GRAFICA
+    if motor == "matplotlib":
+        with tramo("grafica", motor=motor):
+            return generar_grafica_barras(sub_sumas, sexo)
+    if motor == "vectorial":
+        with tramo("grafica", motor=motor):
+            return generar_grafica_vectorial(sub_sumas, sexo)
+    raise ValueError(f"Motor de gráfica desconocido: '{motor}' (opciones: {', '.join(MOTORES_GRAFICA)})")
+
+
+def generar_grafica_barras(sub_sumas, sexo):
+    # matplotlib se importa solo aquí. Figure (sin pyplot) no elige backend de ventana
+    # y es seguro fuera del hilo de Tk
+    with tramo("grafica.importar_matplotlib"):
+        from matplotlib.figure import Figure
+
+    # Barras con cortes clínicos
+    etiquetas = list(DIMENSIONES)
+
+    # Medias por dimensión
+    n_items = N_ITEMS_DIM.tolist()
+    medias = [sub_sumas[i] / n_items[i] for i in range(len(etiquetas))]
+
+    # Cortes clínicos
+    cortes = cortes_clinicos(sexo)
+
+    with tramo("grafica.figura"):
+        fig2 = Figure(figsize=(11, 6))
+        ax2 = fig2.subplots()
+        colores = [COLOR_CLINICO if m >= c else COLOR_NORMAL for m, c in zip(medias, cortes)]
+        bars = ax2.bar(etiquetas, medias, color=colores, edgecolor='black', alpha=0.9)
+
+        # Línea roja de corte clínico
+        ax2.plot(etiquetas, cortes, color=COLOR_CORTE, linewidth=3, linestyle='--', marker='o',
+                 label='Corte clínico (T≥63) - España')
+
+        ax2.set_ylim(0, 4)
+        ax2.set_ylabel('Media por ítem (0-4)')
+        ax2.set_xticks(range(len(etiquetas)))
+        ax2.set_xticklabels(etiquetas, rotation=45, ha='right', fontsize=8)
+        ax2.set_title('Perfil SCL-90-R - Comparación con normas españolas')
+        ax2.legend(fontsize=10)
+
+        # Añadir valores encima de las barras
+        for bar, val in zip(bars, medias):
+            if val >= 0.3:
+                ax2.text(bar.get_x() + bar.get_width()/2, bar.get_height() - 0.15,
+                         f'{val:.2f}', ha='center', va='bottom', fontsize=10)
+
+    # Guardar como imagen
+    img_barras = io.BytesIO()
+    with tramo("grafica.savefig", dpi=200):
+        fig2.savefig(img_barras, format='png', bbox_inches='tight', dpi=200)
+    img_barras.seek(0)
+    return img_barras
+
+
+def generar_grafica_vectorial(sub_sumas, sexo):
+    # El mismo perfil dibujado con reportlab.graphics: vectorial, sin rasterizar
+    from reportlab.graphics.shapes import Drawing, Rect, Line, PolyLine, Circle, String, Group
+
+    etiquetas = list(DIMENSIONES)
+    n_items = N_ITEMS_DIM.tolist()
+    medias = [sub_sumas[i] / n_items[i] for i in range(len(etiquetas))]
+    cortes = cortes_clinicos(sexo)
+
+    # Zona de trazado (deja sitio debajo para las etiquetas giradas)
+    x0, y0 = 45, 100
+    ancho, alto = ANCHO_GRAFICA - x0 - 10, ALTO_GRAFICA - y0 - 25
+    hueco = ancho / len(etiquetas)
+
+    def y(valor):  # eje 0-4
+        return y0 + alto * min(max(valor, 0), 4) / 4
+
+    d = Drawing(ANCHO_GRAFICA, ALTO_GRAFICA)
+    d.add(String(x0 + ancho / 2, ALTO_GRAFICA - 14, 'Perfil SCL-90-R - Comparación con normas españolas',
+                 fontName='Helvetica', fontSize=10, textAnchor='middle'))
+
+    # Ejes y marcas de 0 a 4 cada 0.5
+    d.add(Rect(x0, y0, ancho, alto, fillColor=None, strokeColor=colors.black, strokeWidth=0.6))
+    for paso in range(9):
+        v = paso / 2
+        d.add(Line(x0 - 3, y(v), x0, y(v), strokeColor=colors.black, strokeWidth=0.6))
+        d.add(String(x0 - 5, y(v) - 2.5, f"{v:.1f}", fontName='Helvetica', fontSize=7, textAnchor='end'))
+    eje_y = Group(String(0, 0, 'Media por ítem (0-4)', fontName='Helvetica', fontSize=8, textAnchor='middle'))
+    eje_y.translate(12, y0 + alto / 2)
+    eje_y.rotate(90)
+    d.add(eje_y)
+
+    # Barras coloreadas según el corte clínico, con su valor
+    for i, (media, corte) in enumerate(zip(medias, cortes)):
+        xb = x0 + hueco * (i + 0.1)
+        color = COLOR_CLINICO if media >= corte else COLOR_NORMAL
+        d.add(Rect(xb, y0, hueco * 0.8, y(media) - y0, fillColor=colors.HexColor(color),
+                   strokeColor=colors.black, strokeWidth=0.5))
+        if media >= 0.3:
+            d.add(String(xb + hueco * 0.4, y(media - 0.15), f"{media:.2f}",
+                         fontName='Helvetica', fontSize=7, textAnchor='middle'))
+
+        # Etiqueta del eje X girada 45º
+        etiqueta = Group(String(0, 0, etiquetas[i], fontName='Helvetica', fontSize=6.5, textAnchor='end'))
+        etiqueta.translate(x0 + hueco * (i + 0.5), y0 - 6)
+        etiqueta.rotate(45)
+        d.add(etiqueta)
+
+    # Línea discontinua de corte clínico con marcadores
+    rojo = colors.HexColor(COLOR_CORTE)
+    puntos = []
+    for i, corte in enumerate(cortes):
+        puntos += [x0 + hueco * (i + 0.5), y(corte)]
+    d.add(PolyLine(puntos, strokeColor=rojo, strokeWidth=1.8, strokeDashArray=[5, 3]))
+    for i in range(0, len(puntos), 2):
+        d.add(Circle(puntos[i], puntos[i + 1], 2.5, fillColor=rojo, strokeColor=rojo))
+
+    # Leyenda
+    xl, yl = x0 + ancho - 150, y0 + alto - 14
+    d.add(Rect(xl - 4, yl - 5, 148, 14, fillColor=colors.white, strokeColor=colors.HexColor('#cccccc'), strokeWidth=0.5))
+    d.add(Line(xl, yl + 2, xl + 18, yl + 2, strokeColor=rojo, strokeWidth=1.8, strokeDashArray=[5, 3]))
+    d.add(String(xl + 22, yl - 1, 'Corte clínico (T≥63) - España', fontName='Helvetica', fontSize=7))
+    return d
+
+
+# === PÁGINA DE EVOLUCIÓN (varias administraciones del mismo paciente) ===
+ANCHO_EVOLUCION, ALTO_EVOLUCION = 440, 500
+EVO_PANEL_ANCHO, EVO_PANEL_ALTO = 88, 150
+EVO_COLUMNAS = (160, 60, 60, 60, 100)
+EVO_ALTO_FILA = 16
+
+TEXTOS_CAMBIO = {
+    "empeorado": "Empeoramiento fiable",
+    "sin_cambio": "Sin cambio fiable",
+    "mejorado": "Mejoría fiable",
+    "recuperado": "Clínicamente significativo",
+    "": "-",
+}
+
+
+def titulo_evolucion(evolucion):
+    fechas = [f for f in evolucion.fechas if f]
+    periodo = f" ({fechas[0]} - {fechas[-1]})" if fechas else ""
+    return f"{len(evolucion.fechas)} administraciones{periodo}"
+
+
+def grafica_evolucion(evolucion, sexo):
+    # Un panel por dimensión (y el GSI) con la media en cada administración frente al
+    # corte de normas_es, y debajo la tabla del cambio fiable de la primera a la última.
+    # evolucion: evolucion.Historia. Siempre vectorial: son pocas formas y no compensa matplotlib
+    from reportlab.graphics.shapes import Drawing, Rect, Line, PolyLine, Circle, String
+
+    nombres = list(DIMENSIONES) + ["GSI"]
+    valores = evolucion.puntuaciones[:, :len(nombres)].T.tolist()   # columnas de COLUMNAS: medias y GSI
+    cortes = PLAN.cortes_cambio[SEXOS.index(clave_sexo(sexo))].tolist()
+    n = len(evolucion.fechas)
+    rojo = colors.HexColor(COLOR_CORTE)
+
+    d = Drawing(ANCHO_EVOLUCION, ALTO_EVOLUCION)
+    for k, (nombre, serie, corte) in enumerate(zip(nombres, valores, cortes)):
+        px = (k % 5) * EVO_PANEL_ANCHO
+        py = ALTO_EVOLUCION - (k // 5 + 1) * EVO_PANEL_ALTO
+        x0, y0, ancho, alto = px + 16, py + 22, EVO_PANEL_ANCHO - 22, EVO_PANEL_ALTO - 44
+
+        def y(valor):  # eje 0-4
+            return y0 + alto * min(max(valor, 0), 4) / 4
+
+        def x(i):
+            return x0 + (ancho * i / (n - 1) if n > 1 else ancho / 2)
+
+        d.add(String(px + EVO_PANEL_ANCHO / 2, py + EVO_PANEL_ALTO - 12, nombre, fontName='Helvetica-Bold',
+                     fontSize=5.5, textAnchor='middle'))
+        d.add(Rect(x0, y0, ancho, alto, fillColor=None, strokeColor=colors.black, strokeWidth=0.5))
+        for v in range(5):
+            d.add(String(x0 - 3, y(v) - 2, f"{v}", fontName='Helvetica', fontSize=5, textAnchor='end'))
+        d.add(Line(x0, y(corte), x0 + ancho, y(corte), strokeColor=rojo, strokeWidth=1, strokeDashArray=[3, 2]))
+        if n > 1:
+            d.add(PolyLine([c for i, v in enumerate(serie) for c in (x(i), y(v))],
+                           strokeColor=colors.HexColor('#555555'), strokeWidth=0.8))
+        for i, v in enumerate(serie):
+            color = colors.HexColor(COLOR_CLINICO if v >= corte else COLOR_NORMAL)
+            d.add(Circle(x(i), y(v), 2, fillColor=color, strokeColor=colors.black, strokeWidth=0.3))
+        d.add(String(x0, py + 12, evolucion.fechas[0], fontName='Helvetica', fontSize=4.5))
+        if n > 1:
+            d.add(String(x0 + ancho, py + 12, evolucion.fechas[-1], fontName='Helvetica', fontSize=4.5,
+                         textAnchor='end'))
+
+    # Tabla del cambio de la primera a la última administración
+    bordes = [sum(EVO_COLUMNAS[:k]) for k in range(len(EVO_COLUMNAS) + 1)]
+    arriba = ALTO_EVOLUCION - 2 * EVO_PANEL_ALTO - 20
+    d.add(Rect(0, arriba - EVO_ALTO_FILA, bordes[-1], EVO_ALTO_FILA, fillColor=colors.HexColor(COLOR_NORMAL),
+               strokeColor=colors.grey, strokeWidth=0.5))
+    for x0, texto in zip(bordes, ("Dimensión", "Primera", "Última", "RCI", "Cambio")):
+        d.add(String(x0 + 5, arriba - 11, texto, fontName='Helvetica', fontSize=8, fillColor=colors.white))
+    for k, (nombre, serie, rci, cambio) in enumerate(zip(nombres, valores, evolucion.rci, evolucion.cambios)):
+        yf = arriba - (k + 2) * EVO_ALTO_FILA
+        d.add(Rect(0, yf, bordes[-1], EVO_ALTO_FILA, fillColor=colors.HexColor('#fff8f0'),
+                   strokeColor=colors.grey, strokeWidth=0.5))
+        celdas = (f"{serie[0]:.2f}", f"{serie[-1]:.2f}", f"{rci:+.2f}" if rci == rci else "-")
+        d.add(String(5, yf + 5, nombre, fontName='Helvetica', fontSize=8))
+        for c, texto in enumerate(celdas, start=1):
+            d.add(String((bordes[c] + bordes[c + 1]) / 2, yf + 5, texto, fontName='Helvetica', fontSize=8,
+                         textAnchor='middle'))
+        d.add(String(bordes[4] + 5, yf + 5, TEXTOS_CAMBIO[cambio], fontSize=8,
+                     fontName='Helvetica-Bold' if cambio in ("empeorado", "recuperado") else 'Helvetica',
+                     fillColor=rojo if cambio == "empeorado" else colors.black))
+    for x0 in bordes:
+        d.add(Line(x0, arriba, x0, arriba - (len(nombres) + 1) * EVO_ALTO_FILA, strokeColor=colors.grey,
+                   strokeWidth=0.5))
+
+    pie = arriba - (len(nombres) + 1) * EVO_ALTO_FILA - 14
+    d.add(String(0, pie, "RCI (Jacobson y Truax): cambio / error típico de la diferencia; |RCI| ≥ 1.96 es un "
+                         "cambio fiable.", fontName='Helvetica', fontSize=6.5))
+    d.add(String(0, pie - 9, "Clínicamente significativo: mejoría fiable que además pasa por debajo del corte "
+                             "clínico (línea discontinua).", fontName='Helvetica', fontSize=6.5))
+    return d
+
+
+def generar_pdf(ruta_pdf, nombre, sexo, fecha, terapeuta, resultados, scl90r_escalas, respuestas, img_barras=None,
+                normas=None, evolucion=None):
+    # img_barras: resultado de generar_grafica (PNG en BytesIO o Drawing vectorial)
+    # normas: baremos locales (normas_locales.NormasLocales) para añadir T y percentil
+    # evolucion: evolucion.Historia del paciente para añadir la página de evolución
+    # === PROTECCIÓN CONTRA ERRORES ===
+    if len(respuestas) != 90:
+        raise ValueError(
+            f"Se esperaban 90 respuestas, pero se recibieron {len(respuestas)}.\n"
+            "Revisa que todos las entradas tengan valor.")
+
+    doc = SimpleDocTemplate(ruta_pdf, pagesize=A4, subject=asunto_pdf(normas))
+    story = []
+    with tramo("pdf.estilos"):
+        styles = estilos()
+
+    # Título
+    story.append(Paragraph("Informe de resultados SCL-90-R", styles['Title']))
+    story.append(Spacer(1, 20))
+
+    # Nombre y fecha
+    story.append(Table([[
+        Paragraph(f"<b>Nombre:</b> {nombre}", styles['Normal']),
+        Paragraph(f"<b> Sexo: </b> {sexo}"),
+        Paragraph(f"<b>Fecha:</b> {fecha}", styles['Normal'])
+    ]], colWidths=[260, 80, 100]))
+    story.append(Table([[
+        Paragraph(f"<b>Terapeuta:</b> {terapeuta}", styles['Normal']),
+        Paragraph("", styles['Normal']),
+        Paragraph("", styles['Normal'])
+    ]], colWidths=[300, 70, 70]))
+    story.append(Spacer(1, 20))
+
+    # === RESPUESTAS DEL PACIENTE EN 3 COLUMNAS (30 por columna) ===
+    story.append(Paragraph(f"<b>Respuestas de {nombre}</b>", styles['Heading3']))
+    story.append(Spacer(1, 12))
+
+    def formatear_respuesta(i, valor):
+        valor = str(valor).strip()
+        if valor in ["3", "4"]:
+            return Paragraph(f"Ítem {i+1:2d}: <font color='red'><b>{valor}</b></font>", styles['Normal'])
+        elif valor in ["0"]:
+            return Paragraph(f"Ítem {i+1:2d}: <font color='grey'>{valor}</font>", styles['Normal'])
+        else:
+            return Paragraph(f"Ítem {i+1:2d}: <font color='black'>{valor}</font>", styles['Normal'])
+
+    # Creamos los datos: 30 filas, 3 columnas
+    data_respuestas = []
+
+    with tramo("pdf.respuestas", parrafos=90):
+        for fila in range(30):
+            col1 = formatear_respuesta(fila, respuestas[fila])
+            col2 = formatear_respuesta(fila+30, respuestas[fila+30])
+            col3 = formatear_respuesta(fila+60, respuestas[fila+60])
+            data_respuestas.append([col1, col2, col3])
+
+    # Tabla bonita y compacta
+    tabla_respuestas = Table(data_respuestas, colWidths=[140, 140, 140])
+
+    tabla_respuestas.setStyle(TableStyle([
+        ('FONTNAME',   (0,0), (-1,-1), 'Courier'),        # fuente monoespaciada = más legible en pequeño
+        ('FONTSIZE',   (0,0), (-1,-1), 8.5),              # letra pequeña pero clara
+        ('TEXTCOLOR',  (0,0), (-1,-1), colors.HexColor('#1a1a1a')),
+        ('ALIGN',      (0,0), (-1,-1), 'LEFT'),
+        ('VALIGN',     (0,0), (-1,-1), 'MIDDLE'),
+        ('GRID',       (0,0), (-1,-1), 0.25, colors.HexColor('#e0e0e0')),  # rejilla muy fina
+        ('LEFTPADDING',   (0,0), (-1,-1), 5),
+        ('RIGHTPADDING',  (0,0), (-1,-1), 5),
+        ('TOPPADDING',    (0,0), (-1,-1), 2),    # ← filas muy bajas
+        ('BOTTOMPADDING', (0,0), (-1,-1), 2),    # ← filas muy bajas
+        ('BACKGROUND', (0,0), (-1,-1), colors.white),
+    ]))
+
+    story.append(tabla_respuestas)
+    story.append(Spacer(1, 40))
+
+    # Índices globales
+    ig = resultados["Índices Globales"]
+    story.append(Paragraph("<b>Índices Globales</b>", styles['Heading2']))
+    if  ig['GSI'] >= 1.5:
+        story.append(Paragraph(f"• Índice de severidad global (GSI): <b><font color='red'> {ig['GSI']:.2f} </font></b>  (≥1.50 = caso clínico)", styles['Normal']))
+        if  ig['GSI'] >= 1 and ig['GSI'] < 1.5:
+            story.append(Paragraph(f"• Índice de severidad global (GSI): <b> {ig['GSI']:.2f} </b>  (≥1.00 = malestar)", styles['Normal']))
+    else:
+        story.append(Paragraph(f"• Índice de severidad global (GSI): {ig['GSI']:.2f}  (≥1.00 = malestar | ≥1.50 = caso clínico)", styles['Normal']))
+
+    if sexo == 'Hombre':
+        if ig['PST'] > 60:
+            story.append(Paragraph(f"• Total de síntomas positivos (PST): <b>{ig['PST']}</b>  (Riesgo de simulación)", styles['Normal']))
+        else:
+            story.append(Paragraph(f"• Total de síntomas positivos (PST): {ig['PST']} (Riesgo de simulación en hombres > 60)", styles['Normal']))
+    else:
+        if ig['PST'] > 70:
+            story.append(Paragraph(f"• Total de síntomas positivos (PST): <b>{ig['PST']}</b>  (Riesgo de simulación)", styles['Normal']))
+        else:
+            story.append(Paragraph(f"• Total de síntomas positivos (PST): {ig['PST']} (Riesgo de simulación en mujeres > 70)", styles['Normal']))
+
+    if ig['PSDI'] > 2.8:
+        story.append(Paragraph(f"• Intensidad media de los síntomas positivos (PSDI): <b>{ig['PSDI']:.2f}</b>  (Posible dramatización)", styles['Normal']))
+    else:
+        story.append(Paragraph(f"• Intensidad media de los síntomas positivos (PSDI): {ig['PSDI']:.2f}  (Posible dramatización > 2.80)", styles['Normal']))
+
+    story.append(Spacer(1, 20))
+
+    # Subescalas
+    story.append(Paragraph("<b>Puntuaciones por dimensión (Baremo español)</b>", styles['Heading2']))
+
+    # Cortes clínicos
+    cortes = cortes_clinicos(sexo)
+
+    nombres_dim = list(scl90r_escalas.keys())
+
+    data_dim = [["Dimensión", "Media", "Corte clínico", "Estado"]]
+    t_local = pc_local = None
+    if normas is not None:
+        data_dim[0] += ["T local", "Pc local"]
+        t_local, pc_local = puntuaciones_locales(resultados, sexo, normas)
+
+    for i, dim in enumerate(nombres_dim):
+        media = resultados[dim]["media"]
+        corte = cortes[i]
+        if media >= corte:
+            estado = Paragraph("<b><font color='red'>Clínico</font></b>", styles['Normal'])
+        else:
+            estado = Paragraph("Normal", styles['Normal'])
+        data_dim.append([dim, f"{media:.2f}", f"{corte:.2f}", estado])
+        if normas is not None:
+            data_dim[-1] += [t_local[i], pc_local[i]]
+
+    t_dim = Table(data_dim, colWidths=[200, 80, 80, 80] if normas is None else COLUMNAS_CON_NORMAS)
+    t_dim.setStyle(TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#0078d4")),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+        ('BACKGROUND', (0,1), (-1,-1), colors.HexColor('#fff8f0')),
+        ('ALIGN', (1,1), (-1,-1), 'CENTER'),
+    ]))
+    story.append(t_dim)
+    story.append(Spacer(1, 40))
+
+    # Gráficas
+    if img_barras is not None:
+        story.append(Paragraph("Puntuaciones por dimensión", styles['Heading3']))
+        if isinstance(img_barras, io.BytesIO):
+            story.append(Image(img_barras, width=ANCHO_GRAFICA, height=ALTO_GRAFICA))
+        else:
+            story.append(img_barras)  # el Drawing ya es un flowable
+
+    # Evolución entre administraciones (opcional)
+    if evolucion is not None:
+        story.append(PageBreak())
+        story.append(Paragraph("<b>Evolución entre administraciones</b>", styles['Heading2']))
+        story.append(Paragraph(titulo_evolucion(evolucion), styles['Normal']))
+        story.append(Spacer(1, 12))
+        with tramo("pdf.evolucion", administraciones=len(evolucion.fechas)):
+            story.append(grafica_evolucion(evolucion, sexo))
+
+    # Construir PDF
+    with tramo("pdf.build"):
+        doc.build(story)
+
+
+def funcion_pdf(motor=None):
+    # Devuelve la función generar_pdf del motor pedido (misma firma en ambos)
+    motor = motor or MOTOR_PDF
+    if motor == "platypus":
+        return generar_pdf
+    if motor == "canvas":
+        from informe_rapido import generar_pdf as generar_pdf_canvas
+        return generar_pdf_canvas
+    raise ValueError(f"Motor de PDF desconocido: '{motor}' (opciones: {', '.join(MOTORES_PDF)})")
+
+
+# Tabla de dimensiones con baremos locales: las mismas 440 pt repartidas en 6 columnas
+COLUMNAS_CON_NORMAS = [160, 55, 70, 55, 50, 50]
+
+
+def puntuaciones_locales(resultados, sexo, normas):
+    # Textos de la puntuación T y el percentil (1-99) de cada dimensión ("-" si el baremo no alcanza)
+    from normas_locales import fila_resultados
+    fila = fila_resultados(resultados)
+    t = normas.puntuaciones_t(fila, sexo)[0, :len(DIMENSIONES)]
+    pc = normas.percentiles(fila, sexo)[0, :len(DIMENSIONES)]
+    return ([f"{v:.0f}" if v == v else "-" for v in t.tolist()],
+            [f"{min(max(v, 1), 99):.0f}" if v == v else "-" for v in pc.tolist()])
+
+
+class InformeCancelado(Exception):
+    pass
+
+
+def generar_informe(ruta_pdf, nombre, sexo, fecha, terapeuta, respuestas, resultados=None, sub_sumas=None,
+                    motor_grafica=None, motor_pdf=None, cancelado=None, evolucion=None):
+    # Informe completo de un paciente: corrección (si no viene hecha), gráfica y PDF.
+    # Se escribe en un temporal y se renombra al final, así un fallo o una cancelación
+    # nunca deja un PDF a medias. `cancelado` es un threading.Event opcional.
+    # `evolucion` (evolucion.Historia) añade la página de evolución entre administraciones
+    import cache
+    from normas_locales import activas
+    from puntuacion import SCL90R_ESCALAS
+
+    def comprobar():
+        if cancelado is not None and cancelado.is_set():
+            raise InformeCancelado(ruta_pdf)
+
+    with tramo("informe", archivo=os.path.basename(ruta_pdf)):
+        # La gráfica y la corrección solo dependen de respuestas y sexo: si se repite un
+        # informe cambiando la cabecera (nombre, fecha, terapeuta) salen de la caché
+        k = cache.clave(respuestas, sexo)
+        if resultados is None or sub_sumas is None:
+            with tramo("puntuar"):
+                resultados, sub_sumas = cache.resultados(respuestas, sexo, k)
+        comprobar()
+        motor_grafica = motor_grafica or MOTOR_GRAFICA
+        img_barras = cache.grafica(respuestas, sexo, motor_grafica,
+                                   lambda: generar_grafica(sub_sumas, sexo, motor_grafica), k)
+        comprobar()
+        dibujar = funcion_pdf(motor_pdf)
+
+        temporal = ruta_pdf + ".tmp"
+        try:
+            with tramo("pdf", motor=motor_pdf or MOTOR_PDF):
+                dibujar(temporal, nombre, sexo, fecha, terapeuta, resultados, SCL90R_ESCALAS,
+                        respuestas, img_barras, activas(), evolucion)
+            comprobar()
+            os.replace(temporal, ruta_pdf)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
@@ -0,0 +1,305 @@
+# ==================== INFORME RÁPIDO (canvas de ReportLab) ====================
+# Dibuja el mismo informe que informe.generar_pdf directamente sobre un
+# reportlab.pdfgen.canvas, sin flowables: el diseño es siempre el mismo, así que
+# las coordenadas se calculan una vez (medidas sobre el PDF de platypus) y no hay
+# que maquetar 90 Paragraph ni tablas anidadas en cada informe.
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from informe import (ANCHO_GRAFICA, ALTO_GRAFICA, ALTO_EVOLUCION, COLUMNAS_CON_NORMAS, asunto_pdf,
+                     grafica_evolucion, puntuaciones_locales, titulo_evolucion)
+from puntuacion import cortes_clinicos
+from traza import tramo
+
+ANCHO_PAGINA, ALTO_PAGINA = A4
+
+# === ESTILO (una sola vez por proceso) ===
+NORMAL = ("Helvetica", 10)
+NEGRITA = ("Helvetica-Bold", 10)
+TITULO = ("Helvetica-Bold", 18)
+TITULO2 = ("Helvetica-Bold", 14)
+TITULO3 = ("Helvetica-BoldOblique", 12)
+NEGRO = colors.black
+ROJO = colors.red
+GRIS = colors.grey
+AZUL = colors.HexColor("#0078d4")
+FONDO_DIM = colors.HexColor("#fff8f0")
+REJILLA_RESPUESTAS = colors.HexColor("#e0e0e0")
+
+# === COORDENADAS (desde arriba de la página, como en el PDF de platypus) ===
+MARGEN_X = 78                               # margen de 72 + relleno del marco de 6
+CENTRO_X = ANCHO_PAGINA / 2
+
+# Página 1
+Y_TITULO = 96
+Y_NOMBRE, Y_TERAPEUTA = 139, 157
+X_CABECERA = 77.638 + 6                     # tabla de 440 centrada + relleno de celda
+X_SEXO, X_FECHA = X_CABECERA + 260, X_CABECERA + 340
+Y_RESPUESTAS_TITULO = 206
+RESP_X, RESP_Y = 87.638, 226                # esquina de la rejilla 3×30
+RESP_ANCHO_COL, RESP_ALTO_FILA = 140, 16
+RESP_BASE = 12                              # línea base dentro de la fila
+RESP_RELLENO = 5
+
+# Página 2
+Y_INDICES = 92
+Y_LINEAS_INDICES = (112, 124, 136)
+Y_DIMENSIONES = 184
+DIM_X, DIM_Y = 77.638, 194
+DIM_COLUMNAS = (200, 80, 80, 80)
+DIM_ALTO_FILA, DIM_BASE, DIM_RELLENO = 18, 13, 6
+DIM_BORDES = [DIM_X + sum(DIM_COLUMNAS[:k]) for k in range(len(DIM_COLUMNAS) + 1)]
+DIM_BORDES_NORMAS = [DIM_X + sum(COLUMNAS_CON_NORMAS[:k]) for k in range(len(COLUMNAS_CON_NORMAS) + 1)]
+CABECERA_DIM = ("Dimensión", "Media", "Corte clínico", "Estado")
+CABECERA_DIM_NORMAS = CABECERA_DIM + ("T local", "Pc local")
+Y_GRAFICA_TITULO = 438
+GRAFICA_ARRIBA = 446
+
+# Página 3 (evolución, opcional)
+Y_EVOLUCION, Y_EVOLUCION_PERIODO, EVOLUCION_ARRIBA = 92, 112, 130
+X_GRAFICA_PNG = MARGEN_X + (ANCHO_PAGINA - 2 * MARGEN_X - ANCHO_GRAFICA) / 2   # Image centrada
+X_GRAFICA_VECTORIAL = MARGEN_X                                                # Drawing a la izquierda
+
+
+def y_pagina(desde_arriba):
+    return ALTO_PAGINA - desde_arriba
+
+
+# Etiquetas "Ítem N: " y dónde empieza el valor de cada una, precalculados para los 90 ítems
+_ETIQUETAS_ITEM = [f"Ítem {i+1}: " for i in range(90)]
+_X_RESPUESTA = [RESP_X + (i // 30) * RESP_ANCHO_COL + RESP_RELLENO + stringWidth(_ETIQUETAS_ITEM[i], *NORMAL)
+                for i in range(90)]
+_Y_RESPUESTA = [y_pagina(RESP_Y + (i % 30) * RESP_ALTO_FILA + RESP_BASE) for i in range(90)]
+
+# Los datos de la cabecera van justo detrás de su etiqueta en negrita
+X_NOMBRE_VALOR = X_CABECERA + stringWidth("Nombre:", *NEGRITA)
+X_SEXO_VALOR = X_SEXO + stringWidth("Sexo: ", *NEGRITA)
+X_FECHA_VALOR = X_FECHA + stringWidth("Fecha:", *NEGRITA)
+X_TERAPEUTA_VALOR = X_CABECERA + stringWidth("Terapeuta:", *NEGRITA)
+
+
+def texto_mixto(c, x, y, segmentos):
+    # Escribe (texto, fuente, color) seguidos. "≥" no está en Helvetica: va en Symbol,
+    # igual que hace platypus al sustituir la fuente
+    for texto, (fuente, tamaño), color in segmentos:
+        c.setFillColor(color)
+        for n, trozo in enumerate(texto.split("≥")):
+            if n:
+                c.setFont("Symbol", tamaño)
+                c.drawString(x, y, "≥")
+                x += stringWidth("≥", "Symbol", tamaño)
+            if trozo:
+                c.setFont(fuente, tamaño)
+                c.drawString(x, y, trozo)
+                x += stringWidth(trozo, fuente, tamaño)
+    return x
+
+
+def _plantilla(c, nombre, dibujar, *args):
+    # Lo que no cambia de un paciente a otro se dibuja una vez por documento como
+    # Form XObject y cada página solo lo referencia: en un PDF con muchos pacientes
+    # ni se repite el trabajo ni crece el archivo
+    if not c.hasForm(nombre):
+        c.beginForm(nombre)
+        dibujar(c, *args)
+        c.endForm()
+    c.doForm(nombre)
+
+
+def _fondo_respuestas(c):
+    c.setFont(*TITULO)
+    c.setFillColor(NEGRO)
+    c.drawCentredString(CENTRO_X, y_pagina(Y_TITULO), "Informe de resultados SCL-90-R")
+    for x, y, etiqueta in ((X_CABECERA, Y_NOMBRE, "Nombre:"), (X_SEXO, Y_NOMBRE, "Sexo: "),
+                           (X_FECHA, Y_NOMBRE, "Fecha:"), (X_CABECERA, Y_TERAPEUTA, "Terapeuta:")):
+        texto_mixto(c, x, y_pagina(y), [(etiqueta, NEGRITA, NEGRO)])
+
+    # Rejilla 3×30: fondo blanco y líneas muy finas
+    alto = 30 * RESP_ALTO_FILA
+    c.setFillColor(colors.white)
+    c.rect(RESP_X, y_pagina(RESP_Y + alto), 3 * RESP_ANCHO_COL, alto, stroke=0, fill=1)
+    c.setStrokeColor(REJILLA_RESPUESTAS)
+    c.setLineWidth(0.25)
+    lineas = [(RESP_X, y_pagina(RESP_Y + f * RESP_ALTO_FILA), RESP_X + 3 * RESP_ANCHO_COL, y_pagina(RESP_Y + f * RESP_ALTO_FILA))
+              for f in range(31)]
+    lineas += [(RESP_X + k * RESP_ANCHO_COL, y_pagina(RESP_Y), RESP_X + k * RESP_ANCHO_COL, y_pagina(RESP_Y + alto))
+               for k in range(4)]
+    c.lines(lineas)
+
+    # Etiquetas "Ítem N:": un objeto de texto por columna que baja de fila en fila (T*)
+    texto = c.beginText()
+    texto.setFont(*NORMAL, leading=RESP_ALTO_FILA)
+    texto.setFillColor(NEGRO)
+    for columna in range(3):
+        texto.setTextOrigin(RESP_X + columna * RESP_ANCHO_COL + RESP_RELLENO, y_pagina(RESP_Y + RESP_BASE))
+        texto.textLines(_ETIQUETAS_ITEM[columna * 30:columna * 30 + 30])
+    c.drawText(texto)
+
+
+def _pagina_respuestas(c, nombre, sexo, fecha, terapeuta, respuestas):
+    _plantilla(c, "scl90r_respuestas", _fondo_respuestas)
+
+    for x, y, valor in ((X_NOMBRE_VALOR, Y_NOMBRE, f" {nombre}"), (X_SEXO_VALOR, Y_NOMBRE, sexo),
+                        (X_FECHA_VALOR, Y_NOMBRE, f" {fecha}"), (X_TERAPEUTA_VALOR, Y_TERAPEUTA, f" {terapeuta}")):
+        texto_mixto(c, x, y_pagina(y), [(valor, NORMAL, NEGRO)])
+
+    c.setFont(*TITULO3)
+    c.drawString(MARGEN_X, y_pagina(Y_RESPUESTAS_TITULO), f"Respuestas de {nombre}")
+
+    # Respuestas: 3-4 en rojo y negrita, 0 en gris, el resto en negro
+    texto = c.beginText()
+    for i, valor in enumerate(respuestas):
+        valor = str(valor).strip()
+        texto.setTextOrigin(_X_RESPUESTA[i], _Y_RESPUESTA[i])
+        if valor in ("3", "4"):
+            texto.setFont(*NEGRITA)
+            texto.setFillColor(ROJO)
+        else:
+            texto.setFont(*NORMAL)
+            texto.setFillColor(GRIS if valor == "0" else NEGRO)
+        texto.textOut(valor)
+    c.drawText(texto)
+
+
+def _lineas_indices(sexo, ig):
+    gsi, pst, psdi = ig["GSI"], ig["PST"], ig["PSDI"]
+    if gsi >= 1.5:
+        linea_gsi = [("• Índice de severidad global (GSI): ", NORMAL, NEGRO), (f"{gsi:.2f} ", NEGRITA, ROJO),
+                     ("(≥1.50 = caso clínico)", NORMAL, NEGRO)]
+    else:
+        linea_gsi = [(f"• Índice de severidad global (GSI): {gsi:.2f} (≥1.00 = malestar | ≥1.50 = caso clínico)",
+                      NORMAL, NEGRO)]
+
+    limite, grupo = (60, "hombres") if sexo == 'Hombre' else (70, "mujeres")
+    if pst > limite:
+        linea_pst = [("• Total de síntomas positivos (PST): ", NORMAL, NEGRO), (f"{pst}", NEGRITA, NEGRO),
+                     (" (Riesgo de simulación)", NORMAL, NEGRO)]
+    else:
+        linea_pst = [(f"• Total de síntomas positivos (PST): {pst} (Riesgo de simulación en {grupo} > {limite})",
+                      NORMAL, NEGRO)]
+
+    if psdi > 2.8:
+        linea_psdi = [("• Intensidad media de los síntomas positivos (PSDI): ", NORMAL, NEGRO),
+                      (f"{psdi:.2f}", NEGRITA, NEGRO), (" (Posible dramatización)", NORMAL, NEGRO)]
+    else:
+        linea_psdi = [(f"• Intensidad media de los síntomas positivos (PSDI): {psdi:.2f} (Posible dramatización > 2.80)",
+                       NORMAL, NEGRO)]
+    return linea_gsi, linea_pst, linea_psdi
+
+
+def _fondo_resultados(c, nombres_dim, bordes, cabecera):
+    c.setFont(*TITULO2)
+    c.setFillColor(NEGRO)
+    c.drawString(MARGEN_X, y_pagina(Y_INDICES), "Índices Globales")
+    c.drawString(MARGEN_X, y_pagina(Y_DIMENSIONES), "Puntuaciones por dimensión (Baremo español)")
+
+    # Tabla de dimensiones: cabecera azul, filas crema, rejilla gris
+    ancho = bordes[-1] - bordes[0]
+    alto = DIM_ALTO_FILA * (len(nombres_dim) + 1)
+    c.setFillColor(AZUL)
+    c.rect(DIM_X, y_pagina(DIM_Y + DIM_ALTO_FILA), ancho, DIM_ALTO_FILA, stroke=0, fill=1)
+    c.setFillColor(FONDO_DIM)
+    c.rect(DIM_X, y_pagina(DIM_Y + alto), ancho, alto - DIM_ALTO_FILA, stroke=0, fill=1)
+    c.setStrokeColor(GRIS)
+    c.setLineWidth(0.5)
+    lineas = [(DIM_X, y_pagina(DIM_Y + f * DIM_ALTO_FILA), DIM_X + ancho, y_pagina(DIM_Y + f * DIM_ALTO_FILA))
+              for f in range(len(nombres_dim) + 2)]
+    lineas += [(x, y_pagina(DIM_Y), x, y_pagina(DIM_Y + alto)) for x in bordes]
+    c.lines(lineas)
+
+    c.setFont(*NORMAL)
+    c.setFillColor(colors.white)
+    for x, texto in zip(bordes, cabecera):
+        c.drawString(x + DIM_RELLENO, y_pagina(DIM_Y + DIM_BASE), texto)
+    c.setFillColor(NEGRO)
+    for i, dim in enumerate(nombres_dim):
+        c.drawString(bordes[0] + DIM_RELLENO, y_pagina(DIM_Y + (i + 1) * DIM_ALTO_FILA + DIM_BASE), dim)
+
+
+def _pagina_resultados(c, sexo, resultados, scl90r_escalas, img_barras, normas=None):
+    nombres_dim = list(scl90r_escalas.keys())
+    if normas is None:
+        bordes = DIM_BORDES
+        _plantilla(c, "scl90r_resultados", _fondo_resultados, nombres_dim, bordes, CABECERA_DIM)
+    else:
+        bordes = DIM_BORDES_NORMAS
+        _plantilla(c, "scl90r_resultados_normas", _fondo_resultados, nombres_dim, bordes, CABECERA_DIM_NORMAS)
+        t_local, pc_local = puntuaciones_locales(resultados, sexo, normas)
+
+    for y, linea in zip(Y_LINEAS_INDICES, _lineas_indices(sexo, resultados["Índices Globales"])):
+        texto_mixto(c, MARGEN_X, y_pagina(y), linea)
+
+    cortes = cortes_clinicos(sexo)
+    for i, dim in enumerate(nombres_dim):
+        y = y_pagina(DIM_Y + (i + 1) * DIM_ALTO_FILA + DIM_BASE)
+        media, corte = resultados[dim]["media"], cortes[i]
+        c.setFont(*NORMAL)
+        c.setFillColor(NEGRO)
+        c.drawCentredString((bordes[1] + bordes[2]) / 2, y, f"{media:.2f}")
+        c.drawCentredString((bordes[2] + bordes[3]) / 2, y, f"{corte:.2f}")
+        if normas is not None:
+            c.drawCentredString((bordes[4] + bordes[5]) / 2, y, t_local[i])
+            c.drawCentredString((bordes[5] + bordes[6]) / 2, y, pc_local[i])
+        if media >= corte:
+            c.setFont(*NEGRITA)
+            c.setFillColor(ROJO)
+            c.drawString(bordes[3] + DIM_RELLENO, y, "Clínico")
+        else:
+            c.drawString(bordes[3] + DIM_RELLENO, y, "Normal")
+
+    # Gráfica: PNG de matplotlib o Drawing vectorial
+    if img_barras is not None:
+        c.setFont(*TITULO3)
+        c.setFillColor(NEGRO)
+        c.drawString(MARGEN_X, y_pagina(Y_GRAFICA_TITULO), "Puntuaciones por dimensión")
+        abajo = y_pagina(GRAFICA_ARRIBA + ALTO_GRAFICA)
+        if hasattr(img_barras, "read"):
+            img_barras.seek(0)
+            c.drawImage(ImageReader(img_barras), X_GRAFICA_PNG, abajo, ANCHO_GRAFICA, ALTO_GRAFICA, mask='auto')
+        else:
+            from reportlab.graphics import renderPDF
+            renderPDF.draw(img_barras, c, X_GRAFICA_VECTORIAL, abajo)
+
+
+def _pagina_evolucion(c, sexo, evolucion):
+    from reportlab.graphics import renderPDF
+    c.setFont(*TITULO2)
+    c.setFillColor(NEGRO)
+    c.drawString(MARGEN_X, y_pagina(Y_EVOLUCION), "Evolución entre administraciones")
+    c.setFont(*NORMAL)
+    c.drawString(MARGEN_X, y_pagina(Y_EVOLUCION_PERIODO), titulo_evolucion(evolucion))
+    renderPDF.draw(grafica_evolucion(evolucion, sexo), c, MARGEN_X, y_pagina(EVOLUCION_ARRIBA + ALTO_EVOLUCION))
+
+
+def dibujar_informe(c, nombre, sexo, fecha, terapeuta, resultados, scl90r_escalas, respuestas, img_barras=None,
+                    normas=None, evolucion=None):
+    # Añade las dos páginas del informe a un canvas ya abierto (sirve también para PDF con varios pacientes),
+    # y una tercera con la evolución si se pasa la historia del paciente
+    with tramo("pdf.canvas.respuestas"):
+        _pagina_respuestas(c, nombre, sexo, fecha, terapeuta, respuestas)
+    c.showPage()
+    with tramo("pdf.canvas.resultados"):
+        _pagina_resultados(c, sexo, resultados, scl90r_escalas, img_barras, normas)
+    c.showPage()
+    if evolucion is not None:
+        with tramo("pdf.canvas.evolucion", administraciones=len(evolucion.fechas)):
+            _pagina_evolucion(c, sexo, evolucion)
+        c.showPage()
+
+
+def generar_pdf(ruta_pdf, nombre, sexo, fecha, terapeuta, resultados, scl90r_escalas, respuestas, img_barras=None,
+                normas=None, evolucion=None):
+    # Misma firma que informe.generar_pdf
+    if len(respuestas) != 90:
+        raise ValueError(
+            f"Se esperaban 90 respuestas, pero se recibieron {len(respuestas)}.\n"
+            "Revisa que todos las entradas tengan valor.")
+    c = canvas.Canvas(ruta_pdf, pagesize=A4)
+    c.setSubject(asunto_pdf(normas))
+    dibujar_informe(c, nombre, sexo, fecha, terapeuta, resultados, scl90r_escalas, respuestas, img_barras, normas,
+                    evolucion)
+    with tramo("pdf.canvas.guardar"):
+        c.save()
@@ -0,0 +1,251 @@
+# ==================== REGISTRO DE TESTS (definiciones como datos) ====================
+# Cada instrumento se declara UNA sola vez como diccionario: ítems, escalas, ítems
+# adicionales y baremos por sexo. Al registrarlo se valida y se compila en un
+# PlanPuntuacion (matrices de índices y tablas de consulta) que se guarda en caché,
+# de modo que corregir cualquier test registrado son solo operaciones con arrays.
+# Las definiciones en sí están en definiciones.py (sin NumPy).
+import numpy as np
+
+from definiciones import SCL90R, SEXOS, clave_sexo  # noqa: F401 (se reexportan)
+
+
+class DefinicionInvalida(ValueError):
+    pass
+
+
+def validar(definicion):
+    # Lanza DefinicionInvalida con TODOS los problemas encontrados
+    errores = []
+    for clave in ("nombre", "version", "n_items", "rango", "escalas", "normas"):
+        if clave not in definicion:
+            errores.append(f"falta la clave '{clave}'")
+    if errores:
+        raise DefinicionInvalida("; ".join(errores))
+
+    n = definicion["n_items"]
+    if not isinstance(n, int) or n < 1:
+        raise DefinicionInvalida(f"n_items debe ser un entero positivo, no {n!r}")
+    minimo, maximo = definicion["rango"]
+    if not (isinstance(minimo, int) and isinstance(maximo, int) and 0 <= minimo < maximo):
+        errores.append(f"rango inválido {definicion['rango']!r}")
+
+    escalas = definicion["escalas"]
+    if not escalas:
+        errores.append("no hay escalas")
+    apariciones = {}
+    for escala, items in escalas.items():
+        if not items:
+            errores.append(f"la escala '{escala}' no tiene ítems")
+        for item in items:
+            if not isinstance(item, int) or not 1 <= item <= n:
+                errores.append(f"la escala '{escala}' contiene el ítem {item!r}, fuera de 1-{n}")
+        if len(set(items)) != len(items):
+            errores.append(f"la escala '{escala}' repite ítems")
+        for item in set(items):
+            apariciones.setdefault(item, []).append(escala)
+
+    adicionales = definicion.get("items_adicionales", [])
+    for item in adicionales:
+        if not isinstance(item, int) or not 1 <= item <= n:
+            errores.append(f"ítem adicional {item!r} fuera de 1-{n}")
+        elif item in apariciones:
+            errores.append(f"el ítem adicional {item} también está en {', '.join(apariciones[item])}")
+
+    # Solapamientos y huecos: solo se admiten si la definición los declara expresamente
+    compartidos = set(definicion.get("items_compartidos", []))
+    for item, donde in sorted(apariciones.items()):
+        if len(donde) > 1 and item not in compartidos:
+            errores.append(f"el ítem {item} aparece en varias escalas ({', '.join(donde)}) sin declararlo")
+    for item in sorted(compartidos):
+        if len(apariciones.get(item, [])) < 2:
+            errores.append(f"el ítem {item} se declara compartido pero no está en varias escalas")
+
+    sin_escala = set(definicion.get("items_sin_escala", []))
+    cubiertos = set(apariciones) | set(adicionales)
+    for item in range(1, n + 1):
+        if item not in cubiertos and item not in sin_escala:
+            errores.append(f"el ítem {item} no está en ninguna escala ni es adicional")
+    for item in sorted(sin_escala & cubiertos):
+        errores.append(f"el ítem {item} se declara sin escala pero sí está asignado")
+
+    cortes = definicion["normas"].get("cortes", {})
+    if "version" not in definicion["normas"]:
+        errores.append("las normas no indican su versión")
+    if set(cortes) != set(escalas):
+        faltan = set(escalas) - set(cortes)
+        sobran = set(cortes) - set(escalas)
+        if faltan:
+            errores.append(f"faltan cortes para: {', '.join(sorted(faltan))}")
+        if sobran:
+            errores.append(f"hay cortes de escalas inexistentes: {', '.join(sorted(sobran))}")
+    for escala, por_sexo in cortes.items():
+        for sexo in SEXOS:
+            valor = por_sexo.get(sexo)
+            if not isinstance(valor, (int, float)):
+                errores.append(f"falta el corte '{sexo}' de '{escala}'")
+            elif not minimo <= valor <= maximo:
+                errores.append(f"el corte '{sexo}' de '{escala}' ({valor}) está fuera del rango")
+
+    validez = definicion.get("validez")
+    if validez is not None:
+        if not definicion.get("indices_globales"):
+            errores.append("las reglas de validez necesitan los índices globales")
+        for sexo in SEXOS:
+            if not isinstance(validez.get("pst", {}).get(sexo), int):
+                errores.append(f"falta el límite de PST '{sexo}' en las reglas de validez")
+        if not isinstance(validez.get("psdi"), (int, float)):
+            errores.append("falta el límite de PSDI en las reglas de validez")
+
+    cambio = definicion.get("cambio")
+    if cambio is not None:
+        if not definicion.get("indices_globales"):
+            errores.append("el cambio fiable necesita los índices globales")
+        fiabilidad = cambio.get("fiabilidad", {})
+        for escala in list(escalas) + ["GSI"]:
+            valor = fiabilidad.get(escala)
+            if not isinstance(valor, (int, float)) or not 0 < valor < 1:
+                errores.append(f"falta la fiabilidad de '{escala}' (entre 0 y 1) para el cambio fiable")
+        for escala in sorted(set(fiabilidad) - set(escalas) - {"GSI"}):
+            errores.append(f"hay fiabilidad de una escala inexistente: '{escala}'")
+        corte_gsi = cambio.get("corte_gsi")
+        if not isinstance(corte_gsi, (int, float)) or not minimo <= corte_gsi <= maximo:
+            errores.append(f"corte_gsi inválido {corte_gsi!r}")
+
+    if errores:
+        raise DefinicionInvalida(f"{definicion['nombre']}: " + "; ".join(errores))
+
+
+class PlanPuntuacion:
+    # Definición compilada: todo lo que se consulta al corregir son arrays de NumPy
+    def __init__(self, definicion):
+        validar(definicion)
+        self.definicion = definicion
+        self.nombre = definicion["nombre"]
+        self.version = definicion["version"]
+        self.n_items = definicion["n_items"]
+        self.minimo, self.maximo = definicion["rango"]
+        self.indices_globales = definicion.get("indices_globales", False)
+        self.escalas = {escala: list(items) for escala, items in definicion["escalas"].items()}
+        self.items_adicionales = list(definicion.get("items_adicionales", []))
+        self.dimensiones = list(self.escalas)
+        self.version_normas = definicion["normas"]["version"]
+        self.normas = {escala: dict(definicion["normas"]["cortes"][escala]) for escala in self.dimensiones}
+
+        k = len(self.dimensiones)
+
+        # Índices (base 0) de los ítems de cada escala y matriz de incidencia ítems×escalas
+        self.indices = [np.asarray(items, dtype=np.intp) - 1 for items in self.escalas.values()]
+        self.incidencia = np.zeros((self.n_items, k), dtype=np.int32)
+        for d, indices in enumerate(self.indices):
+            self.incidencia[indices, d] = 1
+        self.n_items_escala = self.incidencia.sum(axis=0)
+
+        # Las sumas son enteras: todas las medias posibles se tabulan de antemano con
+        # round() de Python, así que el resultado coincide al céntimo con el informe
+        suma_max = self.maximo * int(self.n_items_escala.max())
+        self.tabla_medias = np.zeros((k, suma_max + 1))
+        for d, n in enumerate(self.n_items_escala.tolist()):
+            self.tabla_medias[d, :self.maximo * n + 1] = [round(s / n, 2) for s in range(self.maximo * n + 1)]
+
+        # Cortes por sexo (fila 0 = H, fila 1 = M) y tabla suma → ¿clínico?
+        self.tabla_cortes = np.array([[self.normas[escala][sexo] for escala in self.dimensiones]
+                                      for sexo in SEXOS])
+        self.tabla_clinico = self.tabla_medias[np.newaxis, :, :] >= self.tabla_cortes[:, :, np.newaxis]
+
+        total_max = self.maximo * self.n_items
+        self.tabla_gsi = np.array([round(t / self.n_items, 2) for t in range(total_max + 1)])
+        self.tabla_psdi = np.array([[round(t / p, 2) if p > 0 else 0 for p in range(self.n_items + 1)]
+                                    for t in range(total_max + 1)])
+        self._columnas_escala = np.arange(k)
+
+        # Límites de validez (PST por sexo, PSDI); None si el test no los declara
+        validez = definicion.get("validez")
+        self.limites_pst = np.array([validez["pst"][sexo] for sexo in SEXOS]) if validez else None
+        self.limite_psdi = validez["psdi"] if validez else None
+
+        # Cambio fiable: fiabilidad de las dimensiones y del GSI (en ese orden) y cortes por
+        # sexo con el del GSI como última columna; None si el test no lo declara
+        cambio = definicion.get("cambio")
+        self.fiabilidad = (np.array([cambio["fiabilidad"][c] for c in self.dimensiones + ["GSI"]])
+                           if cambio else None)
+        self.cortes_cambio = (np.column_stack([self.tabla_cortes, np.full(len(SEXOS), cambio["corte_gsi"])])
+                              if cambio else None)
+
+    def cortes(self, sexo):
+        return self.tabla_cortes[SEXOS.index(clave_sexo(sexo))]
+
+    def como_matriz(self, respuestas):
+        # Acepta un array N×n_items, una lista de filas o una única fila
+        matriz = np.asarray(respuestas)
+        if matriz.ndim == 1:
+            matriz = matriz[np.newaxis, :]
+        if matriz.ndim != 2 or matriz.shape[1] != self.n_items:
+            raise ValueError(f"Se esperaban {self.n_items} respuestas por fila, forma recibida {matriz.shape}")
+        if matriz.dtype.kind == 'f':
+            if not np.array_equal(matriz, np.round(matriz)):
+                raise ValueError("Alguna respuesta no es un número entero")
+        elif matriz.dtype.kind not in 'iub':
+            raise ValueError("Alguna respuesta no es numérica")
+        matriz = matriz.astype(np.int32, copy=False)
+        if matriz.size and (matriz.min() < self.minimo or matriz.max() > self.maximo):
+            fila, item = np.argwhere((matriz < self.minimo) | (matriz > self.maximo))[0]
+            raise ValueError(f"La respuesta {item+1} de la fila {fila+1} está fuera del rango")
+        return matriz
+
+    def puntuar(self, respuestas):
+        # Corrige todas las filas en una sola pasada: un producto de matrices y consultas a tablas
+        matriz = self.como_matriz(respuestas)
+        brutos = matriz @ self.incidencia
+        puntuaciones = {
+            "brutos": brutos,
+            "medias": self.tabla_medias[self._columnas_escala, brutos],
+        }
+        if self.indices_globales:
+            total = matriz.sum(axis=1)
+            pst = np.count_nonzero(matriz, axis=1)
+            puntuaciones["GSI"] = self.tabla_gsi[total]
+            puntuaciones["PST"] = pst
+            puntuaciones["PSDI"] = self.tabla_psdi[total, pst]
+        return puntuaciones
+
+    def clinico(self, brutos, sexos):
+        # N×k booleanos (media ≥ corte) a partir de las sumas brutas; sexos: uno por fila o uno para todas
+        if isinstance(sexos, str):
+            fila_sexo = np.full(len(brutos), SEXOS.index(clave_sexo(sexos)))
+        else:
+            fila_sexo = np.array([SEXOS.index(clave_sexo(s)) for s in sexos])
+        return self.tabla_clinico[fila_sexo[:, np.newaxis], self._columnas_escala, brutos]
+
+    def validez(self, puntuaciones, sexos):
+        # {"simulacion", "dramatizacion"}: N booleanos. sexos: 'H'/'M' por fila; '' (sexo
+        # desconocido) no se marca como simulación porque el límite depende del sexo
+        sexos = np.asarray(sexos)
+        conocido = sexos != ""
+        fila_sexo = np.where(sexos == "H", 0, 1)
+        return {"simulacion": conocido & (puntuaciones["PST"] > self.limites_pst[fila_sexo]),
+                "dramatizacion": puntuaciones["PSDI"] > self.limite_psdi}
+
+
+# === REGISTRO ===
+_REGISTRO = {}
+
+
+def registrar(definicion):
+    # Valida, compila y guarda el plan; devuelve el plan compilado
+    plan_compilado = PlanPuntuacion(definicion)
+    _REGISTRO[plan_compilado.nombre] = plan_compilado
+    return plan_compilado
+
+
+def plan(nombre="SCL-90-R"):
+    try:
+        return _REGISTRO[nombre]
+    except KeyError:
+        raise KeyError(f"Test no registrado: '{nombre}' (disponibles: {', '.join(_REGISTRO)})") from None
+
+
+def registrados():
+    return list(_REGISTRO)
+
+
+registrar(SCL90R)
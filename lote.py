@@ -0,0 +1,198 @@
+# ==================== MODO LOTE (línea de comandos) ====================
+# Lee un CSV de pacientes (nombre, sexo, fecha, evaluador + 90 respuestas) y genera
+# un PDF por fila repartiendo el trabajo de matplotlib/ReportLab entre varios procesos.
+#
+#   python main.py pacientes.csv -o informes/ -j 4
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from puntuacion import N_ITEMS
+from traza import tramo
+
+# Columnas de cabecera aceptadas (en minúsculas) para los datos de la persona evaluada
+COLUMNAS_META = {
+    "nombre": "nombre",
+    "sexo": "sexo",
+    "fecha": "fecha",
+    "evaluador": "terapeuta",
+    "terapeuta": "terapeuta",
+}
+
+SEXOS = {"hombre": "Hombre", "h": "Hombre", "mujer": "Mujer", "m": "Mujer"}
+
+
+class ErrorFila(ValueError):
+    pass
+
+
+def normalizar_sexo(valor):
+    sexo = SEXOS.get(str(valor).strip().lower())
+    if sexo is None:
+        raise ErrorFila(f"Sexo no reconocido: '{valor}' (usa Hombre/Mujer)")
+    return sexo
+
+
+def convertir_respuestas(valores):
+    if len(valores) != N_ITEMS:
+        raise ErrorFila(f"Se esperaban {N_ITEMS} respuestas, pero se recibieron {len(valores)}")
+    respuestas = []
+    for i, val in enumerate(valores):
+        val = str(val).strip()
+        if not (val.isdigit() and 0 <= int(val) <= 4):
+            raise ErrorFila(f"La respuesta {i+1} está fuera del rango 0-4: '{val}'")
+        respuestas.append(int(val))
+    return respuestas
+
+
+def leer_pacientes(ruta):
+    # Genera (número de fila, paciente) o (número de fila, ErrorFila) por cada línea de datos.
+    # La cabecera nombra las columnas de datos personales; el resto de columnas, en orden,
+    # son las 90 respuestas.
+    with open(ruta, newline='', encoding='utf-8-sig') as f:
+        muestra = f.read(4096)
+        f.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+        lector = csv.reader(f, dialecto)
+
+        cabecera = [c.strip().lower() for c in next(lector, [])]
+        meta = {COLUMNAS_META[c]: i for i, c in enumerate(cabecera) if c in COLUMNAS_META}
+        faltan = {"nombre", "sexo", "fecha", "terapeuta"} - set(meta)
+        if faltan:
+            raise ValueError(f"Faltan columnas en la cabecera: {', '.join(sorted(faltan))}")
+        cols_respuestas = [i for i, c in enumerate(cabecera) if c not in COLUMNAS_META]
+
+        for n_fila, fila in enumerate(lector, start=2):
+            if not any(c.strip() for c in fila):
+                continue  # líneas vacías
+            try:
+                if len(fila) != len(cabecera):
+                    raise ErrorFila(f"La fila tiene {len(fila)} columnas y la cabecera {len(cabecera)}")
+                nombre = fila[meta["nombre"]].strip()
+                terapeuta = fila[meta["terapeuta"]].strip()
+                if not nombre:
+                    raise ErrorFila("Falta el nombre de la persona evaluada")
+                if not terapeuta:
+                    raise ErrorFila("Falta el nombre del/de la terapeuta")
+                yield n_fila, {
+                    "nombre": nombre,
+                    "sexo": normalizar_sexo(fila[meta["sexo"]]),
+                    "fecha": fila[meta["fecha"]].strip(),
+                    "terapeuta": terapeuta,
+                    "respuestas": convertir_respuestas([fila[i] for i in cols_respuestas]),
+                }
+            except ErrorFila as e:
+                yield n_fila, e
+
+
+def nombre_archivo(paciente):
+    # Mismo nombre sugerido que el diálogo de guardado de la ventana
+    base = f"SCL90R_{paciente['nombre'].replace(' ', '_')}_{paciente['fecha'].replace('/', '-')}"
+    return re.sub(r'[\\/:*?"<>|]', '_', base) + ".pdf"
+
+
+def generar_informe(paciente, ruta_pdf, motor_grafica=None, motor_pdf=None):
+    # Corrige, dibuja la gráfica y escribe el PDF de un paciente
+    import informe
+    informe.generar_informe(ruta_pdf, paciente["nombre"], paciente["sexo"], paciente["fecha"],
+                            paciente["terapeuta"], paciente["respuestas"], motor_grafica=motor_grafica,
+                            motor_pdf=motor_pdf)
+
+
+def _procesar(trabajo):
+    n_fila, paciente, ruta_pdf, motor_grafica, motor_pdf = trabajo
+    try:
+        generar_informe(paciente, ruta_pdf, motor_grafica, motor_pdf)
+        return n_fila, ruta_pdf, None
+    except Exception as e:
+        return n_fila, None, f"{type(e).__name__}: {e}"
+
+
+def _trabajos(pacientes, carpeta_salida, errores, motor_grafica, motor_pdf):
+    usados = set()
+    for n_fila, paciente in pacientes:
+        if isinstance(paciente, Exception):
+            errores.append((n_fila, str(paciente)))
+            continue
+        archivo = nombre_archivo(paciente)
+        if archivo in usados:  # mismo nombre y fecha → sufijo con la fila
+            archivo = archivo[:-4] + f"_fila{n_fila}.pdf"
+        usados.add(archivo)
+        yield n_fila, paciente, os.path.join(carpeta_salida, archivo), motor_grafica, motor_pdf
+
+
+def ejecutar_lote(ruta_entrada, carpeta_salida, trabajadores=None, salida_errores=sys.stderr,
+                  motor_grafica=None, motor_pdf=None):
+    # Devuelve (informes generados, lista de (fila, error), segundos)
+    os.makedirs(carpeta_salida, exist_ok=True)
+    trabajadores = trabajadores or os.cpu_count() or 1
+    errores = []
+    generados = 0
+
+    inicio = time.perf_counter()
+    trabajos = list(_trabajos(leer_pacientes(ruta_entrada), carpeta_salida, errores,
+                              motor_grafica, motor_pdf))
+    for n_fila, error in errores:
+        print(f"Fila {n_fila}: {error}", file=salida_errores)
+
+    if trabajos:
+        # Trozos pequeños: reparto equilibrado sin pagar el coste de un envío por informe
+        chunksize = max(1, min(16, len(trabajos) // (trabajadores * 4)))
+        with tramo("lote", informes=len(trabajos), trabajadores=trabajadores), \
+                ProcessPoolExecutor(max_workers=trabajadores) as pool:
+            for n_fila, ruta_pdf, error in pool.map(_procesar, trabajos, chunksize=chunksize):
+                if error:
+                    errores.append((n_fila, error))
+                    print(f"Fila {n_fila}: {error}", file=salida_errores)
+                else:
+                    generados += 1
+    segundos = time.perf_counter() - inicio
+    return generados, errores, segundos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="SCL-90-R",
+        description="Genera un informe PDF del SCL-90-R por cada fila de un CSV de pacientes.")
+    parser.add_argument("entrada", help="CSV con columnas nombre, sexo, fecha, evaluador y las 90 respuestas")
+    parser.add_argument("-o", "--salida", default="informes", help="carpeta de salida (por defecto: informes)")
+    parser.add_argument("-j", "--trabajadores", type=int, default=None,
+                        help="número de procesos (por defecto: núcleos de la CPU)")
+    parser.add_argument("--grafica", choices=("matplotlib", "vectorial"), default=None,
+                        help="motor de la gráfica: matplotlib (PNG) o vectorial (ReportLab, más rápido); "
+                             "por defecto el de la variable SCL90_GRAFICA o matplotlib")
+    parser.add_argument("--pdf", choices=("platypus", "canvas"), default=None,
+                        help="motor del PDF: platypus (párrafos y tablas) o canvas (mismo diseño con "
+                             "coordenadas fijas, más rápido); por defecto el de la variable SCL90_PDF o platypus")
+    parser.add_argument("--cache", default=None, metavar="CARPETA",
+                        help="guarda y reutiliza correcciones y gráficas en esta carpeta (también SCL90_CACHE)")
+    args = parser.parse_args(argv)
+
+    if args.cache:
+        import cache
+        cache.activar_disco(args.cache)
+    if args.trabajadores is not None and args.trabajadores < 1:
+        parser.error("--trabajadores debe ser al menos 1")
+
+    try:
+        generados, errores, segundos = ejecutar_lote(args.entrada, args.salida, args.trabajadores,
+                                                   motor_grafica=args.grafica, motor_pdf=args.pdf)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    ritmo = generados / segundos if segundos > 0 else 0.0
+    print(f"{generados} informes generados en {segundos:.1f} s ({ritmo:.1f} informes/s), "
+          f"{len(errores)} filas con error")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,34 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-import matplotlib.pyplot as plt
-import io
 import os
+import sys
+import threading
+
+from traza import tramo
+from en_vivo import PuntuacionEnVivo
+
+# NumPy, matplotlib y ReportLab NO se importan aquí: tardan varios segundos en el .exe
+# y solo hacen falta al pulsar "CORREGIR Y GENERAR PDF". Se cargan bajo demanda
+# (y se precalientan en segundo plano una vez mostrada la ventana).
+# Comprobar con: python comprobar_arranque.py
+MODULOS_DIFERIDOS = ("puntuacion", "informe")
+
+# Abreviaturas de las dimensiones en el panel en vivo (mismo orden que las escalas)
+ABREVIATURAS = ("SOM", "OBS", "INT", "DEP", "ANS", "HOS", "FOB", "PAR", "PSI")
+
+# Subórdenes de línea de comandos: python main.py <orden> ... (sin orden → modo lote de PDF)
+COMANDOS = {
+    "puntuar": "flujo",
+    "benchmark": "benchmark",
+    "cohorte": "cohorte",
+    "normas": "normas_locales",
+    "servicio": "servicio",
+    "archivo": "archivo_compacto",
+    "recalcular": "recalculo",
+    "cribar": "cribado",
+    "evolucion": "evolucion",
+}
 
 class CorrectorPsicometrico:
     def __init__(self, root):
@@ -55,6 +76,28 @@ class CorrectorPsicometrico:
         self.entry_terapeuta = ttk.Entry(header_frame, width=20, style='Modern.TEntry')
         self.entry_terapeuta.grid(row=1, column=1, sticky='w', padx=(0, 20))
 
+        # Entrada rápida: se teclean los 90 dígitos seguidos y el cursor avanza solo
+        self.entrada_rapida = tk.BooleanVar(value=False)
+        ttk.Checkbutton(header_frame, text="Entrada rápida", variable=self.entrada_rapida).grid(
+            row=1, column=2, columnspan=2, sticky='w')
+
+        # === PANEL DE PUNTUACIONES EN VIVO ===
+        # Sumas por dimensión mantenidas tecla a tecla (en_vivo.py); el repintado se agrupa
+        # con after_idle para que una ráfaga de teclas solo redibuje una vez
+        self.en_vivo = PuntuacionEnVivo()
+        self._repintado_pendiente = False
+        panel_frame = ttk.LabelFrame(root, text="Puntuaciones en vivo", padding=(10, 2))
+        panel_frame.pack(fill='x', padx=10, pady=(0, 5))
+        self.lbl_dimensiones = []
+        for d, abreviatura in enumerate(ABREVIATURAS):
+            ttk.Label(panel_frame, text=abreviatura, style='Header.TLabel').grid(row=0, column=d, padx=4)
+            etiqueta = ttk.Label(panel_frame, text="0.00", style='Modern.TLabel')
+            etiqueta.grid(row=1, column=d, padx=4)
+            self.lbl_dimensiones.append(etiqueta)
+        self.lbl_globales = ttk.Label(panel_frame, text="", style='Modern.TLabel')
+        self.lbl_globales.grid(row=0, column=len(ABREVIATURAS), rowspan=2, sticky='w', padx=(15, 0))
+        self.entry_sexo.bind('<<ComboboxSelected>>', lambda e: self._programar_repintado(), add='+')
+
         # === CUADRÍCULA 6 COLS x 30 FILAS (3 columnas: Label+Entry repetido) ===
         # Container para scroll
         container = ttk.Frame(root)
@@ -78,6 +121,16 @@ class CorrectorPsicometrico:
         self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
         self.canvas.configure(yscrollcommand=scrollbar_v.set, xscrollcommand=scrollbar_h.set)
 
+        # === BINDINGS A NIVEL DE ETIQUETA (bindtags) ===
+        # Se registran UNA vez por clase/etiqueta en lugar de widget a widget:
+        #   "Desplazable" → rueda del ratón para todo lo que está dentro del área con scroll
+        #   "Likert"      → validación, Tab/Enter y entrada rápida de las 90 respuestas
+        self._registrar_bindings_desplazable()
+        self._registrar_bindings_likert()
+
+        for widget in (self.canvas, self.scrollable_frame, container):
+            self._añadir_etiqueta(widget, "Desplazable")
+
         # Crear 30 filas x 6 columnas (cols 0,2,4: Labels "Pregunta X"; cols 1,3,5: Entries)
         self.entries = []  # Lista plana de 90 entries para tab order vertical
         for sub in range(3): #3 columnas
@@ -87,60 +140,27 @@ class CorrectorPsicometrico:
             for row in range(30):  # 30 preguntas
                 # Label "Pregunta X" (compartido visualmente, pero por columnas)
                 label_text = f"Pregunta {row+sub*30+1}"
-                ttk.Label(self.scrollable_frame, text=label_text, style='Modern.TLabel', width=18, anchor='center').grid(
-                    row=row+1, column=col_label, sticky='nsew', padx=1, pady=1
-                )
+                label = ttk.Label(self.scrollable_frame, text=label_text, style='Modern.TLabel', width=18, anchor='center')
+                label.grid(row=row+1, column=col_label, sticky='nsew', padx=1, pady=1)
+                self._añadir_etiqueta(label, "Desplazable")
 
-                # Entry para Likert 0-4
+                # Entry para Likert 0-4 (validación en tiempo real vía la etiqueta "Likert")
                 entry = ttk.Entry(self.scrollable_frame, width=6, style='Modern.TEntry')
                 entry.grid(row=row+1, column=col_entry, sticky='nsew', padx=1, pady=1)
+                self._añadir_etiqueta(entry, "Desplazable")
+                self._añadir_etiqueta(entry, "Likert")
                 self.entries.append(entry)  # Añadir a lista plana para tab
 
-                # Validación en tiempo real (solo 0-4)
-                entry.bind('<KeyRelease>', self._validar_likert)
-                        
-        # === ACTUALIZAR SCROLLREGION PERFECTAMENTE (vertical + horizontal) ===
-        def actualizar_scrollregion():
-            self.canvas.update_idletasks()  # Fuerza a Tkinter a calcular todos los tamaños
-            region = self.canvas.bbox("all")
-            if region:
-                self.canvas.configure(scrollregion=region)
-
-        # Lo llamamos varias veces para asegurar que pille el tamaño real
-        self.root.after(100, actualizar_scrollregion)
-        self.root.after(300, actualizar_scrollregion)
-        self.root.after(600, actualizar_scrollregion)
-
-        # Y también cada vez que cambie el tamaño de la ventana o del contenido
-        self.canvas.bind("<Configure>", lambda e: actualizar_scrollregion())
-        self.scrollable_frame.bind("<Configure>", lambda e: actualizar_scrollregion())
+        # Posición de cada entry en la lista: moverse al siguiente es O(1)
+        self._indice_entry = {entry: i for i, entry in enumerate(self.entries)}
+        self._repintar_panel()
 
-        for widget in (self.canvas, self.scrollable_frame, container):
-                widget.bind("<MouseWheel>", self._on_mousewheel)
-                widget.bind("<Shift-MouseWheel>", self._on_shift_mousewheel)
-                widget.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-1, "units"))
-                widget.bind("<Button-5>", lambda e: self.canvas.yview_scroll(1, "units"))
-                widget.bind("<Shift-Button-4>", lambda e: self.canvas.xview_scroll(-1, "units"))
-                widget.bind("<Shift-Button-5>", lambda e: self.canvas.xview_scroll(1, "units"))
-
-        def bind_all_children(parent):
-            for child in parent.winfo_children():
-                child.bind("<MouseWheel>", self._on_mousewheel)
-                child.bind("<Shift-MouseWheel>", self._on_shift_mousewheel)
-                child.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-1, "units"))
-                child.bind("<Button-5>", lambda e: self.canvas.yview_scroll(1, "units"))
-                child.bind("<Shift-Button-4>", lambda e: self.canvas.xview_scroll(-1, "units"))
-                child.bind("<Shift-Button-5>", lambda e: self.canvas.xview_scroll(1, "units"))
-                if child.winfo_children():
-                    bind_all_children(child)
-
-        self.scrollable_frame.bind("<Configure>", lambda e: bind_all_children(self.scrollable_frame))
-        self.root.after(500, lambda: bind_all_children(self.scrollable_frame))
-        
-        # === TAB ORDER VERTICAL: Col1 (0-29), Col2 (30-59), Col3 (60-89) ===
-        for i, entry in enumerate(self.entries):
-            entry.lift()  # Asegurar visibilidad
-        self._configurar_tab_order()
+        # === ACTUALIZAR SCROLLREGION (con antirrebote) ===
+        # Un redimensionado genera ráfagas de <Configure>; solo se recalcula al terminar
+        self._scrollregion_pendiente = None
+        self.root.after(100, self._actualizar_scrollregion)
+        self.canvas.bind("<Configure>", self._programar_scrollregion)
+        self.scrollable_frame.bind("<Configure>", self._programar_scrollregion)
 
         # === BOTÓN CORREGIR ===
         button_frame = ttk.Frame(root)
@@ -148,7 +168,83 @@ class CorrectorPsicometrico:
         self.btn_corregir = ttk.Button(button_frame, text="CORREGIR Y GENERAR PDF", command=self.corregir, style='Modern.TButton', cursor='hand2')
         self.btn_corregir.pack()
 
+        # === PROGRESO DE LOS INFORMES EN SEGUNDO PLANO ===
+        progreso_frame = ttk.Frame(root)
+        progreso_frame.pack(fill='x', padx=10, pady=(0, 10))
+        self.barra_progreso = ttk.Progressbar(progreso_frame, mode='indeterminate', length=160)
+        self.barra_progreso.pack(side='left')
+        self.lbl_estado = ttk.Label(progreso_frame, text="", style='Modern.TLabel')
+        self.lbl_estado.pack(side='left', padx=10)
+        self.btn_cancelar = ttk.Button(progreso_frame, text="Cancelar", command=self.cancelar_informes, state='disabled')
+        self.btn_cancelar.pack(side='right')
+
+        self.cola_informes = None      # se crea con el primer informe
+        self._sondeando = False
+
+        # Escribir en la cabecera también cuenta como empezar otro paciente
+        for widget in (self.entry_nombre, self.entry_fecha, self.entry_terapeuta):
+            widget.bind('<KeyRelease>', self._formulario_modificado, add='+')
+
+        # Precalentar los módulos pesados cuando la ventana ya está pintada
+        self.root.after(200, self._precargar_modulos)
+
     # === FUNCIONES INTERNAS ===
+    # Carga diferida de NumPy/matplotlib/ReportLab en un hilo aparte
+    def _precargar_modulos(self):
+        def precargar():
+            import importlib
+            for modulo in MODULOS_DIFERIDOS:
+                try:
+                    importlib.import_module(modulo)
+                except Exception:
+                    pass  # si falla, el error se mostrará al corregir
+        threading.Thread(target=precargar, name="precarga", daemon=True).start()
+
+    # === BINDINGS Y SCROLL ===
+    @staticmethod
+    def _añadir_etiqueta(widget, etiqueta):
+        # Inserta la etiqueta justo detrás del propio widget, antes de su clase
+        # (así un "break" en la etiqueta evita el comportamiento por defecto)
+        tags = list(widget.bindtags())
+        tags.insert(1, etiqueta)
+        widget.bindtags(tuple(tags))
+
+    def _registrar_bindings_desplazable(self):
+        self.root.bind_class("Desplazable", "<MouseWheel>", self._on_mousewheel)
+        self.root.bind_class("Desplazable", "<Shift-MouseWheel>", self._on_shift_mousewheel)
+        self.root.bind_class("Desplazable", "<Button-4>", lambda e: self.canvas.yview_scroll(-1, "units"))
+        self.root.bind_class("Desplazable", "<Button-5>", lambda e: self.canvas.yview_scroll(1, "units"))
+        self.root.bind_class("Desplazable", "<Shift-Button-4>", lambda e: self.canvas.xview_scroll(-1, "units"))
+        self.root.bind_class("Desplazable", "<Shift-Button-5>", lambda e: self.canvas.xview_scroll(1, "units"))
+
+    def _programar_scrollregion(self, event=None):
+        if self._scrollregion_pendiente is not None:
+            self.root.after_cancel(self._scrollregion_pendiente)
+        self._scrollregion_pendiente = self.root.after(50, self._actualizar_scrollregion)
+
+    def _actualizar_scrollregion(self):
+        # En <Configure> Tk ya ha calculado los tamaños: no hace falta update_idletasks
+        self._scrollregion_pendiente = None
+        region = self.canvas.bbox("all")
+        if region:
+            self.canvas.configure(scrollregion=region)
+
+    # Desplaza el canvas lo justo para que se vea el entry con el foco
+    def _asegurar_visible(self, entry):
+        region = self.canvas.bbox("all")
+        if not region:
+            return
+        alto_total = region[3] - region[1]
+        if alto_total <= 0:
+            return
+        arriba = entry.winfo_y()
+        abajo = arriba + entry.winfo_height()
+        vista_arriba, vista_abajo = self.canvas.yview()
+        if arriba < vista_arriba * alto_total:
+            self.canvas.yview_moveto(arriba / alto_total)
+        elif abajo > vista_abajo * alto_total:
+            self.canvas.yview_moveto(max(0, abajo / alto_total - (vista_abajo - vista_arriba)))
+
     # Movimiento del ratón
     def _on_mousewheel(self, event):
         self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
@@ -167,21 +263,86 @@ class CorrectorPsicometrico:
             entry.delete(0, tk.END)
             entry.insert(0, "")  # Limpiar inválido
             messagebox.showwarning("Validación", "Solo números 0-4 permitidos")
+        self._actualizar_item(entry)
+        self._formulario_modificado(event)
+
+    # === PUNTUACIÓN EN VIVO ===
+    # Solo se toca el ítem que ha cambiado: O(1) por tecla, sin recorrer los 90 entries
+    def _actualizar_item(self, entry):
+        indice = self._indice_entry.get(entry)
+        if indice is None:
+            return
+        valor = entry.get().strip()
+        valor = int(valor) if valor.isdigit() and int(valor) <= 4 else None
+        if self.en_vivo.cambiar(indice, valor):
+            self._programar_repintado()
 
-    # Configuración de <tab> y <enter>
-    def _configurar_tab_order(self):
-        # Bind Tab para order vertical: Col1 → Col2 → Col3 (ciclo)
-        def next_tab(event):
-            current = event.widget
-            idx = self.entries.index(current)
-            next_idx = (idx + 1) % len(self.entries)
-            self.entries[next_idx].focus_set()
-            return "break"
+    def _programar_repintado(self):
+        if not self._repintado_pendiente:
+            self._repintado_pendiente = True
+            self.root.after_idle(self._repintar_panel)
 
-        for entry in self.entries:
-            entry.bind('<Tab>', next_tab)
-            entry.bind('<Return>', next_tab)
-            entry.bind('<Shift-Tab>', lambda e: "break")
+    def _repintar_panel(self):
+        self._repintado_pendiente = False
+        sexo = self.entry_sexo.get().strip()
+        vivo = self.en_vivo
+        for etiqueta, media, clinica in zip(self.lbl_dimensiones, vivo.medias(), vivo.clinicas(sexo)):
+            etiqueta.configure(text=f"{media:.2f}", foreground='#c62828' if clinica else '#333')
+        gsi, pst, psdi = vivo.globales()
+        simulacion, dramatizacion = vivo.avisos(sexo)
+        texto = f"GSI {gsi:.2f}   PST {pst}   PSDI {psdi:.2f}   ({vivo.respondidos}/{vivo.n_items} respondidos)"
+        if simulacion or dramatizacion:
+            texto += "   ⚠ validez"
+        self.lbl_globales.configure(text=texto, foreground='#c62828' if simulacion or dramatizacion else '#333')
+
+    # Tras enviar un informe el botón queda bloqueado (evita el doble clic) hasta que
+    # se empieza a escribir el siguiente paciente; así se pueden encolar varios
+    def _formulario_modificado(self, event=None):
+        if str(self.btn_corregir['state']) == 'disabled' and event is not None and event.char and event.char.isprintable():
+            self.btn_corregir.configure(state='normal')
+
+    # Configuración de <tab>, <enter> y entrada rápida (una sola vez, para la etiqueta "Likert")
+    def _registrar_bindings_likert(self):
+        self.root.bind_class("Likert", "<KeyRelease>", self._validar_likert)
+        self.root.bind_class("Likert", "<KeyPress>", self._tecla_rapida)
+        self.root.bind_class("Likert", "<Tab>", self._siguiente_entry)
+        self.root.bind_class("Likert", "<Return>", self._siguiente_entry)
+        self.root.bind_class("Likert", "<Shift-Tab>", lambda e: "break")
+
+    def _mover_foco(self, entry, paso):
+        # Orden vertical: Col1 → Col2 → Col3 (ciclo)
+        destino = self.entries[(self._indice_entry[entry] + paso) % len(self.entries)]
+        destino.focus_set()
+        destino.select_range(0, tk.END)
+        self._asegurar_visible(destino)
+        return destino
+
+    def _siguiente_entry(self, event):
+        self._mover_foco(event.widget, 1)
+        return "break"
+
+    # Modo rápido: cada dígito 0-4 sustituye el valor y salta al siguiente ítem;
+    # Retroceso en un ítem vacío vuelve al anterior. Sin ventanas emergentes.
+    def _tecla_rapida(self, event):
+        if not self.entrada_rapida.get():
+            return None
+        entry = event.widget
+        if event.char and event.char in "01234":
+            entry.delete(0, tk.END)
+            entry.insert(0, event.char)
+            self._actualizar_item(entry)  # el <KeyRelease> llegará ya al siguiente ítem
+            self._formulario_modificado(event)
+            self._mover_foco(entry, 1)
+            return "break"
+        if event.keysym == "BackSpace" and not entry.get():
+            anterior = self._mover_foco(entry, -1)
+            anterior.delete(0, tk.END)
+            self._actualizar_item(anterior)
+            return "break"
+        if event.char and event.char.isprintable():
+            entry.bell()  # cualquier otro carácter se ignora
+            return "break"
+        return None
 
     def corregir(self):
         nombre = self.entry_nombre.get().strip()
@@ -200,324 +361,117 @@ class CorrectorPsicometrico:
         nombre_por_defecto = f"SCL90R_{nombre.replace(' ', '_')}_{self.entry_fecha.get().replace('/', '-')}.pdf"
 
         # Abrir diálogo de guardado (funciona en Windows, Linux y macOS)
-        ruta_archivo = filedialog.asksaveasfilename(
-            title="Guardar informe SCL-90-R",
-            defaultextension=".pdf",
-            filetypes=[("Archivo PDF", "*.pdf"), ("Todos los archivos", "*.*")],
-            initialfile=nombre_por_defecto,           # nombre sugerido
-            initialdir="~/Desktop" if os.name != "nt" else None  # en Linux/mac abre en Escritorio
-        )
+        with tramo("dialogo_guardar"):
+            ruta_archivo = filedialog.asksaveasfilename(
+                title="Guardar informe SCL-90-R",
+                defaultextension=".pdf",
+                filetypes=[("Archivo PDF", "*.pdf"), ("Todos los archivos", "*.*")],
+                initialfile=nombre_por_defecto,           # nombre sugerido
+                initialdir="~/Desktop" if os.name != "nt" else None  # en Linux/mac abre en Escritorio
+            )
 
         # Si el usuario cancela → salir
         if not ruta_archivo:
             messagebox.showinfo("Cancelado", "Guardado cancelado por el usuario")
             return
 
-        # ==================== SCL-90-R OFICIAL ====================
-        # Índices de los ítems para cada dimensión (empezando en 0, no en 1)
-        scl90r_escalas = {
-            "Somatización":          [1, 4, 12, 27, 40, 42, 48, 49, 52, 53, 56, 58],      # 12 ítems
-            "Obsesividad-Compulsividad": [3, 9, 10, 18, 28, 38, 45, 46, 51, 55],          # 10 ítems
-            "Sensibilidad Interpersonal": [6, 21, 34, 36, 37, 41, 61, 69, 73],           # 9 ítems
-            "Depresión":             [5, 14, 15, 20, 22, 26, 29, 30, 31, 32, 54, 71, 79], # 13 ítems
-            "Ansiedad":              [2, 17, 23, 33, 39, 57, 72, 78, 80, 86],             # 10 ítems
-            "Hostilidad":            [11, 24, 63, 67, 74, 81],                            # 6 ítems
-            "Ansiedad Fóbica":       [13, 25, 47, 50, 70, 75, 82],                        # 7 ítems
-            "Ideación Paranoide":    [8, 18, 43, 68, 76, 83],                             # 6 ítems
-            "Psicotismo":            [7, 16, 35, 62, 77, 84, 85, 87, 88, 90]              # 10 ítems
-        }
-
-        # Ítems ADICIONALES (no entran en las 9 dimensiones, pero sí en los índices globales)
-        items_adicionales = [19, 44, 59, 60, 64, 66, 89]   # 7 ítems que solo cuentan en GSI, PSDI, PST
-
         # === RECOGER RESPUESTAS ===
-        respuestas = []
-        for entry in self.entries:
-            val = entry.get().strip()
-            respuestas.append(int(val) if val.isdigit() else 0)  # 0 por defecto
+        # Los entries que no pasaron por el teclado (p. ej. pegados con el ratón) se
+        # sincronizan aquí con el panel en vivo antes de reutilizar sus sumas
+        with tramo("recoger_respuestas"):
+            respuestas = []
+            for i, entry in enumerate(self.entries):
+                val = entry.get().strip()
+                respuestas.append(int(val) if val.isdigit() else 0)  # 0 por defecto
+                if respuestas[i] <= 4:
+                    self.en_vivo.cambiar(i, respuestas[i] if val.isdigit() else None)
 
         for i in range(90):
             if respuestas[i] > 4:
                 messagebox.showerror("Error", f"La respuesta {i+1} está fuera del rango")
                 return
 
-        # Convertir todo a float (ya son ints, no need strip)
-        try:
-            valores = [float(x) for x in respuestas]
-        except:
-            raise ValueError("Alguna respuesta no es numérica")
-
-        if len(valores) != 90:
-            messagebox.showerror("Error", "Debe haber exactamente 90 respuestas")
-            return
-
-        resultados = {}
-
-        # === CALCULAR DIMENSIONES ===
-        sub_sumas = []  # Lista de sumas brutas para las gráficas
-        for escala, items in scl90r_escalas.items():
-            puntaje = sum(valores[i-1] for i in items)   # -1 porque el manual cuenta desde 1
-            resultados[escala] = {
-                "bruto": puntaje,
-                "media": round(puntaje / len(items), 2),
-                "n_items": len(items)
-            }
-            sub_sumas.append(puntaje)
-
-        # Índices globales
-        gsi_total = sum(valores)                                   # suma de los 90 ítems
-        pst = sum(1 for x in valores if x > 0)                      # número de síntomas positivos
-        psdi = gsi_total / pst if pst > 0 else 0                   # intensidad media de los síntomas positivos
-
-        resultados["Índices Globales"] = {
-            "GSI"  : round(gsi_total / 90, 2),    # Global Severity Index
-            "PST"  : pst,                         # Positive Symptom Total
-            "PSDI" : round(psdi, 2)                # Positive Symptom Distress Index
-        }
-
-        try:
-            # Gráficas
-            self.generar_graficas(respuestas, sub_sumas, resultados['Índices Globales']['GSI'])
-
-            # ← AQUÍ ESTÁ EL CAMBIO CLAVE:
-            self.generar_pdf(
-                nombre=nombre,
-                fecha=fecha,
-                terapeuta=terapeuta,
-                resultados=resultados,
-                scl90r_escalas=scl90r_escalas,
-                respuestas=respuestas,
-                gsi=resultados['Índices Globales']['GSI'],
-                pst=resultados['Índices Globales']['PST'],
-                ruta_pdf=ruta_archivo  # ← ¡NUEVO PARÁMETRO!
-            )
-
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo generar el PDF:\n{str(e)}")
-
-    def generar_graficas(self, respuestas, sub_sumas, gsi):
-
-        # ====================== NORMAS ESPAÑOLAS (mujeres y hombres) ======================
-        # Medias por ítem para convertir a T (aproximado T=63 ≈ media + 1.5 DT en población joven española)
-        normas_es = {
-            "Somatización":          {"H": 1.18, "M": 1.63},
-            "Obsesividad-Compulsividad": {"H": 1.61, "M": 1.99},
-            "Sensibilidad Interpersonal": {"H": 1.37, "M": 1.81},
-            "Depresión":             {"H": 1.43, "M": 1.87},
-            "Ansiedad":              {"H": 1.16, "M": 1.58},
-            "Hostilidad":            {"H": 1.26, "M": 1.60},
-            "Ansiedad Fóbica":       {"H": 0.73, "M": 1.00},
-            "Ideación Paranoide":    {"H": 1.46, "M": 1.56},
-            "Psicotismo":            {"H": 0.97, "M": 1.03},
-        }
-
-        sexo = self.entry_sexo.get().strip()
-
-        # Barras con cortes clínicos
-        etiquetas = list(normas_es.keys())
-
-        # Medias por dimensión
-        n_items = [12, 10, 9, 13, 10, 6, 7, 6, 10]
-        medias = [sub_sumas[i] / n_items[i] for i in range(9)]
-
-        # Cortes clínicos
-        cortes_clinicos = []
-        if sexo == 'Hombre':
-            cortes_clinicos = [normas_es[dim]['H'] for dim in normas_es]
-        else:
-            cortes_clinicos = [normas_es[dim]['M'] for dim in normas_es]
-
-        fig2, ax2 = plt.subplots(figsize=(11, 6))
-        colores = ["#fc988dff" if m >= c else "#0078d4" for m, c in zip(medias, cortes_clinicos)]
-        bars = ax2.bar(etiquetas, medias, color=colores, edgecolor='black', alpha=0.9)
-    
-        # Línea roja de corte clínico
-        ax2.plot(etiquetas, cortes_clinicos, color="#fc1900", linewidth=3, linestyle='--', marker='o', 
-                 label='Corte clínico (T≥63) - España')
-    
-        ax2.set_ylim(0, 4)
-        ax2.set_ylabel('Media por ítem (0-4)')
-        ax2.set_xticks(range(len(etiquetas)))
-        ax2.set_xticklabels(etiquetas, rotation=45, ha='right', fontsize=8)
-        ax2.set_title('Perfil SCL-90-R - Comparación con normas españolas')
-        ax2.legend(fontsize=10)
-
-        # Añadir valores encima de las barras
-        for bar, val in zip(bars, medias):
-            if val >= 0.3:
-                ax2.text(bar.get_x() + bar.get_width()/2, bar.get_height() - 0.15,
-                         f'{val:.2f}', ha='center', va='bottom', fontsize=10)
-
-        # Guardar como imágenes
-        self.img_barras = io.BytesIO()
-        fig2.savefig(self.img_barras, format='png', bbox_inches='tight', dpi=200)
-        self.img_barras.seek(0)
-        plt.close(fig2)
-
-    def generar_pdf(self, nombre, fecha, terapeuta, resultados, scl90r_escalas, respuestas, gsi, pst, ruta_pdf):
-        # === PROTECCIÓN CONTRA ERRORES ===
         if len(respuestas) != 90:
-            messagebox.showerror("Error crítico", 
-                f"Se esperaban 90 respuestas, pero se recibieron {len(respuestas)}.\n"
-                "Revisa que todos las entradas tengan valor.")
+            messagebox.showerror("Error", "Debe haber exactamente 90 respuestas")
             return
 
-        doc = SimpleDocTemplate(ruta_pdf, pagesize=A4)
-        story = []
-        styles = getSampleStyleSheet()
-
-        # ====================== NORMAS ESPAÑOLAS (mujeres y hombres) ======================
-        # Medias por ítem para convertir a T (aproximado T=63 ≈ media + 1.5 DT en población joven española)
-        normas_es = {
-            "Somatización":          {"H": 1.18, "M": 1.63},
-            "Obsesividad-Compulsividad": {"H": 1.61, "M": 1.99},
-            "Sensibilidad Interpersonal": {"H": 1.37, "M": 1.81},
-            "Depresión":             {"H": 1.43, "M": 1.87},
-            "Ansiedad":              {"H": 1.16, "M": 1.58},
-            "Hostilidad":            {"H": 1.26, "M": 1.60},
-            "Ansiedad Fóbica":       {"H": 0.73, "M": 1.00},
-            "Ideación Paranoide":    {"H": 1.46, "M": 1.56},
-            "Psicotismo":            {"H": 0.97, "M": 1.03},
-        }
-
-        sexo = self.entry_sexo.get().strip()
-
-        
-        # Título
-        story.append(Paragraph("Informe de resultados SCL-90-R", styles['Title']))
-        story.append(Spacer(1, 20))
-
-        # Nombre y fecha
-        story.append(Table([[
-            Paragraph(f"<b>Nombre:</b> {nombre}", styles['Normal']),
-            Paragraph(f"<b> Sexo: </b> {sexo}"),
-            Paragraph(f"<b>Fecha:</b> {fecha}", styles['Normal'])
-        ]], colWidths=[260, 80, 100]))
-        story.append(Table([[
-            Paragraph(f"<b>Terapeuta:</b> {terapeuta}", styles['Normal']),
-            Paragraph(""),
-            Paragraph("")
-        ]], colWidths=[300, 70, 70]))
-        story.append(Spacer(1, 20))
-
-        # === RESPUESTAS DEL PACIENTE EN 3 COLUMNAS (30 por columna) ===
-        story.append(Paragraph(f"<b>Respuestas de {nombre}</b>", styles['Heading3']))
-        story.append(Spacer(1, 12))
-
-        def formatear_respuesta(i, valor):
-            valor = str(valor).strip()
-            if valor in ["3", "4"]:
-                return Paragraph(f"Ítem {i+1:2d}: <font color='red'><b>{valor}</b></font>", styles['Normal'])
-            elif valor in ["0"]:
-                return Paragraph(f"Ítem {i+1:2d}: <font color='grey'>{valor}</font>", styles['Normal'])
+        # === DIMENSIONES E ÍNDICES GLOBALES (ya calculados en vivo, sin volver a corregir) ===
+        with tramo("puntuar"):
+            resultados, sub_sumas = self.en_vivo.resultados()
+        self._programar_repintado()
+
+        # === GRÁFICA + PDF EN SEGUNDO PLANO ===
+        # Se pasa una copia de los datos: el formulario ya se puede usar para el siguiente paciente
+        import informe
+        from trabajos import ColaInformes
+        if self.cola_informes is None:
+            self.cola_informes = ColaInformes()
+        self.cola_informes.enviar(
+            os.path.basename(ruta_archivo), informe.generar_informe,
+            ruta_pdf=ruta_archivo, nombre=nombre, sexo=self.entry_sexo.get().strip(), fecha=fecha,
+            terapeuta=terapeuta, respuestas=respuestas, resultados=resultados, sub_sumas=sub_sumas)
+
+        self.btn_corregir.configure(state='disabled')
+        self._actualizar_progreso()
+        if not self._sondeando:
+            self._sondeando = True
+            self.barra_progreso.start(15)
+            self.root.after(100, self._revisar_informes)
+
+    def cancelar_informes(self):
+        if self.cola_informes is not None:
+            self.cola_informes.cancelar_todo()
+            self.lbl_estado.configure(text="Cancelando...")
+
+    def _actualizar_progreso(self):
+        en_cola = self.cola_informes.en_cola()
+        if en_cola:
+            self.lbl_estado.configure(text=f"Generando informe... ({en_cola} en cola)")
+            self.btn_cancelar.configure(state='normal')
+
+    # Sondeo desde el bucle de Tk: los resultados llegan del hilo trabajador por una cola
+    def _revisar_informes(self):
+        import informe
+        activos = self.cola_informes.en_cola()
+        for _, descripcion, error in self.cola_informes.terminados():
+            if error is None:
+                self.lbl_estado.configure(text=f"Informe generado: {descripcion}")
+            elif isinstance(error, informe.InformeCancelado):
+                self.lbl_estado.configure(text=f"Cancelado: {descripcion}")
             else:
-                return Paragraph(f"Ítem {i+1:2d}: <font color='black'>{valor}</font>", styles['Normal'])
-            
-        # Creamos los datos: 30 filas, 3 columnas
-        data_respuestas = []
-
-        for fila in range(30):
-            col1 = formatear_respuesta(fila, respuestas[fila])
-            col2 = formatear_respuesta(fila+30, respuestas[fila+30])
-            col3 = formatear_respuesta(fila+60, respuestas[fila+60])
-            data_respuestas.append([col1, col2, col3])
-
-        # Tabla bonita y compacta
-        tabla_respuestas = Table(data_respuestas, colWidths=[140, 140, 140])
-
-        tabla_respuestas.setStyle(TableStyle([
-            ('FONTNAME',   (0,0), (-1,-1), 'Courier'),        # fuente monoespaciada = más legible en pequeño
-            ('FONTSIZE',   (0,0), (-1,-1), 8.5),              # letra pequeña pero clara
-            ('TEXTCOLOR',  (0,0), (-1,-1), colors.HexColor('#1a1a1a')),
-            ('ALIGN',      (0,0), (-1,-1), 'LEFT'),
-            ('VALIGN',     (0,0), (-1,-1), 'MIDDLE'),
-            ('GRID',       (0,0), (-1,-1), 0.25, colors.HexColor('#e0e0e0')),  # rejilla muy fina
-            ('LEFTPADDING',   (0,0), (-1,-1), 5),
-            ('RIGHTPADDING',  (0,0), (-1,-1), 5),
-            ('TOPPADDING',    (0,0), (-1,-1), 2),    # ← filas muy bajas
-            ('BOTTOMPADDING', (0,0), (-1,-1), 2),    # ← filas muy bajas
-            ('BACKGROUND', (0,0), (-1,-1), colors.white),
-        ]))
-
-        story.append(tabla_respuestas)
-        story.append(Spacer(1, 40))
-
-        # Índices globales
-        ig = resultados["Índices Globales"]
-        story.append(Paragraph("<b>Índices Globales</b>", styles['Heading2']))
-        if  ig['GSI'] >= 1.5:
-            story.append(Paragraph(f"• Índice de severidad global (GSI): <b><font color='red'> {ig['GSI']:.2f} </font></b>  (≥1.50 = caso clínico)", styles['Normal']))
-            if  ig['GSI'] >= 1 and ig['GSI'] < 1.5:
-                story.append(Paragraph(f"• Índice de severidad global (GSI): <b> {ig['GSI']:.2f} </b>  (≥1.00 = malestar)", styles['Normal']))
-        else:
-            story.append(Paragraph(f"• Índice de severidad global (GSI): {ig['GSI']:.2f}  (≥1.00 = malestar | ≥1.50 = caso clínico)", styles['Normal']))
-        
-        if sexo == 'Hombre':
-            if ig['PST'] > 60:
-                story.append(Paragraph(f"• Total de síntomas positivos (PST): <b>{ig['PST']}</b>  (Riesgo de simulación)", styles['Normal']))
-            else:
-                story.append(Paragraph(f"• Total de síntomas positivos (PST): {ig['PST']} (Riesgo de simulación en hombres > 60)", styles['Normal']))
-        else:
-            if ig['PST'] > 70:
-                story.append(Paragraph(f"• Total de síntomas positivos (PST): <b>{ig['PST']}</b>  (Riesgo de simulación)", styles['Normal']))
-            else:
-                story.append(Paragraph(f"• Total de síntomas positivos (PST): {ig['PST']} (Riesgo de simulación en mujeres > 70)", styles['Normal']))
-        
-        if ig['PSDI'] > 2.8:
-            story.append(Paragraph(f"• Intensidad media de los síntomas positivos (PSDI): <b>{ig['PSDI']:.2f}</b>  (Posible dramatización)", styles['Normal']))
-        else:
-            story.append(Paragraph(f"• Intensidad media de los síntomas positivos (PSDI): {ig['PSDI']:.2f}  (Posible dramatización > 2.80)", styles['Normal']))
-
-        story.append(Spacer(1, 20))
+                messagebox.showerror("Error al generar PDF", f"{descripcion}:\n{error}")
 
-        # Subescalas
-        story.append(Paragraph("<b>Puntuaciones por dimensión (Baremo español)</b>", styles['Heading2']))
-        
-        # Cortes clínicos
-        cortes = []
-        if sexo == 'Hombre':
-            cortes = [normas_es[dim]['H'] for dim in normas_es]
+        if activos:
+            self._actualizar_progreso()
+            self.root.after(100, self._revisar_informes)
         else:
-            cortes = [normas_es[dim]['M'] for dim in normas_es]
-        
-        nombres_dim = list(scl90r_escalas.keys())
-
-        data_dim = [["Dimensión", "Media", "Corte clínico", "Estado"]]
-
-        for i, dim in enumerate(nombres_dim):
-            media = resultados[dim]["media"]
-            corte = cortes[i]
-            if media >= corte:
-                estado = Paragraph("<b><font color='red'>Clínico</font></b>", styles['Normal'])
-            else:
-                estado = Paragraph("Normal", styles['Normal'])
-            data_dim.append([dim, f"{media:.2f}", f"{corte:.2f}", estado])
-    
-        t_dim = Table(data_dim, colWidths=[200, 80, 80, 80])
-        t_dim.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#0078d4")),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-            ('BACKGROUND', (0,1), (-1,-1), colors.HexColor('#fff8f0')),
-            ('ALIGN', (1,1), (-1,-1), 'CENTER'),
-        ]))
-        story.append(t_dim)
-        story.append(Spacer(1, 40))
-
-        # Gráficas
-        if hasattr(self, 'img_barras'):
-            story.append(Paragraph("Puntuaciones por dimensión", styles['Heading3']))
-            story.append(Image(self.img_barras, width=500, height=300))
-
-        # Construir PDF
-        try:
-            doc.build(story)
-            messagebox.showinfo("Éxito", "Informe generado correctamente")
-        except Exception as e:
-            messagebox.showerror("Error al generar PDF", str(e))
+            self._sondeando = False
+            self.barra_progreso.stop()
+            self.btn_cancelar.configure(state='disabled')
+            self.btn_corregir.configure(state='normal')
 
 # EJECUTAR
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()  # necesario para el pool de procesos en el .exe
+
+    # --traza ruta.json (en cualquier posición) activa las trazas de tiempo por etapa
+    if "--traza" in sys.argv:
+        posicion = sys.argv.index("--traza")
+        if posicion + 1 >= len(sys.argv):
+            sys.exit("--traza necesita la ruta del archivo de trazas")
+        import traza
+        traza.activar(sys.argv[posicion + 1])
+        del sys.argv[posicion:posicion + 2]
+
+    # Con argumentos → línea de comandos (sin ventana)
+    if len(sys.argv) > 1:
+        import importlib
+        if sys.argv[1] in COMANDOS:
+            sys.exit(importlib.import_module(COMANDOS[sys.argv[1]]).main(sys.argv[2:]))
+        from lote import main as main_lote
+        sys.exit(main_lote(sys.argv[1:]))
+
     root = tk.Tk()
     app = CorrectorPsicometrico(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,294 @@
+# ==================== BAREMOS LOCALES (percentiles y puntuaciones T propios) ====================
+# Los cortes de normas_es son medias fijas de González Sanguino et al. (2007). Aquí se
+# construyen baremos de nuestra propia población, por sexo y para cada columna de
+# puntuacion.COLUMNAS (9 dimensiones + GSI, PST, PSDI), en una sola pasada:
+#
+#   - media y varianza con Welford (por bloques, fórmula de Chan para combinar)
+#   - distribución en un histograma de céntimos: las medias, el GSI y el PSDI vienen
+#     redondeados a 2 decimales y el PST es entero, así que 401 casillas dan percentiles
+#     exactos. Dos histogramas se combinan sumándolos.
+#
+# Todo se puede actualizar con administraciones nuevas sin releer el histórico y
+# combinar resultados parciales de varios procesos o equipos (`fusionar`).
+#
+#   python main.py normas construir historico.csv -o normas.json
+#   python main.py normas construir nuevas.csv --sobre normas.json -o normas.json
+#   python main.py normas fusionar centro_a.json centro_b.json -o normas.json
+#   python main.py normas ver normas.json
+#
+# Con SCL90_NORMAS=normas.json los informes añaden la puntuación T y el percentil de
+# cada dimensión según estos baremos, y `puntuar --normas` los añade a la salida.
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from instrumentos import SEXOS, clave_sexo
+from puntuacion import COLUMNAS, PLAN, matriz_puntuaciones, puntuar_lote
+
+CASILLAS = 401
+# Valor → casilla: ×100 para medias, GSI y PSDI; el PST ya es entero (0-90)
+ESCALA = np.array([1 if c == "PST" else 100 for c in COLUMNAS])
+FORMATO = 1
+
+
+class NormasLocales:
+    # Arrays por sexo (fila 0 = H, fila 1 = M) y columna, como las tablas del plan
+    def __init__(self):
+        forma = (len(SEXOS), len(COLUMNAS))
+        self.n = np.zeros(forma, dtype=np.int64)
+        self.media = np.zeros(forma)
+        self.m2 = np.zeros(forma)  # suma de cuadrados de las desviaciones (Welford)
+        self.histograma = np.zeros(forma + (CASILLAS,), dtype=np.int64)
+        self._acumulado = None
+
+    # === ACTUALIZAR ===
+    def actualizar(self, matriz, sexos):
+        # matriz N×12 (orden de COLUMNAS); sexos: 'H'/'M' (u 'Hombre'/'Mujer') por fila
+        matriz = np.asarray(matriz, dtype=float)
+        fila_sexo = np.array([SEXOS.index(clave_sexo(s)) for s in sexos], dtype=np.intp)
+        for s in range(len(SEXOS)):
+            x = matriz[fila_sexo == s]
+            if len(x):
+                media = x.mean(axis=0)
+                self._combinar(s, len(x), media, ((x - media) ** 2).sum(axis=0))
+        casillas = np.rint(matriz * ESCALA).astype(np.intp)
+        np.add.at(self.histograma, (fila_sexo[:, np.newaxis], np.arange(len(COLUMNAS)), casillas), 1)
+        self._acumulado = None
+
+    def _combinar(self, s, n_b, media_b, m2_b):
+        # Chan et al.: combina (n, media, M2) de dos particiones sin volver a los datos
+        n_a = self.n[s]
+        n = n_a + n_b
+        delta = media_b - self.media[s]
+        self.media[s] = self.media[s] + delta * n_b / n
+        self.m2[s] = self.m2[s] + m2_b + delta ** 2 * n_a * n_b / n
+        self.n[s] = n
+
+    def fusionar(self, otra):
+        for s in range(len(SEXOS)):
+            if otra.n[s].any():
+                self._combinar(s, otra.n[s], otra.media[s], otra.m2[s])
+        self.histograma += otra.histograma
+        self._acumulado = None
+        return self
+
+    # === CONSULTAR ===
+    def desviacion(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt(self.m2 / (self.n - 1))
+
+    def _filas_sexo(self, sexos, n_filas):
+        if isinstance(sexos, str):
+            return np.full(n_filas, SEXOS.index(clave_sexo(sexos)), dtype=np.intp)
+        return np.array([SEXOS.index(clave_sexo(s)) for s in sexos], dtype=np.intp)
+
+    def puntuaciones_t(self, matriz, sexos):
+        # T = 50 + 10·z con la media y la desviación del sexo de cada fila (N×12).
+        # NaN donde el baremo no tiene al menos dos casos o no hay variación
+        matriz = np.atleast_2d(np.asarray(matriz, dtype=float))
+        fila_sexo = self._filas_sexo(sexos, len(matriz))
+        desviacion = self.desviacion()[fila_sexo]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = 50 + 10 * (matriz - self.media[fila_sexo]) / desviacion
+        return np.where(desviacion > 0, t, np.nan)
+
+    def percentiles(self, matriz, sexos):
+        # Rango percentil (0-100) en el baremo del sexo de cada fila: casos por debajo
+        # más la mitad de los empatados (N×12). NaN si el baremo está vacío
+        if self._acumulado is None:
+            self._acumulado = np.cumsum(self.histograma, axis=2) - self.histograma
+        matriz = np.atleast_2d(np.asarray(matriz, dtype=float))
+        fila_sexo = self._filas_sexo(sexos, len(matriz))[:, np.newaxis]
+        columnas = np.arange(len(COLUMNAS))
+        casillas = np.clip(np.rint(matriz * ESCALA).astype(np.intp), 0, CASILLAS - 1)
+        debajo = self._acumulado[fila_sexo, columnas, casillas]
+        iguales = self.histograma[fila_sexo, columnas, casillas]
+        n = self.n[fila_sexo, columnas]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n > 0, 100 * (debajo + 0.5 * iguales) / n, np.nan)
+
+    def total(self):
+        # Administraciones por sexo (todas las columnas tienen el mismo número)
+        return self.n[:, 0].tolist()
+
+    def huella(self):
+        # Identifica estos baremos (cambia con cualquier administración añadida)
+        h = hashlib.blake2b(digest_size=8)
+        for tabla in (self.n, self.media, self.m2, self.histograma):
+            h.update(np.ascontiguousarray(tabla).tobytes())
+        return h.hexdigest()
+
+    # === GUARDAR Y CARGAR ===
+    def a_dict(self):
+        return {
+            "formato": FORMATO,
+            "test": PLAN.nombre,
+            "version_test": PLAN.version,
+            "columnas": COLUMNAS,
+            "sexos": list(SEXOS),
+            "n": self.n.tolist(),
+            "media": self.media.tolist(),
+            "m2": self.m2.tolist(),
+            "histograma": self.histograma.tolist(),
+        }
+
+    @classmethod
+    def desde_dict(cls, datos):
+        if datos.get("formato") != FORMATO or datos.get("test") != PLAN.nombre:
+            raise ValueError("El archivo no contiene baremos locales del " + PLAN.nombre)
+        if datos.get("version_test") != PLAN.version or datos.get("columnas") != COLUMNAS:
+            raise ValueError(f"Baremos calculados con otra versión del test ({datos.get('version_test')})")
+        normas = cls()
+        normas.n = np.array(datos["n"], dtype=np.int64)
+        normas.media = np.array(datos["media"], dtype=float)
+        normas.m2 = np.array(datos["m2"], dtype=float)
+        normas.histograma = np.array(datos["histograma"], dtype=np.int64)
+        return normas
+
+    def guardar(self, ruta):
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self.a_dict(), f)
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta):
+        with open(ruta, encoding="utf-8") as f:
+            return cls.desde_dict(json.load(f))
+
+
+_ACTIVAS = None
+
+
+def activas():
+    # Baremos de SCL90_NORMAS (cargados una vez por proceso) o None
+    global _ACTIVAS
+    ruta = os.environ.get("SCL90_NORMAS")
+    if not ruta:
+        return None
+    if _ACTIVAS is None or _ACTIVAS[0] != ruta:
+        _ACTIVAS = (ruta, NormasLocales.cargar(ruta))
+    return _ACTIVAS[1]
+
+
+def fila_resultados(resultados):
+    # Diccionario de resultados de un paciente → fila 1×12 en el orden de COLUMNAS
+    ig = resultados["Índices Globales"]
+    return np.array([[resultados[dim]["media"] for dim in PLAN.dimensiones] + [ig["GSI"], ig["PST"], ig["PSDI"]]])
+
+
+# === LECTURA DE ARCHIVOS (por bloques, con flujo.py) ===
+def sexos_bloque(bloque):
+    # Sexo ('H'/'M') de cada fila de un bloque de flujo.leer_bloques; '' si falta o no se reconoce
+    from lote import SEXOS as NOMBRES_SEXO
+    columna = next((i for i, c in enumerate(bloque.meta_columnas) if c.strip().lower() == "sexo"), None)
+    if bloque.metas and isinstance(bloque.metas[0], dict):
+        # Claves JSONL sin distinguir mayúsculas, como las cabeceras CSV ("Sexo", "SEXO")
+        clave = bloque.meta_columnas[columna] if columna is not None else "sexo"
+        valores = [str(m[clave]) if clave in m else
+                   str(next((v for k, v in m.items() if k.strip().lower() == "sexo"), ""))
+                   for m in bloque.metas]
+    else:
+        valores = [m[columna] for m in bloque.metas] if columna is not None else [""] * len(bloque.metas)
+    # Pocos valores distintos: se traduce cada uno una vez
+    claves = {}
+    for valor in set(valores):
+        nombre = NOMBRES_SEXO.get(str(valor).strip().lower())
+        claves[valor] = clave_sexo(nombre) if nombre else ""
+    return np.array([claves[v] for v in valores], dtype="<U1")
+
+
+def construir(ruta, tam_bloque=None):
+    # Baremos de un archivo (CSV/JSONL con columna "sexo"); devuelve (normas, filas sin sexo)
+    from flujo import TAM_BLOQUE, leer_bloques
+    normas = NormasLocales()
+    sin_sexo = 0
+    for bloque in leer_bloques(ruta, tam_bloque or TAM_BLOQUE):
+        if not len(bloque.matriz):
+            continue
+        sexos = sexos_bloque(bloque)
+        validas = sexos != ""
+        sin_sexo += int((~validas).sum())
+        if validas.any():
+            normas.actualizar(matriz_puntuaciones(puntuar_lote(bloque.matriz[validas])), sexos[validas])
+    return normas, sin_sexo
+
+
+def _construir_dict(trabajo):
+    ruta, tam_bloque = trabajo
+    normas, sin_sexo = construir(ruta, tam_bloque)
+    return normas.a_dict(), sin_sexo
+
+
+def describir(normas, salida=sys.stdout):
+    n_h, n_m = normas.total()
+    print(f"Baremos locales del {PLAN.nombre}: {n_h} hombres, {n_m} mujeres", file=salida)
+    desviacion = normas.desviacion()
+    print(f"{'columna':<28}{'media H':>9}{'dt H':>7}{'media M':>9}{'dt M':>7}", file=salida)
+    for c, columna in enumerate(COLUMNAS):
+        print(f"{columna:<28}{normas.media[0, c]:>9.2f}{desviacion[0, c]:>7.2f}"
+              f"{normas.media[1, c]:>9.2f}{desviacion[1, c]:>7.2f}", file=salida)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="SCL-90-R normas",
+                                     description="Construye y combina baremos locales (percentiles y T).")
+    ordenes = parser.add_subparsers(dest="orden", required=True)
+
+    p_construir = ordenes.add_parser("construir", help="baremos a partir de CSV/JSONL con columna sexo")
+    p_construir.add_argument("entradas", nargs="+", help="archivos de administraciones")
+    p_construir.add_argument("-o", "--salida", required=True, help="JSON de baremos")
+    p_construir.add_argument("--sobre", default=None,
+                             help="baremos existentes a los que sumar estas administraciones")
+    p_construir.add_argument("-j", "--trabajadores", type=int, default=1,
+                             help="procesos (uno por archivo de entrada; por defecto: 1)")
+    p_construir.add_argument("--bloque", type=int, default=None, help="filas por bloque")
+
+    p_fusionar = ordenes.add_parser("fusionar", help="combina baremos parciales")
+    p_fusionar.add_argument("entradas", nargs="+", help="JSON de baremos")
+    p_fusionar.add_argument("-o", "--salida", required=True, help="JSON combinado")
+
+    p_ver = ordenes.add_parser("ver", help="muestra medias y desviaciones")
+    p_ver.add_argument("ruta", help="JSON de baremos")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.orden == "ver":
+            describir(NormasLocales.cargar(args.ruta))
+            return 0
+
+        normas = NormasLocales()
+        if args.orden == "fusionar":
+            for ruta in args.entradas:
+                normas.fusionar(NormasLocales.cargar(ruta))
+        else:
+            if args.trabajadores < 1:
+                parser.error("--trabajadores debe ser al menos 1")
+            if args.sobre:
+                normas.fusionar(NormasLocales.cargar(args.sobre))
+            trabajos = [(ruta, args.bloque) for ruta in args.entradas]
+            if args.trabajadores > 1 and len(trabajos) > 1:
+                with ProcessPoolExecutor(max_workers=args.trabajadores) as pool:
+                    parciales = list(pool.map(_construir_dict, trabajos))
+            else:
+                parciales = [_construir_dict(t) for t in trabajos]
+            for (ruta, _), (datos, sin_sexo) in zip(trabajos, parciales):
+                normas.fusionar(NormasLocales.desde_dict(datos))
+                if sin_sexo:
+                    print(f"{ruta}: {sin_sexo} filas sin sexo reconocido (no se usan)", file=sys.stderr)
+        normas.guardar(args.salida)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    describir(normas)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+# ==================== MOTOR DE PUNTUACIÓN VECTORIZADO (SCL-90-R) ====================
+# Corrige N administraciones de golpe a partir de una matriz N×90 (ítems 0-4),
+# sin depender de la interfaz gráfica. Los resultados coinciden exactamente con
+# la corrección paciente a paciente que hacía CorrectorPsicometrico.corregir.
+#
+# La definición del test (escalas, ítems y baremos) vive en instrumentos.py;
+# aquí solo se exponen sus datos y el plan ya compilado del SCL-90-R.
+import numpy as np
+
+from instrumentos import plan
+
+PLAN = plan("SCL-90-R")
+
+N_ITEMS = PLAN.n_items
+SCL90R_ESCALAS = PLAN.escalas
+ITEMS_ADICIONALES = PLAN.items_adicionales
+DIMENSIONES = PLAN.dimensiones
+NORMAS_ES = PLAN.normas
+
+# Columnas de la matriz de puntuaciones N×12: 9 medias + GSI, PST, PSDI
+COLUMNAS = DIMENSIONES + ["GSI", "PST", "PSDI"]
+
+# Matriz de incidencia 90×9: INCIDENCIA[i, d] = 1 si el ítem i+1 puntúa en la dimensión d
+INCIDENCIA = PLAN.incidencia
+N_ITEMS_DIM = PLAN.n_items_escala
+
+
+def cortes_clinicos(sexo):
+    # Cortes clínicos por dimensión según el sexo ('Hombre' o 'Mujer')
+    return PLAN.cortes(sexo).tolist()
+
+
+def como_matriz(respuestas):
+    return PLAN.como_matriz(respuestas)
+
+
+def puntuar_lote(respuestas):
+    # Corrige todas las filas en una sola pasada vectorizada
+    return PLAN.puntuar(respuestas)
+
+
+def matriz_puntuaciones(puntuaciones):
+    # N×12 en el orden de COLUMNAS
+    return np.column_stack([puntuaciones["medias"], puntuaciones["GSI"],
+                            puntuaciones["PST"], puntuaciones["PSDI"]])
+
+
+def resultados_paciente(puntuaciones, fila=0):
+    # Reconstruye el diccionario de resultados (y las sumas brutas para las gráficas)
+    # con la misma forma que construía corregir para un único paciente
+    resultados = {}
+    sub_sumas = []
+    for d, escala in enumerate(DIMENSIONES):
+        puntaje = float(puntuaciones["brutos"][fila, d])
+        resultados[escala] = {
+            "bruto": puntaje,
+            "media": float(puntuaciones["medias"][fila, d]),
+            "n_items": int(N_ITEMS_DIM[d])
+        }
+        sub_sumas.append(puntaje)
+
+    resultados["Índices Globales"] = {
+        "GSI"  : float(puntuaciones["GSI"][fila]),
+        "PST"  : int(puntuaciones["PST"][fila]),
+        "PSDI" : float(puntuaciones["PSDI"][fila])
+    }
+    return resultados, sub_sumas
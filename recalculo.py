@@ -0,0 +1,361 @@
+# ==================== RECÁLCULO DE TODO EL HISTÓRICO (reanudable) ====================
+# Cuando cambian los baremos o se corrige la definición de una escala hay que volver a
+# puntuar (y a veces a sacar los PDF de) todo el histórico. Esto lo parte en fragmentos de
+# filas, los reparte entre varios procesos y anota en un manifiesto cada fragmento
+# terminado. Si se corta (Ctrl+C, apagón, error), la misma orden continúa por donde iba.
+#
+#   python main.py recalcular historico.csv -o recalculo/ -j 4
+#   python main.py recalcular historico.csv -o recalculo/ --informes --pdf canvas
+#   python main.py recalcular historico.scl -o recalculo/ --normas normas.json
+#
+# En la carpeta de salida:
+#   manifiesto.json            configuración, versiones y fragmentos terminados
+#   puntuaciones/00042.csv     puntuaciones del fragmento 42 (con columnas de versión)
+#   puntuaciones/00042.rechazos.txt
+#   informes/00042/            PDF del fragmento 42 (con --informes)
+#
+# Cada salida se escribe con otro nombre y se renombra al terminar el fragmento: lo que
+# está en su sitio está completo. El manifiesto se reescribe igual tras cada fragmento.
+# Si la entrada, las versiones o las opciones no coinciden con las del manifiesto se
+# pide --reiniciar en lugar de mezclar fragmentos de dos recálculos distintos.
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from puntuacion import PLAN
+
+FILAS_FRAGMENTO = 50000
+MANIFIESTO = "manifiesto.json"
+FORMATO_MANIFIESTO = 1
+COLUMNAS_VERSION = ["version_escalas", "version_baremos", "baremos_locales"]
+
+
+# === FRAGMENTOS ===
+def _fragmentos_texto(ruta, filas, con_cabecera):
+    # {inicio, fin (bytes), primera línea} de cada trozo de `filas` líneas. Solo se buscan
+    # saltos de línea: se supone una administración por línea, como en el resto del programa
+    saltar = 1 if con_cabecera else 0
+    inicio_datos = 0 if not con_cabecera else None
+    cortes, vistos, posicion = [], 0, 0
+    with open(ruta, "rb") as f:
+        while True:
+            trozo = f.read(16 * 1024 * 1024)
+            if not trozo:
+                break
+            saltos = np.flatnonzero(np.frombuffer(trozo, dtype=np.uint8) == 10)
+            if inicio_datos is None and len(saltos):
+                inicio_datos = posicion + int(saltos[0]) + 1
+            # Número de línea de datos que termina en cada salto (la cabecera es la 0)
+            n = vistos + 1 + np.arange(len(saltos)) - saltar
+            cortes += (posicion + saltos[(n > 0) & (n % filas == 0)] + 1).tolist()
+            vistos += len(saltos)
+            posicion += len(trozo)
+    if inicio_datos is None:
+        return []
+    limites = [inicio_datos] + [c for c in cortes if c < posicion] + [posicion]
+    return [{"inicio": a, "fin": b, "linea": 1 + saltar + i * filas}
+            for i, (a, b) in enumerate(zip(limites, limites[1:])) if b > a]
+
+
+def fragmentos(ruta, filas):
+    if ruta.lower().endswith(".scl"):
+        from archivo_compacto import ArchivoCompacto
+        archivo = ArchivoCompacto(ruta)
+        n = len(archivo)
+        archivo.cerrar()
+        return [{"inicio": a, "fin": min(a + filas, n), "linea": a + 1} for a in range(0, n, filas)]
+    from flujo import _formato
+    return _fragmentos_texto(ruta, filas, _formato(ruta) == "csv")
+
+
+def _bloques_fragmento(ruta, fragmento):
+    if ruta.lower().endswith(".scl"):
+        from archivo_compacto import ArchivoCompacto
+        return ArchivoCompacto(ruta).bloques(filas=(fragmento["inicio"], fragmento["fin"]))
+    from flujo import leer_bloques_rango
+    return leer_bloques_rango(ruta, fragmento["inicio"], fragmento["fin"], fragmento["linea"])
+
+
+# === VERSIONES Y MANIFIESTO ===
+def versiones(normas=None):
+    return {"version_escalas": PLAN.version, "version_baremos": PLAN.version_normas,
+            "baremos_locales": normas.huella() if normas is not None else ""}
+
+
+def _escribir_json(ruta, datos):
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False, indent=1)
+    os.replace(temporal, ruta)
+
+
+def _huella_entrada(ruta):
+    st = os.stat(ruta)
+    return {"ruta": os.path.abspath(ruta), "bytes": st.st_size, "modificado": st.st_mtime_ns}
+
+
+def preparar(ruta_entrada, carpeta, filas, informes, normas, reiniciar=False, motores=None):
+    # Manifiesto nuevo o el de un recálculo anterior compatible con esta configuración.
+    # motores: {"grafica", "pdf"} ya resueltos; con informes, reanudar con otros se rechaza
+    ruta_manifiesto = os.path.join(carpeta, MANIFIESTO)
+    configuracion = {"formato": FORMATO_MANIFIESTO, "test": PLAN.nombre, "entrada": _huella_entrada(ruta_entrada),
+                     "filas_fragmento": filas, "informes": informes, "versiones": versiones(normas)}
+    if informes:
+        configuracion["motores"] = motores
+    if reiniciar:
+        for nombre in ("puntuaciones", "informes"):
+            shutil.rmtree(os.path.join(carpeta, nombre), ignore_errors=True)
+        if os.path.exists(ruta_manifiesto):
+            os.remove(ruta_manifiesto)
+    if os.path.exists(ruta_manifiesto):
+        with open(ruta_manifiesto, encoding="utf-8") as f:
+            manifiesto = json.load(f)
+        distintos = [k for k, v in configuracion.items() if manifiesto.get(k) != v]
+        if distintos:
+            raise ValueError(f"{ruta_manifiesto} es de otro recálculo (cambia: {', '.join(distintos)}); "
+                             "usa --reiniciar o otra carpeta")
+        return manifiesto
+    os.makedirs(os.path.join(carpeta, "puntuaciones"), exist_ok=True)
+    if informes:
+        os.makedirs(os.path.join(carpeta, "informes"), exist_ok=True)
+    manifiesto = dict(configuracion, fragmentos=fragmentos(ruta_entrada, filas), completados={})
+    _escribir_json(ruta_manifiesto, manifiesto)
+    return manifiesto
+
+
+# === UN FRAGMENTO (en un proceso del pool) ===
+def _con_versiones(bloques, valores):
+    for bloque, puntuaciones in bloques:
+        if bloque.metas and isinstance(bloque.metas[0], dict):
+            metas = [dict(m, **dict(zip(COLUMNAS_VERSION, valores))) for m in bloque.metas]
+        else:
+            metas = [list(m) + valores for m in bloque.metas]
+        yield bloque._replace(meta_columnas=bloque.meta_columnas + COLUMNAS_VERSION, metas=metas), puntuaciones
+
+
+def _pacientes(bloque):
+    # Datos de cabecera del informe de cada fila del bloque (o el error de la fila)
+    from lote import COLUMNAS_META, ErrorFila, normalizar_sexo
+    columnas = {COLUMNAS_META[c.strip().lower()]: i for i, c in enumerate(bloque.meta_columnas)
+                if c.strip().lower() in COLUMNAS_META}
+    faltan = {"nombre", "sexo", "fecha", "terapeuta"} - set(columnas)
+    if faltan:
+        raise ValueError(f"Para los informes faltan columnas: {', '.join(sorted(faltan))}")
+    for meta, respuestas in zip(bloque.metas, bloque.matriz.tolist()):
+        try:
+            valores = {campo: str(meta[columnas[campo]]).strip() for campo in ("nombre", "fecha", "terapeuta")}
+            if not valores["nombre"] or not valores["terapeuta"]:
+                raise ErrorFila("Falta el nombre de la persona evaluada o del/de la terapeuta")
+            yield dict(valores, sexo=normalizar_sexo(meta[columnas["sexo"]]), respuestas=respuestas)
+        except ErrorFila as e:
+            yield e
+
+
+def procesar_fragmento(trabajo):
+    # Devuelve el resumen que se anota en el manifiesto
+    ruta_entrada, carpeta, numero, fragmento, opciones = trabajo
+    from flujo import COLUMNAS, EscritorResultados, columnas_normas, con_normas, puntuar_bloques
+    from normas_locales import activas
+    inicio = time.perf_counter()
+    normas = activas()
+    base = os.path.join(carpeta, "puntuaciones", f"{numero:05d}")
+    carpeta_pdf = os.path.join(carpeta, "informes", f"{numero:05d}")
+    temporal_pdf = carpeta_pdf + ".tmp"
+    if opciones["informes"]:
+        shutil.rmtree(temporal_pdf, ignore_errors=True)
+        os.makedirs(temporal_pdf)
+
+    bloques = puntuar_bloques(_bloques_fragmento(ruta_entrada, fragmento))
+    columnas = COLUMNAS
+    if normas is not None:
+        bloques = con_normas(bloques, normas)
+        columnas = COLUMNAS + columnas_normas()
+    valores_version = list(versiones(normas).values())
+    filas = informes = 0
+    rechazos = []
+    with EscritorResultados(base + ".tmp.csv", columnas) as escritor:
+        for bloque, puntuaciones in _con_versiones(bloques, valores_version):
+            escritor.escribir(bloque, puntuaciones)
+            filas += len(bloque.matriz)
+            rechazos += bloque.rechazos
+            if opciones["informes"]:
+                informes += _informes_bloque(bloque, temporal_pdf, opciones, rechazos)
+
+    with open(base + ".rechazos.tmp", "w", encoding="utf-8") as f:
+        for n_linea, motivo in rechazos:
+            f.write(f"{n_linea}\t{motivo}\n")
+    # Primero los informes y los rechazos; las puntuaciones, al final, marcan el fragmento como hecho
+    if opciones["informes"]:
+        shutil.rmtree(carpeta_pdf, ignore_errors=True)
+        os.replace(temporal_pdf, carpeta_pdf)
+    os.replace(base + ".rechazos.tmp", base + ".rechazos.txt")
+    os.replace(base + ".tmp.csv", base + ".csv")
+    return {"filas": filas, "rechazadas": len(rechazos), "informes": informes,
+            "segundos": round(time.perf_counter() - inicio, 2)}
+
+
+def _informes_bloque(bloque, carpeta_pdf, opciones, rechazos):
+    from lote import generar_informe, nombre_archivo
+    hechos = 0
+    for n_linea, paciente in zip(bloque.lineas, _pacientes(bloque)):
+        if isinstance(paciente, Exception):
+            rechazos.append((n_linea, f"sin informe: {paciente}"))
+            continue
+        # La línea delante del nombre evita choques entre administraciones con mismo nombre y fecha
+        ruta_pdf = os.path.join(carpeta_pdf, f"{n_linea:08d}_{nombre_archivo(paciente)}")
+        try:
+            generar_informe(paciente, ruta_pdf, opciones["grafica"], opciones["pdf"])
+        except Exception as e:
+            # Un informe que falla no puede tumbar el fragmento: al reanudar fallaría otra vez
+            rechazos.append((n_linea, f"sin informe: {e}"))
+            continue
+        hechos += 1
+    return hechos
+
+
+# === EJECUCIÓN ===
+class Bloqueo:
+    # Impide dos recálculos a la vez en la misma carpeta. El sistema suelta el cerrojo si
+    # el proceso muere, así que un corte no deja la carpeta bloqueada
+    def __init__(self, carpeta):
+        self.archivo = open(os.path.join(carpeta, ".bloqueo"), "a+b")
+        try:
+            if os.name == "nt":
+                import msvcrt
+                self.archivo.seek(0)
+                msvcrt.locking(self.archivo.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self.archivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.archivo.close()
+            raise ValueError(f"Ya hay un recálculo en marcha en {carpeta}") from None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.archivo.close()
+
+
+def ejecutar(ruta_entrada, carpeta, filas=FILAS_FRAGMENTO, trabajadores=None, informes=False,
+             motor_grafica=None, motor_pdf=None, reiniciar=False, progreso=sys.stderr):
+    # Devuelve el manifiesto al terminar (o al interrumpirse: lo completado queda anotado)
+    os.makedirs(carpeta, exist_ok=True)
+    with Bloqueo(carpeta):
+        return _ejecutar(ruta_entrada, carpeta, filas, trabajadores, informes, motor_grafica, motor_pdf,
+                         reiniciar, progreso)
+
+
+def _ejecutar(ruta_entrada, carpeta, filas, trabajadores, informes, motor_grafica, motor_pdf, reiniciar,
+              progreso):
+    from normas_locales import activas
+    motores = None
+    if informes:
+        from informe import MOTOR_GRAFICA, MOTOR_PDF
+        motores = {"grafica": motor_grafica or MOTOR_GRAFICA, "pdf": motor_pdf or MOTOR_PDF}
+    manifiesto = preparar(ruta_entrada, carpeta, filas, informes, activas(), reiniciar, motores)
+    ruta_manifiesto = os.path.join(carpeta, MANIFIESTO)
+    opciones = {"informes": informes, "grafica": motor_grafica, "pdf": motor_pdf}
+    pendientes = [(ruta_entrada, carpeta, i, fragmento, opciones)
+                  for i, fragmento in enumerate(manifiesto["fragmentos"])
+                  if str(i) not in manifiesto["completados"]]
+    total = len(manifiesto["fragmentos"])
+    if progreso and len(pendientes) < total:
+        print(f"Continuando: {total - len(pendientes)} de {total} fragmentos ya hechos", file=progreso)
+
+    def anotar(numero, resumen):
+        manifiesto["completados"][str(numero)] = resumen
+        _escribir_json(ruta_manifiesto, manifiesto)
+        if progreso:
+            print(f"\rFragmentos: {len(manifiesto['completados'])}/{total}", end="", file=progreso, flush=True)
+
+    trabajadores = max(1, min(trabajadores or os.cpu_count() or 1, len(pendientes)))
+    if trabajadores == 1:
+        for trabajo in pendientes:
+            anotar(trabajo[2], procesar_fragmento(trabajo))
+    elif pendientes:
+        # Como mucho dos fragmentos por proceso en vuelo: al cortar se pierde poco trabajo
+        pool = ProcessPoolExecutor(max_workers=trabajadores)
+        en_curso = {}
+        cola = iter(pendientes)
+        try:
+            while True:
+                for trabajo in cola:
+                    en_curso[pool.submit(procesar_fragmento, trabajo)] = trabajo[2]
+                    if len(en_curso) >= 2 * trabajadores:
+                        break
+                if not en_curso:
+                    break
+                hechos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    anotar(en_curso.pop(futuro), futuro.result())
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+    if progreso and pendientes:
+        print(file=progreso)
+    return manifiesto
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="SCL-90-R recalcular",
+        description="Vuelve a puntuar (y opcionalmente a generar los PDF de) todo un histórico, por "
+                    "fragmentos y en paralelo; si se interrumpe, la misma orden continúa.")
+    parser.add_argument("entrada", help="CSV/JSONL (90 últimas columnas = respuestas) o archivo .scl")
+    parser.add_argument("-o", "--salida", required=True, help="carpeta del recálculo (manifiesto y resultados)")
+    parser.add_argument("-j", "--trabajadores", type=int, default=None,
+                        help="número de procesos (por defecto: núcleos de la CPU)")
+    parser.add_argument("--filas", type=int, default=FILAS_FRAGMENTO,
+                        help=f"filas por fragmento (por defecto: {FILAS_FRAGMENTO})")
+    parser.add_argument("--informes", action="store_true",
+                        help="genera también un PDF por fila (CSV con nombre, sexo, fecha y evaluador)")
+    parser.add_argument("--grafica", choices=("matplotlib", "vectorial"), default=None, help="motor de la gráfica")
+    parser.add_argument("--pdf", choices=("platypus", "canvas"), default=None, help="motor del PDF")
+    parser.add_argument("--normas", default=None,
+                        help="baremos locales: añade T y percentil (y su huella a las columnas de versión)")
+    parser.add_argument("--reiniciar", action="store_true",
+                        help="descarta el recálculo anterior de la carpeta y empieza de cero")
+    args = parser.parse_args(argv)
+
+    if args.trabajadores is not None and args.trabajadores < 1:
+        parser.error("--trabajadores debe ser al menos 1")
+    if args.filas < 1:
+        parser.error("--filas debe ser al menos 1")
+    if args.informes and args.entrada.lower().endswith(".scl"):
+        parser.error("--informes necesita nombres y terapeutas, que un .scl no guarda")
+    if args.normas:
+        # Los procesos hijos cargan los mismos baremos por el entorno
+        os.environ["SCL90_NORMAS"] = args.normas
+
+    inicio = time.perf_counter()
+    try:
+        manifiesto = ejecutar(args.entrada, args.salida, args.filas, args.trabajadores, args.informes,
+                              args.grafica, args.pdf, args.reiniciar)
+    except KeyboardInterrupt:
+        print(f"\nInterrumpido. Lo terminado está anotado en {os.path.join(args.salida, MANIFIESTO)}; "
+              "repite la misma orden para continuar.", file=sys.stderr)
+        return 130
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    resumenes = manifiesto["completados"].values()
+    filas = sum(r["filas"] for r in resumenes)
+    rechazadas = sum(r["rechazadas"] for r in resumenes)
+    informes = sum(r["informes"] for r in resumenes)
+    versiones_usadas = ", ".join(f"{k}={v}" for k, v in manifiesto["versiones"].items() if v)
+    print(f"{len(manifiesto['fragmentos'])} fragmentos, {filas} filas puntuadas"
+          + (f", {informes} informes" if manifiesto["informes"] else "")
+          + f", {rechazadas} con error en {time.perf_counter() - inicio:.1f} s ({versiones_usadas})")
+    return 1 if rechazadas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
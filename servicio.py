@@ -0,0 +1,373 @@
+# ==================== SERVICIO HTTP LOCAL (puntuaciones y PDF) ====================
+# Para que los formularios de la intranet envíen las respuestas sin volver a teclearlas
+# en la rejilla. Solo escucha en 127.0.0.1 y no guarda nada: ni respuestas ni informes
+# tocan el disco (la caché de gráficas es solo en memoria).
+#
+#   python main.py servicio --puerto 8090 -j 2
+#
+#   POST /puntuar   {"sexo": "Mujer", "respuestas": [90 valores 0-4]}
+#                   o {"administraciones": [{...}, {...}]} para muchas de una vez
+#                   → JSON con las puntuaciones (se corrigen todas en una pasada vectorizada)
+#   POST /informe   {"nombre", "sexo", "fecha", "terapeuta", "respuestas"} → application/pdf
+#   GET  /metricas  latencias por ruta (histograma), cola de PDF y caché, formato Prometheus
+#   GET  /salud
+#
+# El bucle de asyncio solo lee, valida y corrige (microsegundos); los lotes grandes de
+# /puntuar se corrigen en un hilo y la gráfica y el PDF van a un pool de procesos acotado. Si hay más PDF pendientes de los que admite la
+# cola, se responde 503 con Retry-After en lugar de acumular trabajo.
+import argparse
+import asyncio
+import io
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lote import ErrorFila, normalizar_sexo
+from puntuacion import COLUMNAS, DIMENSIONES, PLAN, matriz_puntuaciones, puntuar_lote
+
+ANFITRION = "127.0.0.1"
+PUERTO = 8090
+MAX_CUERPO = 8 * 1024 * 1024
+MAX_ADMINISTRACIONES = 100000
+LOTE_EN_BUCLE = 1000   # hasta aquí /puntuar se corrige en el propio bucle (milisegundos)
+TIMEOUT_CABECERAS = 30
+
+# Límites superiores (ms) de las casillas del histograma de latencias
+CASILLAS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+ESTADOS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+class ErrorPeticion(Exception):
+    # cerrar: tras responder se cierra la conexión (el flujo ya no está alineado con las peticiones)
+    def __init__(self, estado, mensaje, cabeceras=(), cerrar=False):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.cabeceras = list(cabeceras)
+        self.cerrar = cerrar or estado in (411, 413)
+
+
+# === MÉTRICAS ===
+class Metricas:
+    def __init__(self):
+        self.latencias = {}   # ruta → [recuento por casilla] (+1 para > último límite)
+        self.sumas = {}
+        self.respuestas = {}  # (ruta, estado) → recuento
+        self.rechazadas = 0
+        self.administraciones = 0
+
+    def registrar(self, ruta, estado, segundos):
+        ms = segundos * 1000
+        casillas = self.latencias.setdefault(ruta, [0] * (len(CASILLAS_MS) + 1))
+        casillas[next((i for i, lim in enumerate(CASILLAS_MS) if ms <= lim), len(CASILLAS_MS))] += 1
+        self.sumas[ruta] = self.sumas.get(ruta, 0.0) + segundos
+        self.respuestas[(ruta, estado)] = self.respuestas.get((ruta, estado), 0) + 1
+
+    def texto(self, servicio):
+        # Formato de exposición de Prometheus
+        lineas = ["# TYPE scl90_peticion_segundos histogram"]
+        for ruta, casillas in sorted(self.latencias.items()):
+            acumulado = 0
+            for limite, n in zip(CASILLAS_MS + ("+Inf",), casillas):
+                acumulado += n
+                le = limite if limite == "+Inf" else limite / 1000
+                lineas.append(f'scl90_peticion_segundos_bucket{{ruta="{ruta}",le="{le}"}} {acumulado}')
+            lineas.append(f'scl90_peticion_segundos_sum{{ruta="{ruta}"}} {self.sumas[ruta]:.6f}')
+            lineas.append(f'scl90_peticion_segundos_count{{ruta="{ruta}"}} {acumulado}')
+        lineas.append("# TYPE scl90_respuestas_total counter")
+        for (ruta, estado), n in sorted(self.respuestas.items()):
+            lineas.append(f'scl90_respuestas_total{{ruta="{ruta}",estado="{estado}"}} {n}')
+        lineas += [
+            "# TYPE scl90_administraciones_puntuadas_total counter",
+            f"scl90_administraciones_puntuadas_total {self.administraciones}",
+            "# TYPE scl90_pdf_rechazados_total counter",
+            f"scl90_pdf_rechazados_total {self.rechazadas}",
+            "# TYPE scl90_pdf_en_curso gauge",
+            f"scl90_pdf_en_curso {servicio.pdf_en_curso}",
+            "# TYPE scl90_pdf_cola_maxima gauge",
+            f"scl90_pdf_cola_maxima {servicio.max_pendientes}",
+            "# TYPE scl90_pdf_trabajadores gauge",
+            f"scl90_pdf_trabajadores {servicio.trabajadores}",
+        ]
+        return "\n".join(lineas) + "\n"
+
+
+# === TRABAJO EN LOS PROCESOS DEL POOL ===
+def _precalentar():
+    # Cada proceso importa ReportLab (y matplotlib si hace falta) una sola vez al arrancar
+    import informe  # noqa: F401
+
+
+def _generar_pdf(datos, motor_grafica, motor_pdf):
+    import cache
+    import informe
+    from normas_locales import activas
+    from puntuacion import SCL90R_ESCALAS
+    respuestas, sexo = datos["respuestas"], datos["sexo"]
+    k = cache.clave(respuestas, sexo)
+    resultados, sub_sumas = cache.resultados(respuestas, sexo, k)
+    img_barras = cache.grafica(respuestas, sexo, motor_grafica,
+                               lambda: informe.generar_grafica(sub_sumas, sexo, motor_grafica), k)
+    salida = io.BytesIO()
+    informe.funcion_pdf(motor_pdf)(salida, datos["nombre"], sexo, datos["fecha"], datos["terapeuta"],
+                                   resultados, SCL90R_ESCALAS, respuestas, img_barras, activas())
+    return salida.getvalue()
+
+
+# === VALIDACIÓN ===
+def _administracion(registro):
+    if not isinstance(registro, dict):
+        raise ErrorPeticion(400, "Cada administración debe ser un objeto JSON")
+    respuestas = registro.get("respuestas")
+    if not isinstance(respuestas, list) or len(respuestas) != PLAN.n_items:
+        raise ErrorPeticion(400, f"\"respuestas\" debe ser una lista de {PLAN.n_items} valores")
+    if not all(isinstance(r, int) and not isinstance(r, bool) for r in respuestas):
+        raise ErrorPeticion(400, "Las respuestas deben ser enteros de 0 a 4")
+    try:
+        sexo = normalizar_sexo(registro.get("sexo", ""))
+    except ErrorFila as e:
+        raise ErrorPeticion(400, str(e)) from None
+    return sexo, respuestas
+
+
+def puntuar_json(cuerpo):
+    # Una o muchas administraciones → lista de puntuaciones, todas en una pasada
+    lista = cuerpo.get("administraciones") if isinstance(cuerpo, dict) else None
+    individual = lista is None
+    if individual:
+        lista = [cuerpo]
+    if not isinstance(lista, list) or not lista:
+        raise ErrorPeticion(400, "\"administraciones\" debe ser una lista no vacía")
+    if len(lista) > MAX_ADMINISTRACIONES:
+        raise ErrorPeticion(413, f"Como máximo {MAX_ADMINISTRACIONES} administraciones por petición")
+    sexos, filas = zip(*(_administracion(r) for r in lista))
+    try:
+        puntuaciones = puntuar_lote(np.array(filas))
+    except ValueError as e:
+        raise ErrorPeticion(400, str(e)) from None
+    matriz = matriz_puntuaciones(puntuaciones).tolist()
+    clinicos = PLAN.clinico(puntuaciones["brutos"], sexos).tolist()
+    salida = []
+    for valores, marcas in zip(matriz, clinicos):
+        registro = dict(zip(COLUMNAS, valores))
+        registro["PST"] = int(registro["PST"])
+        registro["clinico"] = [dim for dim, marca in zip(DIMENSIONES, marcas) if marca]
+        salida.append(registro)
+    respuesta = {"test": PLAN.nombre, "version": PLAN.version, "normas": PLAN.version_normas}
+    if individual:
+        respuesta.update(salida[0])
+    else:
+        respuesta["puntuaciones"] = salida
+    return respuesta, len(salida)
+
+
+def _puntuar_cuerpo(cuerpo):
+    # (JSON de la respuesta ya codificado, administraciones corregidas)
+    respuesta, n = puntuar_json(cuerpo)
+    return json.dumps(respuesta, ensure_ascii=False).encode("utf-8"), n
+
+
+def _datos_informe(cuerpo):
+    if not isinstance(cuerpo, dict):
+        raise ErrorPeticion(400, "Se esperaba un objeto JSON")
+    sexo, respuestas = _administracion(cuerpo)
+    if any(not 0 <= r <= 4 for r in respuestas):
+        raise ErrorPeticion(400, "Las respuestas deben ser enteros de 0 a 4")
+    datos = {"sexo": sexo, "respuestas": respuestas}
+    for campo in ("nombre", "fecha", "terapeuta"):
+        valor = cuerpo.get(campo, "")
+        if not isinstance(valor, str) or not valor.strip():
+            raise ErrorPeticion(400, f"Falta el campo \"{campo}\"")
+        datos[campo] = valor.strip()
+    return datos
+
+
+# === SERVIDOR ===
+class Servicio:
+    def __init__(self, trabajadores=None, max_pendientes=None, motor_grafica="vectorial", motor_pdf="canvas"):
+        self.trabajadores = trabajadores or os.cpu_count() or 1
+        self.max_pendientes = max_pendientes or self.trabajadores * 4
+        self.motor_grafica = motor_grafica
+        self.motor_pdf = motor_pdf
+        self.pdf_en_curso = 0
+        self.metricas = Metricas()
+        self.pool = None
+
+    def iniciar_pool(self):
+        self.pool = ProcessPoolExecutor(max_workers=self.trabajadores, initializer=_precalentar)
+
+    async def atender(self, lector, escritor):
+        try:
+            while True:
+                try:
+                    cabecera = await asyncio.wait_for(lector.readuntil(b"\r\n\r\n"), TIMEOUT_CABECERAS)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError,
+                        ConnectionError):
+                    return
+                inicio = time.perf_counter()
+                metodo, ruta, cabeceras = self._cabecera(cabecera)
+                cerrar = False
+                try:
+                    cuerpo = await self._leer_cuerpo(lector, cabeceras, metodo)
+                    estado, tipo, datos, extra = await self.despachar(metodo, ruta, cuerpo)
+                except ErrorPeticion as e:
+                    estado, tipo, extra, cerrar = e.estado, "application/json", e.cabeceras, e.cerrar
+                    datos = json.dumps({"error": str(e)}, ensure_ascii=False).encode("utf-8")
+                except Exception as e:
+                    estado, tipo, extra = 500, "application/json", []
+                    datos = json.dumps({"error": f"{type(e).__name__}: {e}"}, ensure_ascii=False).encode("utf-8")
+                seguir = cabeceras.get("connection", "").lower() != "close" and not cerrar
+                self._responder(escritor, estado, tipo, datos, extra, seguir)
+                await escritor.drain()
+                self.metricas.registrar(ruta if ruta in self.RUTAS else "otra", estado,
+                                        time.perf_counter() - inicio)
+                if not seguir:
+                    return
+        finally:
+            escritor.close()
+
+    @staticmethod
+    def _cabecera(bloque):
+        lineas = bloque.decode("latin-1").split("\r\n")
+        partes = lineas[0].split(" ")
+        metodo, ruta = (partes[0], partes[1].split("?")[0]) if len(partes) >= 2 else ("", "")
+        cabeceras = {}
+        for linea in lineas[1:]:
+            if ":" in linea:
+                nombre, valor = linea.split(":", 1)
+                cabeceras[nombre.strip().lower()] = valor.strip()
+        return metodo, ruta, cabeceras
+
+    @staticmethod
+    async def _leer_cuerpo(lector, cabeceras, metodo):
+        if metodo != "POST":
+            return None
+        if "content-length" not in cabeceras:
+            raise ErrorPeticion(411, "Falta Content-Length")
+        longitud = int(cabeceras["content-length"]) if cabeceras["content-length"].isdigit() else -1
+        if not 0 <= longitud <= MAX_CUERPO:
+            raise ErrorPeticion(413, f"El cuerpo debe ocupar como máximo {MAX_CUERPO} bytes")
+        try:
+            return json.loads(await lector.readexactly(longitud))
+        except asyncio.IncompleteReadError as e:
+            raise ErrorPeticion(400, f"Cuerpo incompleto: llegaron {len(e.partial)} de {longitud} bytes",
+                                cerrar=True) from None
+        except ValueError:
+            raise ErrorPeticion(400, "El cuerpo no es JSON válido") from None
+
+    RUTAS = ("/puntuar", "/informe", "/metricas", "/salud")
+
+    async def despachar(self, metodo, ruta, cuerpo):
+        if ruta not in self.RUTAS:
+            raise ErrorPeticion(404, f"Ruta desconocida: {ruta}")
+        esperado = "POST" if ruta in ("/puntuar", "/informe") else "GET"
+        if metodo != esperado:
+            raise ErrorPeticion(405, f"{ruta} solo admite {esperado}", [("Allow", esperado)])
+
+        if ruta == "/puntuar":
+            datos, n = await self.puntuar(cuerpo)
+            self.metricas.administraciones += n
+            return 200, "application/json", datos, []
+        if ruta == "/informe":
+            return await self.informe(cuerpo)
+        if ruta == "/metricas":
+            return 200, "text/plain; version=0.0.4", self.metricas.texto(self).encode("utf-8"), []
+        return 200, "application/json", b'{"estado": "ok"}', []
+
+    async def puntuar(self, cuerpo):
+        # Validar fila a fila y serializar un lote grande tarda lo bastante como para parar
+        # /salud y /metricas: se hace en un hilo y el bucle sigue atendiendo
+        lista = cuerpo.get("administraciones") if isinstance(cuerpo, dict) else None
+        if not isinstance(lista, list) or len(lista) <= LOTE_EN_BUCLE:
+            return _puntuar_cuerpo(cuerpo)
+        return await asyncio.get_running_loop().run_in_executor(None, _puntuar_cuerpo, cuerpo)
+
+    async def informe(self, cuerpo):
+        datos = _datos_informe(cuerpo)
+        # Contrapresión: no se encola más trabajo del que el pool puede sacar adelante
+        if self.pdf_en_curso >= self.max_pendientes:
+            self.metricas.rechazadas += 1
+            raise ErrorPeticion(503, "Demasiados informes en cola; reintenta en unos segundos",
+                                [("Retry-After", "1")])
+        self.pdf_en_curso += 1
+        try:
+            pdf = await asyncio.get_running_loop().run_in_executor(
+                self.pool, _generar_pdf, datos, self.motor_grafica, self.motor_pdf)
+        finally:
+            self.pdf_en_curso -= 1
+        return 200, "application/pdf", pdf, [("Content-Disposition", 'inline; filename="informe.pdf"')]
+
+    @staticmethod
+    def _responder(escritor, estado, tipo, datos, extra, seguir):
+        cabeceras = [f"HTTP/1.1 {estado} {ESTADOS.get(estado, '')}",
+                     f"Content-Type: {tipo}",
+                     f"Content-Length: {len(datos)}",
+                     "Cache-Control: no-store",
+                     f"Connection: {'keep-alive' if seguir else 'close'}"]
+        cabeceras += [f"{nombre}: {valor}" for nombre, valor in extra]
+        escritor.write(("\r\n".join(cabeceras) + "\r\n\r\n").encode("latin-1") + datos)
+
+
+async def servir(servicio, puerto=PUERTO, listo=None):
+    servicio.iniciar_pool()
+    servidor = await asyncio.start_server(servicio.atender, ANFITRION, puerto, limit=64 * 1024)
+    try:
+        # SIGTERM (systemd, kill) cierra igual que Ctrl+C; en Windows no hay manejadores de señales
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except (NotImplementedError, AttributeError):
+        pass
+    try:
+        if listo is not None:
+            listo(servidor.sockets[0].getsockname()[1])
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        servicio.pool.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="SCL-90-R servicio",
+        description=f"Servicio HTTP local ({ANFITRION}) de puntuaciones e informes PDF.")
+    parser.add_argument("--puerto", type=int, default=PUERTO, help=f"puerto (por defecto: {PUERTO})")
+    parser.add_argument("-j", "--trabajadores", type=int, default=None,
+                        help="procesos para generar PDF (por defecto: núcleos de la CPU)")
+    parser.add_argument("--cola", type=int, default=None,
+                        help="PDF pendientes como máximo antes de responder 503 (por defecto: 4 por proceso)")
+    parser.add_argument("--grafica", choices=("matplotlib", "vectorial"), default="vectorial",
+                        help="motor de la gráfica (por defecto: vectorial)")
+    parser.add_argument("--pdf", choices=("platypus", "canvas"), default="canvas",
+                        help="motor del PDF (por defecto: canvas)")
+    args = parser.parse_args(argv)
+
+    if args.trabajadores is not None and args.trabajadores < 1:
+        parser.error("--trabajadores debe ser al menos 1")
+    if args.cola is not None and args.cola < 1:
+        parser.error("--cola debe ser al menos 1")
+
+    # Sin caché en disco: el servicio no deja rastro de las respuestas
+    os.environ.pop("SCL90_CACHE", None)
+    servicio = Servicio(args.trabajadores, args.cola, args.grafica, args.pdf)
+
+    def listo(puerto):
+        print(f"Escuchando en http://{ANFITRION}:{puerto} ({servicio.trabajadores} procesos para PDF, "
+              f"cola máxima {servicio.max_pendientes}). Ctrl+C para salir.", flush=True)
+    try:
+        asyncio.run(servir(servicio, args.puerto, listo))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
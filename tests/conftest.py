@@ -0,0 +1,5 @@
+# Los módulos están en la raíz del repositorio: se añade al path para importarlos
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
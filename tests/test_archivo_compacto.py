@@ -0,0 +1,48 @@
+# ==================== ARCHIVO COMPACTO (.scl): EMPAQUETADO EN 3 BITS ====================
+import numpy as np
+
+from archivo_compacto import (BYTES_RESPUESTAS, FILAS_INDICE, ArchivoCompacto, EscritorArchivo,
+                              desempaquetar, empaquetar)
+
+
+def test_ida_y_vuelta():
+    rng = np.random.default_rng(3)
+    matriz = np.vstack([rng.integers(0, 5, size=(1000, 90)), np.full(90, 4), np.zeros(90, dtype=int)])
+    empaquetadas = empaquetar(matriz)
+    assert empaquetadas.shape == (len(matriz), BYTES_RESPUESTAS)
+    assert np.array_equal(desempaquetar(empaquetadas), matriz)
+
+
+def test_cuatro_en_cada_posicion():
+    # Un 4 (100) en cada ítem, uno por fila: cubre los bits que caen a caballo de dos bytes
+    matriz = np.eye(90, dtype=np.uint8) * 4
+    assert np.array_equal(desempaquetar(empaquetar(matriz)), matriz)
+
+
+def test_archivo_cruza_bloques_del_indice(tmp_path):
+    # Más filas que un bloque del índice, añadidas en trozos que no coinciden con los bloques
+    n = FILAS_INDICE + 1000
+    rng = np.random.default_rng(7)
+    matriz = rng.integers(0, 5, size=(n, 90)).astype(np.uint8)
+    sexos = rng.integers(1, 3, size=n).astype(np.uint8)
+    ruta = str(tmp_path / "prueba.scl")
+    with EscritorArchivo(ruta) as escritor:
+        for inicio in range(0, n, 40000):
+            fin = min(inicio + 40000, n)
+            ids = [f"p{i}".encode() for i in range(inicio, fin)]
+            escritor.añadir(ids, np.full(fin - inicio, 20240101), sexos[inicio:fin], matriz[inicio:fin])
+
+    archivo = ArchivoCompacto(ruta)
+    try:
+        assert len(archivo) == n and len(archivo.indice) == 2
+        assert archivo.indice["hombres"].sum() == (sexos == 1).sum()
+        leidas = np.vstack([m for _, m in archivo.recorrer(tam_bloque=3000)])
+        assert np.array_equal(leidas, matriz)
+        # Un trozo a caballo entre el primer y el segundo bloque
+        primera, ultima = FILAS_INDICE - 5, FILAS_INDICE + 5
+        trozo = np.vstack([m for _, m in archivo.recorrer(filas=(primera, ultima))])
+        assert np.array_equal(trozo, matriz[primera:ultima])
+        mujeres = np.vstack([m for _, m in archivo.recorrer(sexo="M")])
+        assert np.array_equal(mujeres, matriz[sexos == 2])
+    finally:
+        archivo.cerrar()
@@ -0,0 +1,47 @@
+# ==================== VALIDACIÓN DE LAS DEFINICIONES DE TESTS ====================
+import copy
+
+import pytest
+
+from instrumentos import SCL90R, DefinicionInvalida, PlanPuntuacion, validar
+
+
+def _rota(cambio):
+    definicion = copy.deepcopy(SCL90R)
+    cambio(definicion)
+    return definicion
+
+
+def test_scl90r_es_valida():
+    validar(SCL90R)
+    assert PlanPuntuacion(SCL90R).incidencia.sum() == 83   # el 18 cuenta dos veces
+
+
+@pytest.mark.parametrize("cambio, mensaje", [
+    (lambda d: d["escalas"]["Hostilidad"].append(91), "fuera de 1-90"),
+    (lambda d: d["escalas"]["Hostilidad"].append(11), "repite ítems"),
+    (lambda d: d["escalas"]["Psicotismo"].append(1), "varias escalas"),
+    (lambda d: d["items_sin_escala"].clear(), "el ítem 65 no está en ninguna escala"),
+    (lambda d: d["items_compartidos"].clear(), "el ítem 18 aparece en varias escalas"),
+    (lambda d: d["items_adicionales"].append(1), "también está en Somatización"),
+    (lambda d: d["normas"]["cortes"].pop("Ansiedad"), "faltan cortes para: Ansiedad"),
+    (lambda d: d["normas"]["cortes"]["Ansiedad"].update(M=5), "está fuera del rango"),
+    (lambda d: d["validez"].update(psdi=None), "límite de PSDI"),
+    (lambda d: d["cambio"]["fiabilidad"].update(GSI=1.2), "fiabilidad de 'GSI'"),
+    (lambda d: d.pop("rango"), "falta la clave 'rango'"),
+])
+def test_clave_rota(cambio, mensaje):
+    definicion = _rota(cambio)
+    with pytest.raises(DefinicionInvalida, match=mensaje):
+        validar(definicion)
+    with pytest.raises(DefinicionInvalida):
+        PlanPuntuacion(definicion)
+
+
+def test_informa_de_todos_los_problemas():
+    def cambio(d):
+        d["escalas"]["Hostilidad"].append(91)
+        d["normas"]["cortes"].pop("Ansiedad")
+    with pytest.raises(DefinicionInvalida) as error:
+        validar(_rota(cambio))
+    assert "fuera de 1-90" in str(error.value) and "faltan cortes para: Ansiedad" in str(error.value)
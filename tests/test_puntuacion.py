@@ -0,0 +1,67 @@
+# ==================== MOTOR VECTORIZADO FRENTE A LA CORRECCIÓN ORIGINAL ====================
+# puntuar_lote tiene que dar exactamente lo mismo que CorrectorPsicometrico.corregir,
+# paciente a paciente, incluidas las rarezas de la clave (ítem 18 en dos dimensiones,
+# ítem 65 en ninguna).
+import numpy as np
+
+from puntuacion import puntuar_lote, resultados_paciente
+
+# Clave tal cual estaba en corregir (el manual cuenta desde 1)
+ESCALAS_ORIGINALES = {
+    "Somatización":          [1, 4, 12, 27, 40, 42, 48, 49, 52, 53, 56, 58],
+    "Obsesividad-Compulsividad": [3, 9, 10, 18, 28, 38, 45, 46, 51, 55],
+    "Sensibilidad Interpersonal": [6, 21, 34, 36, 37, 41, 61, 69, 73],
+    "Depresión":             [5, 14, 15, 20, 22, 26, 29, 30, 31, 32, 54, 71, 79],
+    "Ansiedad":              [2, 17, 23, 33, 39, 57, 72, 78, 80, 86],
+    "Hostilidad":            [11, 24, 63, 67, 74, 81],
+    "Ansiedad Fóbica":       [13, 25, 47, 50, 70, 75, 82],
+    "Ideación Paranoide":    [8, 18, 43, 68, 76, 83],
+    "Psicotismo":            [7, 16, 35, 62, 77, 84, 85, 87, 88, 90]
+}
+
+
+def corregir_original(respuestas):
+    # El algoritmo fila a fila de corregir, sin la interfaz
+    valores = [float(x) for x in respuestas]
+    resultados = {}
+    sub_sumas = []
+    for escala, items in ESCALAS_ORIGINALES.items():
+        puntaje = sum(valores[i-1] for i in items)
+        resultados[escala] = {"bruto": puntaje, "media": round(puntaje / len(items), 2), "n_items": len(items)}
+        sub_sumas.append(puntaje)
+    gsi_total = sum(valores)
+    pst = sum(1 for x in valores if x > 0)
+    psdi = gsi_total / pst if pst > 0 else 0
+    resultados["Índices Globales"] = {"GSI": round(gsi_total / 90, 2), "PST": pst, "PSDI": round(psdi, 2)}
+    return resultados, sub_sumas
+
+
+def _comprobar(matriz):
+    puntuaciones = puntuar_lote(matriz)
+    for fila, respuestas in enumerate(matriz.tolist()):
+        assert resultados_paciente(puntuaciones, fila) == corregir_original(respuestas), f"fila {fila}"
+
+
+def test_filas_aleatorias():
+    rng = np.random.default_rng(90)
+    # Respuestas uniformes y otras con muchos ceros (PST y PSDI más variados)
+    uniformes = rng.integers(0, 5, size=(5000, 90))
+    dispersas = rng.integers(0, 5, size=(5000, 90)) * (rng.random((5000, 90)) < 0.2)
+    _comprobar(np.vstack([uniformes, dispersas]))
+
+
+def test_items_18_y_65():
+    matriz = np.zeros((4, 90), dtype=int)
+    matriz[0, 17] = 4    # el 18 suma en Obsesividad-Compulsividad y en Ideación Paranoide
+    matriz[1, 64] = 4    # el 65 no suma en ninguna dimensión, pero sí en los índices globales
+    matriz[2, [17, 64]] = 3
+    _comprobar(matriz)
+
+    puntuaciones = puntuar_lote(matriz)
+    resultados, _ = resultados_paciente(puntuaciones, 1)
+    assert all(resultados[e]["bruto"] == 0 for e in ESCALAS_ORIGINALES)
+    assert resultados["Índices Globales"]["PST"] == 1
+
+
+def test_todo_ceros_y_todo_cuatros():
+    _comprobar(np.array([[0] * 90, [4] * 90]))
@@ -0,0 +1,72 @@
+# ==================== COLA DE INFORMES EN SEGUNDO PLANO ====================
+# Un hilo trabajador genera los informes (gráfica + PDF) uno detrás de otro para que
+# el bucle de Tk nunca se bloquee. La ventana encola trabajos y recoge los resultados
+# sondeando con root.after(); nunca se toca un widget desde el hilo trabajador.
+import itertools
+import queue
+import threading
+from collections import deque
+
+
+class ColaInformes:
+    def __init__(self):
+        self._pendientes = deque()                  # (id, descripción, función, kwargs)
+        self._resultados = queue.Queue()            # (id, descripción, error o None)
+        self._hay_trabajo = threading.Condition()
+        self._ids = itertools.count(1)
+        self._actual = None                         # (id, descripción, Event de cancelación)
+        self._hilo = threading.Thread(target=self._bucle, name="informes", daemon=True)
+        self._hilo.start()
+
+    # === LADO DE LA VENTANA (hilo de Tk) ===
+    def enviar(self, descripcion, funcion, **kwargs):
+        # La función recibe además `cancelado` (threading.Event) para poder abandonar
+        with self._hay_trabajo:
+            id_trabajo = next(self._ids)
+            self._pendientes.append((id_trabajo, descripcion, funcion, kwargs))
+            self._hay_trabajo.notify()
+        return id_trabajo
+
+    def cancelar_todo(self):
+        # Vacía la cola y pide al trabajo en curso que se detenga; devuelve cuántos se cancelan
+        with self._hay_trabajo:
+            cancelados = len(self._pendientes)
+            self._pendientes.clear()
+            if self._actual is not None and not self._actual[2].is_set():
+                self._actual[2].set()
+                cancelados += 1
+        return cancelados
+
+    def en_cola(self):
+        # Trabajos pendientes + el que se está generando
+        with self._hay_trabajo:
+            return len(self._pendientes) + (1 if self._actual is not None else 0)
+
+    def terminados(self):
+        # Resultados listos, sin bloquear: lista de (id, descripción, error o None)
+        listos = []
+        while True:
+            try:
+                listos.append(self._resultados.get_nowait())
+            except queue.Empty:
+                return listos
+
+    # === LADO DEL HILO TRABAJADOR ===
+    def _bucle(self):
+        while True:
+            with self._hay_trabajo:
+                while not self._pendientes:
+                    self._hay_trabajo.wait()
+                id_trabajo, descripcion, funcion, kwargs = self._pendientes.popleft()
+                cancelado = threading.Event()
+                self._actual = (id_trabajo, descripcion, cancelado)
+            try:
+                funcion(cancelado=cancelado, **kwargs)
+                error = None
+            except Exception as e:
+                error = e
+            # El resultado se publica antes de liberar el trabajo: si en_cola() devuelve 0,
+            # todos los resultados ya están disponibles en terminados()
+            with self._hay_trabajo:
+                self._resultados.put((id_trabajo, descripcion, error))
+                self._actual = None
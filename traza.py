@@ -0,0 +1,130 @@
+# ==================== TRAZAS DE TIEMPO POR ETAPA ====================
+# Instrumentación opcional: cada etapa de la corrección se envuelve en un tramo
+#
+#   with tramo("pdf.build"):
+#       doc.build(story)
+#
+# Desactivada por defecto: tramo() devuelve siempre el mismo objeto vacío y no mide nada.
+# Se activa con la variable de entorno SCL90_TRAZA=ruta.json o con `--traza ruta.json`
+# y escribe eventos en formato Chrome trace-event (abrir en chrome://tracing o
+# https://ui.perfetto.dev). El archivo se escribe evento a evento como un array JSON
+# sin cerrar, que ambos visores aceptan, así que sirve aunque el programa se cierre de golpe.
+import json
+import os
+import threading
+import time
+
+_ACTIVA = False
+_archivo = None
+_cerrojo = threading.Lock()
+_pid = os.getpid()
+
+
+class _TramoNulo:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULO = _TramoNulo()
+
+
+class _Tramo:
+    __slots__ = ("nombre", "args", "inicio")
+
+    def __init__(self, nombre, args):
+        self.nombre = nombre
+        self.args = args
+
+    def __enter__(self):
+        self.inicio = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, tipo, valor, traceback):
+        fin = time.perf_counter_ns()
+        evento = {
+            "name": self.nombre,
+            "ph": "X",                          # evento completo (inicio + duración)
+            "ts": self.inicio // 1000,          # microsegundos
+            "dur": (fin - self.inicio) // 1000,
+            "pid": _pid,
+            "tid": threading.get_ident(),
+        }
+        if self.args or tipo is not None:
+            evento["args"] = dict(self.args)
+            if tipo is not None:
+                evento["args"]["error"] = tipo.__name__
+        _escribir(evento)
+        return False
+
+
+def tramo(nombre, **args):
+    if not _ACTIVA:
+        return _NULO
+    return _Tramo(nombre, args)
+
+
+def _ruta_proceso(ruta, hijo):
+    # Los procesos hijos (pool del modo lote) escriben cada uno en su archivo
+    import multiprocessing
+    if not hijo and multiprocessing.parent_process() is None:
+        return ruta
+    base, extension = os.path.splitext(ruta)
+    return f"{base}.{os.getpid()}{extension or '.json'}"
+
+
+def activar(ruta, hijo=False):
+    global _ACTIVA, _archivo, _pid
+    with _cerrojo:
+        if _archivo is not None:
+            _archivo.close()
+        _pid = os.getpid()
+        _archivo = open(_ruta_proceso(ruta, hijo), "w", encoding="utf-8")
+        _archivo.write("[\n")
+        _archivo.write(json.dumps({"name": "process_name", "ph": "M", "pid": _pid,
+                                   "args": {"name": f"SCL-90-R ({_pid})"}}) + ",\n")
+        _archivo.flush()
+        _ACTIVA = True
+    # Los procesos hijos heredan la ruta por el entorno
+    os.environ["SCL90_TRAZA"] = ruta
+
+
+def desactivar():
+    global _ACTIVA, _archivo
+    with _cerrojo:
+        _ACTIVA = False
+        if _archivo is not None:
+            _archivo.close()
+            _archivo = None
+
+
+def activa():
+    return _ACTIVA
+
+
+def _escribir(evento):
+    linea = json.dumps(evento, ensure_ascii=False) + ",\n"
+    with _cerrojo:
+        if _archivo is not None:
+            _archivo.write(linea)
+            _archivo.flush()
+
+
+def _tras_fork():
+    # Un hijo creado con fork hereda el archivo del padre: abre el suyo propio
+    global _cerrojo, _archivo
+    _cerrojo = threading.Lock()
+    if _ACTIVA:
+        _archivo = None
+        activar(os.environ["SCL90_TRAZA"], hijo=True)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_tras_fork)
+
+if os.environ.get("SCL90_TRAZA"):
+    activar(os.environ["SCL90_TRAZA"])